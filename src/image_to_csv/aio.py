@@ -0,0 +1,202 @@
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from functools import partial
+from pathlib import Path
+from typing import Any, AsyncIterator, Iterable, Optional, Set, Tuple, Union
+
+from . import pipeline
+from .cache import DEFAULT_MAX_BYTES
+
+Source = Union[str, Path, bytes]
+
+
+@dataclass
+class ConversionResult:
+    """Outcome of converting one image with :meth:`AsyncConverter.convert_many`.
+
+    ``index`` is the position of the source in the input, since results are
+    yielded in completion order. Exactly one of ``df`` and ``error`` is set.
+    """
+
+    index: int
+    source: Source
+    df: Any = None
+    error: Optional[str] = None
+    seconds: float = 0.0
+
+
+def _split_source(source: Source, name: Optional[str]) -> Tuple[Path, Optional[bytes]]:
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        return Path(name or "image"), bytes(source)
+    return Path(source), None
+
+
+class AsyncConverter:
+    """Convert table images from asyncio code without blocking the event loop.
+
+    Decoding, preprocessing and parsing run on a pool of ``workers`` threads
+    and OCR on a separate pool of ``ocr_workers`` threads (keep one for
+    Paddle, which shares a single engine per process; Tesseract can use
+    more). Cancelling a conversion stops it from starting further stages, but
+    a stage already running in a thread is allowed to finish in the
+    background.
+
+    Use it as an async context manager, or call :meth:`close` when done.
+    """
+
+    def __init__(
+        self,
+        engine: str = "paddle",
+        clean: bool = True,
+        preprocess: str = "quality",
+        workers: int = 2,
+        ocr_workers: int = 1,
+        cache_dir: Optional[Path] = None,
+        cache_max_mb: float = DEFAULT_MAX_BYTES / (1024 * 1024),
+    ):
+        from .preprocess import PROFILES
+
+        if preprocess not in PROFILES:
+            raise ValueError(f"Unknown preprocess profile {preprocess!r}")
+        self.settings = pipeline.Settings(
+            engine=engine,
+            clean=clean,
+            preprocess_profile=preprocess,
+            cache=pipeline.open_cache(cache_dir, cache_max_mb),
+        )
+        self._cpu = ThreadPoolExecutor(max(1, workers), "image-to-csv-cpu")
+        self._ocr = ThreadPoolExecutor(max(1, ocr_workers), "image-to-csv-ocr")
+
+    async def _run(self, executor: ThreadPoolExecutor, fn, *args):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(executor, partial(fn, *args))
+
+    async def _convert_page(
+        self, path: Path, data: Optional[bytes], page: Optional[int]
+    ) -> pipeline.Job:
+        settings = self.settings
+        job = pipeline.Job(path, data=data, page=page)
+        await self._run(self._cpu, pipeline.decode_job, job, settings)
+        await self._run(self._cpu, pipeline.preprocess_job, job, settings)
+        if job.payload is None:
+            job.payload = await self._run(
+                self._ocr, pipeline.ocr_image, job.img, job.label, settings
+            )
+        await self._run(self._cpu, pipeline.finish_job, job, settings, False)
+        return job
+
+    async def _convert(self, path: Path, data: Optional[bytes]):
+        from .decode import pages
+
+        jobs = []
+        for page in await self._run(self._cpu, pages, path, data):
+            jobs.append(await self._convert_page(path, data, page))
+        return pipeline.jobs_frame(jobs)
+
+    async def convert(
+        self,
+        source: Source,
+        name: Optional[str] = None,
+        timeout: Optional[float] = None,
+    ):
+        """Convert one image path or encoded image bytes into a DataFrame.
+
+        Every page of a PDF or multi-page TIFF is converted, one at a time,
+        and its rows are tagged with a ``_page`` column. ``name`` labels byte
+        input in debug output. Raises ``TimeoutError`` if the conversion takes
+        longer than ``timeout`` seconds.
+        """
+        path, data = _split_source(source, name)
+        return await asyncio.wait_for(self._convert(path, data), timeout)
+
+    async def _convert_result(
+        self, index: int, source: Source, timeout: Optional[float]
+    ) -> ConversionResult:
+        result = ConversionResult(index, source)
+        start = time.perf_counter()
+        try:
+            result.df = await self.convert(source, timeout=timeout)
+        except Exception as exc:
+            result.error = f"{type(exc).__name__}: {exc}"
+        result.seconds = time.perf_counter() - start
+        return result
+
+    async def convert_many(
+        self,
+        sources: Iterable[Source],
+        concurrency: int = 4,
+        timeout: Optional[float] = None,
+    ) -> AsyncIterator[ConversionResult]:
+        """Convert ``sources``, yielding each result as soon as it is ready.
+
+        At most ``concurrency`` images are in progress at once and sources are
+        pulled lazily, so a long iterable is never fully materialized. Failures
+        and per-image timeouts are reported on the result rather than raised.
+        Closing the generator early (``aclosing`` or ``break`` followed by
+        ``aclose()``) cancels the conversions still in flight.
+        """
+        pending: Set[asyncio.Task] = set()
+        try:
+            for index, source in enumerate(sources):
+                while len(pending) >= max(1, concurrency):
+                    done, pending = await asyncio.wait(
+                        pending, return_when=asyncio.FIRST_COMPLETED
+                    )
+                    for task in done:
+                        yield task.result()
+                pending.add(
+                    asyncio.ensure_future(self._convert_result(index, source, timeout))
+                )
+            while pending:
+                done, pending = await asyncio.wait(
+                    pending, return_when=asyncio.FIRST_COMPLETED
+                )
+                for task in done:
+                    yield task.result()
+        finally:
+            for task in pending:
+                task.cancel()
+            if pending:
+                await asyncio.gather(*pending, return_exceptions=True)
+
+    def close(self) -> None:
+        """Shut down the thread pools and trim the result cache."""
+        self._cpu.shutdown(wait=False, cancel_futures=True)
+        self._ocr.shutdown(wait=False, cancel_futures=True)
+        if self.settings.cache is not None:
+            self.settings.cache.prune()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        self.close()
+
+
+async def convert_image(
+    source: Source,
+    name: Optional[str] = None,
+    timeout: Optional[float] = None,
+    **options,
+):
+    """Convert one image with a short-lived :class:`AsyncConverter`.
+
+    ``options`` are passed to :class:`AsyncConverter`. Services converting
+    many images should keep one converter around instead.
+    """
+    async with AsyncConverter(**options) as converter:
+        return await converter.convert(source, name=name, timeout=timeout)
+
+
+async def convert_many(
+    sources: Iterable[Source],
+    concurrency: int = 4,
+    timeout: Optional[float] = None,
+    **options,
+) -> AsyncIterator[ConversionResult]:
+    """Stream :class:`ConversionResult` objects for ``sources`` as they finish."""
+    async with AsyncConverter(**options) as converter:
+        async for result in converter.convert_many(sources, concurrency, timeout):
+            yield result
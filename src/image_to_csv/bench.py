@@ -0,0 +1,225 @@
+import json
+import platform
+import time
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+import cv2
+import numpy as np
+
+from . import __version__
+from .grid import find_cells
+from .ocr import ocr_table_paddle
+from .preprocess import PROFILES, preprocess
+from .profiling import recording
+from .table_to_csv import html_to_df, html_to_dfs, lines_to_df, read_html_tables
+
+DEFAULT_SIZES = ((640, 480), (1280, 960), (2480, 1754))
+DEFAULT_SKEWS = (0.0, 2.5)
+DEFAULT_NOISES = (0.0, 12.0)
+# Rows and columns of the HTML table both HTML parsers are timed on.
+HTML_TABLE = (500, 10)
+
+
+def table_cells(rows: int, cols: int) -> List[List[str]]:
+    """Return the header and body text used for a synthetic table."""
+    header = [f"Col{c + 1}" for c in range(cols)]
+    body = [[f"{r + 1}.{c + 1}" for c in range(cols)] for r in range(rows - 1)]
+    return [header] + body
+
+
+def render_table(
+    width: int,
+    height: int,
+    rows: int = 12,
+    cols: int = 5,
+    skew: float = 0.0,
+    noise: float = 0.0,
+    seed: int = 0,
+) -> Tuple[np.ndarray, List[List[str]]]:
+    """Draw a ruled table on a white page and return it with its cell text.
+
+    ``skew`` rotates the page by that many degrees and ``noise`` adds Gaussian
+    noise with that standard deviation, mimicking a scanned page.
+    """
+    img: np.ndarray = np.full((height, width, 3), 255, dtype=np.uint8)
+    cells = table_cells(rows, cols)
+    margin_x, margin_y = width // 10, height // 10
+    cell_w = (width - 2 * margin_x) // cols
+    cell_h = (height - 2 * margin_y) // rows
+    scale = max(0.3, cell_h / 40)
+    thickness = max(1, int(round(scale * 1.5)))
+    for r in range(rows + 1):
+        y = margin_y + r * cell_h
+        cv2.line(img, (margin_x, y), (margin_x + cols * cell_w, y), (0, 0, 0), 2)
+    for c in range(cols + 1):
+        x = margin_x + c * cell_w
+        cv2.line(img, (x, margin_y), (x, margin_y + rows * cell_h), (0, 0, 0), 2)
+    for r, row in enumerate(cells):
+        for c, text in enumerate(row):
+            org = (
+                margin_x + c * cell_w + cell_w // 8,
+                margin_y + (r + 1) * cell_h - cell_h // 4,
+            )
+            cv2.putText(
+                img, text, org, cv2.FONT_HERSHEY_SIMPLEX, scale, (0, 0, 0), thickness
+            )
+    if skew:
+        M = cv2.getRotationMatrix2D((width / 2, height / 2), skew, 1.0)
+        img = cv2.warpAffine(img, M, (width, height), borderValue=(255, 255, 255))
+    if noise:
+        rng = np.random.default_rng(seed)
+        noisy = img.astype(np.float32) + rng.normal(0, noise, img.shape)
+        img = np.clip(noisy, 0, 255).astype(np.uint8)
+    return img, cells
+
+
+def cells_to_html(cells: Sequence[Sequence[str]]) -> str:
+    head = "".join(f"<th>{c}</th>" for c in cells[0])
+    body = "".join(
+        "<tr>" + "".join(f"<td>{c}</td>" for c in row) + "</tr>" for row in cells[1:]
+    )
+    return f"<table><tr>{head}</tr>{body}</table>"
+
+
+class StubTableEngine:
+    """Stand-in for PPStructure that returns a fixed table without a model.
+
+    It lets the OCR stage run offline so the surrounding work (sanitizing,
+    result handling, parsing) can be timed consistently.
+    """
+
+    def __init__(self, cells: Sequence[Sequence[str]]):
+        self.html = cells_to_html(cells)
+
+    def __call__(self, img):
+        return [{"type": "table", "res": {"html": self.html}}]
+
+
+def _case_id(size: Tuple[int, int], skew: float, noise: float) -> str:
+    return f"{size[0]}x{size[1]}-skew{skew:g}-noise{noise:g}"
+
+
+def benchmark_case(
+    img: np.ndarray, cells: Sequence[Sequence[str]], repeat: int = 3
+) -> Dict[str, float]:
+    """Time each pipeline stage on one image, returning median milliseconds."""
+    engine = StubTableEngine(cells)
+    lines = ["  ".join(row) for row in cells]
+    big_html = cells_to_html(table_cells(*HTML_TABLE))
+    ok, encoded = cv2.imencode(".png", img)
+    if not ok:
+        raise RuntimeError("Could not encode benchmark image")
+    timings: Dict[str, List[float]] = {}
+    for _ in range(max(1, repeat)):
+        events: list = []
+        with recording(events):
+            start = time.perf_counter()
+            decoded = cv2.imdecode(encoded, cv2.IMREAD_COLOR)
+            timings.setdefault("decode", []).append(time.perf_counter() - start)
+            if decoded is None:
+                raise RuntimeError("Could not decode benchmark image")
+            cleaned = preprocess(decoded, do_clean=True)
+            find_cells(cleaned)
+            html = ocr_table_paddle(cleaned, engine=engine)
+            html_to_df(html)
+            lines_to_df(lines)
+        for ev in events:
+            timings.setdefault(ev["stage"], []).append(ev["wall"])
+        for name in PROFILES:
+            if name == "quality":
+                continue
+            start = time.perf_counter()
+            preprocess(decoded, do_clean=True, profile=name)
+            elapsed = time.perf_counter() - start
+            timings.setdefault(f"preprocess[{name}]", []).append(elapsed)
+        for name, parse in (
+            ("lxml", html_to_dfs),
+            ("read_html", read_html_tables),
+        ):
+            start = time.perf_counter()
+            parse(big_html)
+            elapsed = time.perf_counter() - start
+            timings.setdefault(f"html_to_df[{name}]", []).append(elapsed)
+    return {stage: float(np.median(v)) * 1000 for stage, v in timings.items()}
+
+
+def profile_agreement(img: np.ndarray) -> Dict[str, float]:
+    """Fraction of output pixels each preprocess profile shares with ``quality``."""
+    reference = preprocess(img, do_clean=True, profile="quality")
+    agreement = {}
+    for name in PROFILES:
+        if name == "quality":
+            continue
+        out = preprocess(img, do_clean=True, profile=name)
+        if out.ndim == 3:  # auto may pass a clean page through untouched
+            out = cv2.cvtColor(out, cv2.COLOR_BGR2GRAY)
+        agreement[name] = float(np.mean(out == reference))
+    return agreement
+
+
+def run_benchmarks(
+    sizes: Iterable[Tuple[int, int]] = DEFAULT_SIZES,
+    skews: Iterable[float] = DEFAULT_SKEWS,
+    noises: Iterable[float] = DEFAULT_NOISES,
+    repeat: int = 3,
+) -> dict:
+    """Benchmark every size/skew/noise combination and return a baseline dict.
+
+    Besides stage timings, ``agreement`` records how closely each faster
+    preprocess profile reproduces the ``quality`` output for every case.
+    """
+    cases = {}
+    agreement = {}
+    for size in sizes:
+        for skew in skews:
+            for noise in noises:
+                img, cells = render_table(size[0], size[1], skew=skew, noise=noise)
+                case = _case_id(size, skew, noise)
+                cases[case] = benchmark_case(img, cells, repeat)
+                agreement[case] = profile_agreement(img)
+    return {
+        "version": __version__,
+        "python": platform.python_version(),
+        "opencv": cv2.__version__,
+        "unit": "ms",
+        "cases": cases,
+        "agreement": agreement,
+    }
+
+
+def compare(
+    current: dict,
+    baseline: dict,
+    threshold: float = 0.2,
+    min_delta_ms: float = 1.0,
+) -> List[dict]:
+    """List stages that got slower than ``baseline`` by more than ``threshold``.
+
+    Differences below ``min_delta_ms`` are ignored so sub-millisecond stages do
+    not flag timer noise as regressions.
+    """
+    regressions = []
+    for case, stages in current.get("cases", {}).items():
+        base_stages = baseline.get("cases", {}).get(case, {})
+        for stage, ms in stages.items():
+            base = base_stages.get(stage)
+            if base is None:
+                continue
+            if ms > base * (1 + threshold) and ms - base >= min_delta_ms:
+                regressions.append(
+                    {"case": case, "stage": stage, "baseline": base, "current": ms}
+                )
+    return regressions
+
+
+def load_results(path: Path) -> dict:
+    results: dict = json.loads(Path(path).read_text(encoding="utf-8"))
+    return results
+
+
+def save_results(results: dict, path: Optional[Path]) -> str:
+    text = json.dumps(results, indent=2, sort_keys=True)
+    if path is not None:
+        Path(path).write_text(text + "\n", encoding="utf-8")
+    return text
@@ -0,0 +1,104 @@
+import hashlib
+import json
+import os
+import threading
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+
+from . import __version__
+
+DEFAULT_MAX_BYTES = 512 * 1024 * 1024
+
+
+def cache_key(
+    image_bytes: bytes,
+    engine: str,
+    clean: bool,
+    preprocess: str = "quality",
+    page: Optional[int] = None,
+) -> str:
+    """Hash the raw image bytes together with every setting that shapes the result.
+
+    ``page`` numbers a page of a PDF or multi-page TIFF; plain images keep
+    the key they had before pages were supported.
+    """
+    digest = hashlib.sha256(image_bytes)
+    digest.update(f"\0{engine}\0{int(clean)}\0{preprocess}\0{__version__}".encode())
+    if page is not None:
+        digest.update(f"\0page{page}".encode())
+    return digest.hexdigest()
+
+
+class ResultCache:
+    """Content-addressed store of OCR payloads with size-bounded LRU eviction.
+
+    Each entry is a small JSON document (table HTML or OCR text lines) stored
+    under ``root/<key[:2]>/<key>.json``. Reads refresh the entry's mtime, which
+    is what :meth:`prune` uses to decide what was least recently used.
+    """
+
+    def __init__(self, root: Path, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.root = Path(root)
+        self.max_bytes = max_bytes
+
+    def _path(self, key: str) -> Path:
+        return self.root / key[:2] / f"{key}.json"
+
+    def get(self, key: str) -> Optional[dict]:
+        path = self._path(key)
+        try:
+            payload = json.loads(path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return None
+        if not isinstance(payload, dict):
+            return None
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return payload
+
+    def put(self, key: str, payload: dict) -> None:
+        path = self._path(key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        # Unique per thread: the async API stores results from a thread pool.
+        tmp = path.with_name(f"{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+        tmp.write_text(json.dumps(payload), encoding="utf-8")
+        os.replace(tmp, path)
+
+    def _entries(self):
+        if not self.root.is_dir():
+            return []
+        entries = []
+        for path in self.root.glob("*/*.json"):
+            try:
+                entries.append((path, path.stat()))
+            except FileNotFoundError:
+                continue
+        return entries
+
+    def stats(self) -> Dict[str, int]:
+        entries = self._entries()
+        return {
+            "entries": len(entries),
+            "bytes": sum(st.st_size for _, st in entries),
+            "max_bytes": self.max_bytes,
+        }
+
+    def prune(self, max_bytes: Optional[int] = None) -> Tuple[int, int]:
+        """Evict least recently used entries until the cache fits ``max_bytes``.
+
+        Returns the number of entries removed and the bytes freed.
+        """
+        limit = self.max_bytes if max_bytes is None else max_bytes
+        entries = sorted(self._entries(), key=lambda e: e[1].st_mtime)
+        total = sum(st.st_size for _, st in entries)
+        removed = freed = 0
+        for path, st in entries:
+            if total <= limit:
+                break
+            path.unlink(missing_ok=True)
+            total -= st.st_size
+            removed += 1
+            freed += st.st_size
+        return removed, freed
@@ -1,65 +1,91 @@
+import json
 import typer
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import ExitStack, contextmanager
+from functools import partial
+from itertools import groupby
 from pathlib import Path
-from typing import Optional
-import pandas as pd
-import cv2
-from .preprocess import preprocess
-from .ocr import ocr_table_paddle, ocr_lines_tesseract, get_paddle_engine
-from .table_to_csv import html_to_df, lines_to_df
+from typing import Any, Dict, List, Optional
+
+# Only lightweight modules are imported here so that `--help`, `cache` and
+# other quick invocations start fast. pandas, OpenCV and the preprocess,
+# parsing and writer modules built on them are imported by the code paths
+# that need them, and Paddle only when its engine is first requested.
+from . import pipeline
+from .cache import DEFAULT_MAX_BYTES, ResultCache
+from .manifest import Manifest
+from .ocr import iter_batches
+from .pipeline import DEFAULT_TILE_ABOVE
+from .profiling import summarize
+from .stages import bounded_map
+
+TABLE_MODES = ("first", "all", "split")
 
 app = typer.Typer(add_completion=False, help="Convert table images into CSV using OCR")
+cache_app = typer.Typer(help="Inspect or trim the OCR result cache")
+app.add_typer(cache_app, name="cache")
+
+
+def _check_profile(name: str):
+    from .preprocess import PROFILES
+
+    if name not in PROFILES:
+        raise typer.BadParameter(f"--preprocess must be one of {', '.join(PROFILES)}")
+
+
+def _check_tables(mode: str, allowed):
+    if mode not in allowed:
+        raise typer.BadParameter(f"--tables must be one of {', '.join(allowed)}")
+
 
+@contextmanager
+def _bad_images():
+    """Report an image that cannot be decoded as a bad argument."""
+    try:
+        yield
+    except pipeline.ImageReadError as exc:
+        raise typer.BadParameter(str(exc)) from exc
 
-def _load_image(p: Path):
-    img = cv2.imread(str(p))
-    if img is None:
-        raise typer.BadParameter(f"Cannot read image: {p}")
-    return img
-
-
-def _build_paddle_debug_callback(image_label: str, save_dir: Optional[Path]):
-    """Create a debug callback that logs Paddle detections."""
-    save_dir = Path(save_dir) if save_dir else None
-
-    def _callback(result):
-        tables = []
-        for item in result or []:
-            if item.get("type") == "table":
-                tables.append(item)
-        typer.echo(f"[Paddle][{image_label}] detected {len(tables)} table(s)")
-        if not tables:
-            return
-        if save_dir:
-            save_dir.mkdir(parents=True, exist_ok=True)
-        for idx, tbl in enumerate(tables, 1):
-            html = (tbl.get("res") or {}).get("html", "")
-            preview = " ".join(html.split())
-            if len(preview) > 160:
-                preview = preview[:160] + "..."
-            typer.echo(f'  table {idx}: preview="{preview}"')
-            if save_dir and html:
-                stem = Path(image_label).stem
-                target = save_dir / f"{stem}_table{idx}.html"
-                try:
-                    target.write_text(html, encoding="utf-8")
-                    typer.echo(f"    saved HTML -> {target}")
-                except Exception as exc:
-                    typer.echo(f"    failed to save HTML to {target}: {exc}")
-
-    return _callback
+
+def _write_split(job: pipeline.Job, out: Path):
+    """Write each table found in ``job`` to ``<out stem>_table<N><suffix>``.
+
+    Tables from a page of a document go to ``<out stem>_page<P>_table<N>``.
+    """
+    assert job.payload is not None
+    boxes = [t.get("bbox") for t in job.payload.get("tables") or []]
+    stem = out.stem if job.page is None else f"{out.stem}_page{job.page}"
+    for number, frame in enumerate(pipeline.payload_to_frames(job.payload), 1):
+        target = out.with_name(f"{stem}_table{number}{out.suffix}")
+        frame.to_csv(target, index=False)
+        bbox = boxes[number - 1] if number <= len(boxes) else None
+        where = f" at {bbox}" if bbox else ""
+        typer.echo(
+            f"Wrote table {number}{where}: {len(frame)} rows x "
+            f"{len(frame.columns)} cols -> {target}"
+        )
 
 
 @app.command()
 def file(
+    ctx: typer.Context,
     path: Path = typer.Argument(..., help="Input image path"),
     out: Path = typer.Option(..., "--out", "-o", help="Output CSV file"),
-    engine: str = typer.Option(
-        "paddle",
+    engine: Optional[str] = typer.Option(
+        None,
         "--engine",
         "-e",
-        help="OCR backend to use (paddle or tesseract)",
+        help="OCR backend to use (paddle, tesseract, tesseract-tsv, grid, or auto "
+        "to pick per image; default paddle, or the server's with --server)",
     ),
     clean: bool = typer.Option(True, "--clean", help="Apply denoise/binarize/deskew"),
+    preprocess_profile: str = typer.Option(
+        "quality",
+        "--preprocess",
+        "-p",
+        help="Preprocessing profile: quality (slowest), balanced, fast, or auto "
+        "(decide per image)",
+    ),
     debug_tables: bool = typer.Option(
         False, "--debug-tables", help="Log Paddle table detections"
     ),
@@ -68,43 +94,173 @@ def file(
         "--debug-tables-dir",
         help="Directory to save Paddle table HTML when debugging (enables --debug-tables)",
     ),
+    tables: str = typer.Option(
+        "first",
+        "--tables",
+        help="Pages with several tables: keep the first, tag all with a _table "
+        "column (all), or write one CSV per table (split, file only)",
+    ),
+    tables_only: bool = typer.Option(
+        False,
+        "--tables-only",
+        help="Paddle: recognize only detected table regions, skipping OCR of "
+        "other text",
+    ),
+    tile_above: float = typer.Option(
+        DEFAULT_TILE_ABOVE / 1_000_000,
+        "--tile-above",
+        min=0,
+        help="Clean and OCR pages above this many megapixels in bands to bound "
+        "memory (0 disables)",
+    ),
+    dpi: Optional[int] = typer.Option(
+        None,
+        "--dpi",
+        min=1,
+        help="Decode scans recorded at a finer resolution at 1/2, 1/4 or 1/8 "
+        "size, not below this; render PDF pages at it (default 300)",
+    ),
+    templates: bool = typer.Option(
+        False,
+        "--templates",
+        help="Reuse the cell grid of pages with a known ruled layout and the "
+        "result of pages duplicating an earlier one",
+    ),
+    cache_dir: Optional[Path] = typer.Option(
+        None,
+        "--cache-dir",
+        envvar="IMAGE_TO_CSV_CACHE_DIR",
+        help="Reuse OCR results for unchanged images from this directory",
+    ),
+    cache_max_mb: float = typer.Option(
+        DEFAULT_MAX_BYTES / (1024 * 1024),
+        "--cache-max-mb",
+        help="Trim the result cache to this size (least recently used first)",
+    ),
+    server: Optional[str] = typer.Option(
+        None,
+        "--server",
+        envvar="IMAGE_TO_CSV_SERVER",
+        help="Convert on a running `serve` instance (host:port or unix:/path) "
+        "instead of loading an engine here",
+    ),
 ):
     """Process a single image file."""
-    img = preprocess(_load_image(path), do_clean=clean)
-    paddle_engine = get_paddle_engine() if engine == "paddle" else None
+    if server:
+        # A cache dir set only through IMAGE_TO_CSV_CACHE_DIR is meant for local
+        # runs and is ignored; the server has no result cache, so only an
+        # explicit flag is refused.
+        # Compared by name: newer Typer releases vendor their own Click.
+        source = ctx.get_parameter_source("cache_dir")
+        explicit_cache = getattr(source, "name", None) == "COMMANDLINE"
+        unsupported = [
+            name
+            for name, used in (
+                ("--tables split", tables == "split"),
+                ("--tables-only", tables_only),
+                ("--debug-tables", debug_tables or debug_tables_dir is not None),
+                ("--cache-dir", explicit_cache),
+            )
+            if used
+        ]
+        if unsupported:
+            raise typer.BadParameter(
+                f"{', '.join(unsupported)} cannot be used with --server; they "
+                "depend on the server's engines, output or disk"
+            )
+        _check_profile(preprocess_profile)
+        _check_tables(tables, ("first", "all"))
+        options: Dict[str, Any] = {
+            "clean": int(clean),
+            "preprocess": preprocess_profile,
+            "tables": tables,
+            "tile_above": int(tile_above * 1_000_000),
+            "templates": int(templates),
+        }
+        if engine is not None:
+            options["engine"] = engine
+        if dpi is not None:
+            options["dpi"] = dpi
+        _convert_remote(server, path, out, options)
+        return
+    engine = engine or "paddle"
     if debug_tables_dir:
         debug_tables = True
-    if paddle_engine:
-        debug_cb = (
-            _build_paddle_debug_callback(path.name, debug_tables_dir)
-            if debug_tables
-            else None
-        )
-        html = ocr_table_paddle(img, engine=paddle_engine, debug_callback=debug_cb)
-        if debug_tables and not html:
-            typer.echo(
-                f"[Paddle][{path.name}] no table HTML detected, falling back to tesseract"
-            )
-        df = html_to_df(html) if html else lines_to_df(ocr_lines_tesseract(img))
-    else:
-        df = lines_to_df(ocr_lines_tesseract(img))
+    _check_profile(preprocess_profile)
+    _check_tables(tables, TABLE_MODES)
+    cache = pipeline.open_cache(cache_dir, cache_max_mb)
+    settings = pipeline.Settings(
+        engine=engine,
+        clean=clean,
+        preprocess_profile=preprocess_profile,
+        debug_tables=debug_tables,
+        debug_tables_dir=debug_tables_dir,
+        cache=cache,
+        tables=tables,
+        tables_only=tables_only,
+        tile_above=int(tile_above * 1_000_000),
+        dpi=dpi,
+        templates=templates,
+    )
+    with _bad_images():
+        jobs = pipeline.convert_document(path, settings)
+    if cache is not None:
+        cache.prune()
+    if tables == "split":
+        for job in jobs:
+            _write_split(job, out)
+        return
+    df = pipeline.jobs_frame(jobs)
     df.to_csv(out, index=False)
+    if engine == "auto":
+        typer.echo(
+            f"Route: {', '.join(pipeline.route_label(job, engine) for job in jobs)}"
+        )
     typer.echo(f"Wrote {len(df)} rows x {len(df.columns)} cols -> {out}")
 
 
 @app.command()
 def folder(
     path: Path = typer.Argument(..., help="Input folder path"),
-    out: Path = typer.Option(..., "--out", "-o", help="Combined CSV output file"),
-    engine: str = typer.Option("paddle", "--engine", "-e", help="paddle or tesseract"),
+    out: Path = typer.Option(..., "--out", "-o", help="Combined output file"),
+    engine: str = typer.Option(
+        "paddle",
+        "--engine",
+        "-e",
+        help="paddle, tesseract, tesseract-tsv, grid or auto",
+    ),
+    layout: str = typer.Option(
+        "wide",
+        "--layout",
+        help="wide: one column per table header; long: one row per cell",
+    ),
+    fmt: str = typer.Option(
+        "csv",
+        "--format",
+        help="Output format: csv, jsonl, parquet or arrow (Parquet and Arrow "
+        "need pyarrow)",
+    ),
+    typed: bool = typer.Option(
+        False,
+        "--infer-types",
+        help="Store numbers, amounts, percentages and dates as typed values "
+        "instead of text",
+    ),
     clean: bool = typer.Option(
         True, "--clean", "-c", help="Apply denoise/binarize/deskew"
     ),
-    glob: str = typer.Option(
-        "*.jpg",
+    preprocess_profile: str = typer.Option(
+        "quality",
+        "--preprocess",
+        "-p",
+        help="Preprocessing profile: quality (slowest), balanced, fast, or auto "
+        "(decide per image)",
+    ),
+    glob: Optional[str] = typer.Option(
+        None,
         "--glob",
         "-g",
-        help="Glob pattern for images (default: *.jpg)",
+        help="Glob pattern for inputs (default: every image, TIFF and PDF file)",
     ),
     debug_tables: bool = typer.Option(
         False, "--debug-tables", help="Log Paddle table detections"
@@ -114,37 +270,467 @@ def folder(
         "--debug-tables-dir",
         help="Directory to save Paddle table HTML when debugging (enables --debug-tables)",
     ),
+    workers: int = typer.Option(
+        1,
+        "--workers",
+        "-w",
+        min=1,
+        help="Number of worker processes (1 = process images sequentially)",
+    ),
+    batch_size: int = typer.Option(
+        8,
+        "--batch-size",
+        min=1,
+        help="Images sent to the Paddle engine per inference call",
+    ),
+    decode_workers: int = typer.Option(
+        2, "--decode-workers", min=1, help="Threads reading and decoding images"
+    ),
+    preprocess_workers: int = typer.Option(
+        2, "--preprocess-workers", min=1, help="Threads running denoise/deskew"
+    ),
+    ocr_workers: int = typer.Option(
+        1,
+        "--ocr-workers",
+        min=1,
+        help="Threads running OCR batches (keep 1 for Paddle, raise for Tesseract)",
+    ),
+    queue_size: int = typer.Option(
+        16,
+        "--queue-size",
+        min=1,
+        help="Images each stage may hold in flight before it waits on the next",
+    ),
+    profile: bool = typer.Option(
+        False, "--profile", help="Print per-stage timing percentiles at the end"
+    ),
+    profile_json: Optional[Path] = typer.Option(
+        None,
+        "--profile-json",
+        help="Write one JSON line of stage timings per image (enables --profile)",
+    ),
+    resume: bool = typer.Option(
+        False,
+        "--resume",
+        help="Skip images the manifest records as done and append to --out",
+    ),
+    manifest: Optional[Path] = typer.Option(
+        None,
+        "--manifest",
+        help="Checkpoint manifest path (default: <out>.manifest.jsonl with --resume)",
+    ),
+    tables: str = typer.Option(
+        "first",
+        "--tables",
+        help="Pages with several tables: keep the first, tag all with a _table "
+        "column (all), or write one CSV per table (split, file only)",
+    ),
+    tables_only: bool = typer.Option(
+        False,
+        "--tables-only",
+        help="Paddle: recognize only detected table regions, skipping OCR of "
+        "other text",
+    ),
+    tile_above: float = typer.Option(
+        DEFAULT_TILE_ABOVE / 1_000_000,
+        "--tile-above",
+        min=0,
+        help="Clean and OCR pages above this many megapixels in bands to bound "
+        "memory (0 disables)",
+    ),
+    dpi: Optional[int] = typer.Option(
+        None,
+        "--dpi",
+        min=1,
+        help="Decode scans recorded at a finer resolution at 1/2, 1/4 or 1/8 "
+        "size, not below this; render PDF pages at it (default 300)",
+    ),
+    templates: bool = typer.Option(
+        False,
+        "--templates",
+        help="Reuse the cell grid of pages with a known ruled layout and the "
+        "result of pages duplicating an earlier one",
+    ),
+    cache_dir: Optional[Path] = typer.Option(
+        None,
+        "--cache-dir",
+        envvar="IMAGE_TO_CSV_CACHE_DIR",
+        help="Reuse OCR results for unchanged images from this directory",
+    ),
+    cache_max_mb: float = typer.Option(
+        DEFAULT_MAX_BYTES / (1024 * 1024),
+        "--cache-max-mb",
+        help="Trim the result cache to this size (least recently used first)",
+    ),
 ):
-    """Batch convert all images in a folder."""
-    paths = sorted(path.glob(glob))
+    """Batch convert all images in a folder.
+
+    Each page of a PDF or multi-page TIFF is converted on its own; the rows
+    are tagged with a ``_page`` column.
+    """
+    from .decode import EXTENSIONS
+    from .writers import FORMATS, LAYOUTS, drop_rows, open_writer
+
+    if glob is None:
+        paths = sorted(p for p in path.iterdir() if p.suffix.lower() in EXTENSIONS)
+    else:
+        paths = sorted(path.glob(glob))
     if not paths:
-        raise typer.BadParameter(f"No files matched {glob} in {path}")
-    frames = []
-    paddle_engine = get_paddle_engine() if engine == "paddle" else None
+        raise typer.BadParameter(f"No files matched {glob or 'an image'} in {path}")
     if debug_tables_dir:
         debug_tables = True
-    for p in paths:
-        typer.echo(f"Processing {p.name} ...")
-        img = preprocess(_load_image(p), do_clean=clean)
-        if paddle_engine:
-            debug_cb = (
-                _build_paddle_debug_callback(p.name, debug_tables_dir)
-                if debug_tables
-                else None
+    if layout not in LAYOUTS:
+        raise typer.BadParameter(f"--layout must be one of {', '.join(LAYOUTS)}")
+    if fmt not in FORMATS:
+        raise typer.BadParameter(f"--format must be one of {', '.join(FORMATS)}")
+    if resume and fmt not in ("csv", "jsonl"):
+        raise typer.BadParameter("--resume needs --format csv or jsonl")
+    _check_profile(preprocess_profile)
+    _check_tables(tables, ("first", "all"))
+    if manifest is None and resume:
+        manifest = out.with_name(out.name + ".manifest.jsonl")
+    resuming = resume and out.exists() and manifest is not None and manifest.exists()
+    # The manifest and --profile-json file are closed even if the run fails,
+    # so what was recorded before the failure reaches disk.
+    with ExitStack() as stack:
+        tracker = None
+        if manifest:
+            tracker = stack.enter_context(Manifest(manifest, resume=resuming))
+        keys = {p: p.relative_to(path).as_posix() for p in paths}
+        pending = paths
+        if tracker is not None and resuming:
+            pending = [p for p in paths if not tracker.is_done(keys[p], p)]
+            # Every input still to do may have left rows behind: changed and
+            # failed ones, and any written just before a crash cut off its
+            # manifest record. _source holds the same relative path as keys.
+            drop_rows(out, "_source", {keys[p] for p in pending}, fmt)
+            typer.echo(
+                f"Resuming: {len(paths) - len(pending)} done, {len(pending)} to process"
             )
-            html = ocr_table_paddle(img, engine=paddle_engine, debug_callback=debug_cb)
-            if debug_tables and not html:
-                typer.echo(
-                    f"[Paddle][{p.name}] no table HTML detected, falling back to tesseract"
-                )
-            df = html_to_df(html) if html else lines_to_df(ocr_lines_tesseract(img))
-        else:
-            df = lines_to_df(ocr_lines_tesseract(img))
-        df.insert(0, "_source", p.name)
-        frames.append(df)
-    all_df = pd.concat(frames, ignore_index=True)
-    all_df.to_csv(out, index=False)
-    typer.echo(f"Wrote {len(all_df)} rows from {len(frames)} files -> {out}")
+        cache = pipeline.open_cache(cache_dir, cache_max_mb)
+        catch_errors = tracker is not None
+        if profile_json:
+            profile = True
+        settings = pipeline.Settings(
+            engine=engine,
+            clean=clean,
+            preprocess_profile=preprocess_profile,
+            debug_tables=debug_tables,
+            debug_tables_dir=debug_tables_dir,
+            cache=cache,
+            tables=tables,
+            tables_only=tables_only,
+            tile_above=int(tile_above * 1_000_000),
+            dpi=dpi,
+            templates=templates,
+        )
+        process = partial(
+            pipeline.process_batch, settings=settings, catch_errors=catch_errors
+        )
+        jobs = pipeline.page_jobs(pending, profile, catch_errors, root=path)
+
+        def _results():
+            with _bad_images():
+                if not pending:
+                    return
+                if workers > 1:
+                    # Each worker loads its own engine on its first OCR batch.
+                    # Batches come back in input order, so the output does not
+                    # depend on which worker finishes first, and at most two per
+                    # worker are submitted ahead of the writer.
+                    with ProcessPoolExecutor(max_workers=workers) as pool:
+                        batches = iter_batches(jobs, batch_size)
+                        for done in bounded_map(
+                            process, batches, workers, executor=pool
+                        ):
+                            yield from done
+                    return
+                for job in pipeline.staged_jobs(
+                    jobs,
+                    settings,
+                    batch_size=batch_size,
+                    decode_workers=decode_workers,
+                    preprocess_workers=preprocess_workers,
+                    ocr_workers=ocr_workers,
+                    queue_size=queue_size,
+                    catch_errors=catch_errors,
+                ):
+                    pipeline.run_step(
+                        job, catch_errors, pipeline.finish_job, job, settings
+                    )
+                    yield job
+
+        failed = 0
+        records = []
+        profile_fh = None
+        if profile_json:
+            profile_fh = stack.enter_context(profile_json.open("w", encoding="utf-8"))
+        with open_writer(out, fmt, layout, append=resuming, typed=typed) as writer:
+            # Pages of one file arrive together, in order; the manifest gets one
+            # record per file once its last page is done.
+            for source, group in groupby(_results(), key=lambda job: job.path):
+                done = []
+                for job in group:
+                    if engine == "auto" and job.payload is not None:
+                        typer.echo(
+                            f"Processed {job.label} [{pipeline.route_label(job, engine)}]"
+                        )
+                    else:
+                        typer.echo(f"Processed {job.label}")
+                    if profile:
+                        rec = {
+                            "path": keys[job.path],
+                            "route": pipeline.route_label(job, engine),
+                            "seconds": job.seconds,
+                            "triage": job.triage,
+                            "events": job.events,
+                        }
+                        if job.page is not None:
+                            rec["page"] = job.page
+                        records.append(rec)
+                        if profile_fh is not None:
+                            profile_fh.write(json.dumps(rec) + "\n")
+                    if job.df is not None:
+                        writer.write(job.df)
+                    else:
+                        typer.echo(f"Failed {job.label}: {job.error}", err=True)
+                    done.append(job)
+                errors = [job for job in done if job.error]
+                if errors:
+                    failed += 1
+                if tracker is not None:
+                    tracker.record(
+                        keys[source],
+                        source,
+                        "error" if errors else "ok",
+                        engine,
+                        rows=sum(len(job.df) for job in done if job.df is not None),
+                        seconds=sum(job.seconds for job in done),
+                        error="; ".join(
+                            f"page {job.page}: {job.error}" if job.page else job.error
+                            for job in errors
+                        )
+                        or None,
+                        triage=done[0].triage if len(done) == 1 else None,
+                        route=", ".join(
+                            dict.fromkeys(pipeline.route_label(j, engine) for j in done)
+                        ),
+                        pages=len(done) if done[0].page is not None else None,
+                    )
+    if profile:
+        typer.echo(summarize(records))
+    if templates and workers == 1:
+        # Worker processes each keep their own templates.
+        from .templates import get_template_store
+
+        stats = get_template_store().stats
+        typer.echo(
+            f"Templates: {stats['layouts']} layouts learned, {stats['template']} "
+            f"pages reused one, {stats['duplicate']} duplicate pages"
+        )
+    summary = f"Wrote {writer.rows} rows from {len(pending) - failed} files -> {out}"
+    if failed:
+        summary += f" ({failed} failed, see {manifest})"
+    typer.echo(summary)
+    if cache is not None:
+        cache.prune()
+
+
+def _convert_remote(server: str, path: Path, out: Path, options: Dict[str, Any]):
+    """Send ``path`` to a running server and write the CSV it returns.
+
+    The server's warm engine is used; ``options`` carries the conversion
+    settings (see :func:`server.pipeline_converter`) so the result matches a local
+    run. Every page of a document is converted.
+    """
+    import csv
+    import io
+
+    from .server import convert_remote
+
+    try:
+        data = path.read_bytes()
+    except OSError as exc:
+        raise typer.BadParameter(f"Cannot read image: {path} ({exc})")
+    try:
+        body = convert_remote(server, data, path.name, **options)
+    except (OSError, RuntimeError) as exc:
+        typer.echo(f"Conversion on {server} failed: {exc}", err=True)
+        raise typer.Exit(code=1)
+    out.write_bytes(body)
+    rows = list(csv.reader(io.StringIO(body.decode("utf-8"))))
+    cols = len(rows[0]) if rows else 0
+    typer.echo(f"Wrote {max(0, len(rows) - 1)} rows x {cols} cols -> {out}")
+
+
+@app.command()
+def serve(
+    listen: str = typer.Option(
+        "127.0.0.1:8765",
+        "--listen",
+        "-l",
+        help="Address to listen on: host:port or unix:/path/to.sock",
+    ),
+    engine: str = typer.Option(
+        "paddle",
+        "--engine",
+        "-e",
+        help="paddle, tesseract, tesseract-tsv, grid or auto",
+    ),
+    clean: bool = typer.Option(True, "--clean", help="Apply denoise/binarize/deskew"),
+    preprocess_profile: str = typer.Option(
+        "quality",
+        "--preprocess",
+        "-p",
+        help="Default preprocessing profile (requests may override it)",
+    ),
+    workers: int = typer.Option(
+        1,
+        "--workers",
+        "-w",
+        min=1,
+        help="Warm engines kept loaded; also the number of concurrent conversions",
+    ),
+    queue_size: int = typer.Option(
+        16,
+        "--queue-size",
+        min=0,
+        help="Requests allowed to wait for a free engine before answering 503",
+    ),
+    allow_paths: Optional[Path] = typer.Option(
+        None,
+        "--allow-paths",
+        file_okay=False,
+        help="Let clients name files under this directory instead of uploading "
+        "them (off by default)",
+    ),
+    max_body_mb: float = typer.Option(
+        64,
+        "--max-body-mb",
+        min=0,
+        help="Refuse request bodies larger than this with 413",
+    ),
+    verbose: bool = typer.Option(False, "--verbose", help="Log every request"),
+):
+    """Keep OCR engines loaded and convert images sent over HTTP.
+
+    POST image bytes to /convert (optionally ?format=json&name=...&preprocess=
+    ...&clean=0, or tables, dpi, templates and tile_above), or with
+    --allow-paths a JSON body {"path": ...}; GET /health and /metrics report
+    readiness and request statistics.
+    """
+    from . import server as server_module
+
+    _check_profile(preprocess_profile)
+    settings = pipeline.Settings(
+        engine=engine, clean=clean, preprocess_profile=preprocess_profile
+    )
+    typer.echo(f"Loading {workers} {engine} engine(s)...")
+    pool = server_module.EnginePool(
+        server_module.engine_factory(engine), workers, queue_size
+    )
+    convert = server_module.pipeline_converter(settings)
+    srv = server_module.make_server(
+        listen,
+        convert,
+        pool,
+        engine,
+        verbose=verbose,
+        allow_paths=allow_paths,
+        max_body=int(max_body_mb * 1024 * 1024),
+    )
+    typer.echo(f"Serving on {server_module.server_url(srv)} (Ctrl+C to stop)")
+    try:
+        srv.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server_module.close_server(srv)
+
+
+def _parse_size(text: str):
+    try:
+        w, h = (int(v) for v in text.lower().split("x"))
+    except ValueError:
+        raise typer.BadParameter(f"Expected WIDTHxHEIGHT, got {text!r}")
+    return w, h
+
+
+@app.command()
+def bench(
+    size: List[str] = typer.Option(
+        [], "--size", help="Page size as WIDTHxHEIGHT (repeatable)"
+    ),
+    skew: List[float] = typer.Option([], "--skew", help="Skew in degrees (repeatable)"),
+    noise: List[float] = typer.Option(
+        [], "--noise", help="Gaussian noise sigma (repeatable)"
+    ),
+    repeat: int = typer.Option(3, "--repeat", min=1, help="Runs per case (median)"),
+    out: Optional[Path] = typer.Option(
+        None, "--out", "-o", help="Write results as JSON (default: print them)"
+    ),
+    baseline: Optional[Path] = typer.Option(
+        None, "--baseline", help="Compare against a previous --out file"
+    ),
+    threshold: float = typer.Option(
+        0.2, "--threshold", help="Allowed slowdown vs. baseline (0.2 = 20%)"
+    ),
+):
+    """Benchmark each pipeline stage on synthetic tables (offline, stub OCR)."""
+    from . import bench as bench_module
+
+    results = bench_module.run_benchmarks(
+        sizes=[_parse_size(s) for s in size] or bench_module.DEFAULT_SIZES,
+        skews=skew or bench_module.DEFAULT_SKEWS,
+        noises=noise or bench_module.DEFAULT_NOISES,
+        repeat=repeat,
+    )
+    text = bench_module.save_results(results, out)
+    if out is None:
+        typer.echo(text)
+    else:
+        typer.echo(f"Wrote {len(results['cases'])} benchmark cases -> {out}")
+    if baseline is None:
+        return
+    regressions = bench_module.compare(
+        results, bench_module.load_results(baseline), threshold
+    )
+    for reg in regressions:
+        typer.echo(
+            f"REGRESSION {reg['case']} {reg['stage']}: "
+            f"{reg['baseline']:.1f} ms -> {reg['current']:.1f} ms",
+            err=True,
+        )
+    if regressions:
+        raise typer.Exit(code=1)
+    typer.echo(f"No stage slower than baseline by more than {threshold:.0%}")
+
+
+@cache_app.command("stats")
+def cache_stats(
+    cache_dir: Path = typer.Option(
+        ..., "--cache-dir", envvar="IMAGE_TO_CSV_CACHE_DIR", help="Cache directory"
+    ),
+):
+    """Show how many results the cache holds and how much space they use."""
+    stats = ResultCache(cache_dir).stats()
+    typer.echo(f"{stats['entries']} entries, {stats['bytes'] / (1024 * 1024):.1f} MB")
+
+
+@cache_app.command("prune")
+def cache_prune(
+    cache_dir: Path = typer.Option(
+        ..., "--cache-dir", envvar="IMAGE_TO_CSV_CACHE_DIR", help="Cache directory"
+    ),
+    max_mb: float = typer.Option(
+        DEFAULT_MAX_BYTES / (1024 * 1024),
+        "--max-mb",
+        help="Evict least recently used entries until the cache fits (0 clears it)",
+    ),
+):
+    """Evict least recently used results until the cache fits the size limit."""
+    removed, freed = ResultCache(cache_dir).prune(int(max_mb * 1024 * 1024))
+    typer.echo(f"Removed {removed} entries, freed {freed / (1024 * 1024):.1f} MB")
 
 
 if __name__ == "__main__":
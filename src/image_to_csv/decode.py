@@ -0,0 +1,271 @@
+import io
+import struct
+from importlib import import_module
+from pathlib import Path
+from typing import BinaryIO, Iterator, List, Optional, Tuple
+
+import cv2
+import numpy as np
+
+# Files `folder` picks up when no --glob is given.
+EXTENSIONS = (".bmp", ".jpeg", ".jpg", ".pdf", ".png", ".tif", ".tiff", ".webp")
+# PDF pages have no pixel size of their own; they are rendered at this
+# resolution unless a lower target is requested.
+PDF_DPI = 300
+# Reduced-size decoding flags by scale denominator, coarsest first. JPEG
+# decodes straight to the smaller size (scaled IDCT); other formats are
+# decoded in full and resized.
+_REDUCED = (
+    (8, cv2.IMREAD_REDUCED_COLOR_8),
+    (4, cv2.IMREAD_REDUCED_COLOR_4),
+    (2, cv2.IMREAD_REDUCED_COLOR_2),
+)
+_TIFF_MAGIC = (b"II*\0", b"MM\0*")
+
+
+def is_pdf(path: Path, data: Optional[bytes] = None) -> bool:
+    if data is not None:
+        return data[:5] == b"%PDF-"
+    return Path(path).suffix.lower() == ".pdf"
+
+
+def is_tiff(path: Path, data: Optional[bytes] = None) -> bool:
+    if data is not None:
+        return data[:4] in _TIFF_MAGIC
+    return Path(path).suffix.lower() in (".tif", ".tiff")
+
+
+def _pdfium():
+    try:
+        return import_module("pypdfium2")
+    except ImportError as exc:
+        raise RuntimeError(
+            "pypdfium2 not installed. Install with: pip install 'image-to-csv[pdf]'"
+        ) from exc
+
+
+def _tiff_pages(fh: BinaryIO) -> int:
+    """Count the IFDs (pages) of a TIFF by following the chain of offsets."""
+    head = fh.read(8)
+    if len(head) < 8 or head[:4] not in _TIFF_MAGIC:
+        return 1
+    order = "<" if head[:2] == b"II" else ">"
+    (offset,) = struct.unpack(order + "I", head[4:])
+    seen = set()
+    while offset and offset not in seen:
+        seen.add(offset)
+        fh.seek(offset)
+        raw = fh.read(2)
+        if len(raw) < 2:
+            break
+        (count,) = struct.unpack(order + "H", raw)
+        fh.seek(offset + 2 + 12 * count)
+        raw = fh.read(4)
+        if len(raw) < 4:
+            break
+        (offset,) = struct.unpack(order + "I", raw)
+    return max(1, len(seen))
+
+
+def page_count(path: Path, data: Optional[bytes] = None) -> int:
+    """Number of pages in a PDF or TIFF; 1 for other (or unreadable) files."""
+    if is_pdf(path, data):
+        pdf = _pdfium().PdfDocument(str(path) if data is None else data)
+        try:
+            return len(pdf)
+        finally:
+            pdf.close()
+    if not is_tiff(path, data):
+        return 1
+    if data is not None:
+        return _tiff_pages(io.BytesIO(data))
+    try:
+        with open(path, "rb") as fh:
+            return _tiff_pages(fh)
+    except OSError:
+        return 1
+
+
+def pages(path: Path, data: Optional[bytes] = None) -> List[Optional[int]]:
+    """Page numbers to convert: ``[None]`` for a plain image, else 1..N.
+
+    PDFs are always numbered, TIFFs only when they hold several pages.
+    """
+    count = page_count(path, data)
+    if count > 1 or is_pdf(path, data):
+        return list(range(1, count + 1))
+    return [None]
+
+
+def _tiff_dpi(fh: BinaryIO) -> Optional[float]:
+    """Resolution from the first IFD of a TIFF (or of an Exif block)."""
+    fh.seek(0)
+    head = fh.read(8)
+    if len(head) < 8 or head[:4] not in _TIFF_MAGIC:
+        return None
+    order = "<" if head[:2] == b"II" else ">"
+    (offset,) = struct.unpack(order + "I", head[4:])
+    fh.seek(offset)
+    raw = fh.read(2)
+    if len(raw) < 2:
+        return None
+    (count,) = struct.unpack(order + "H", raw)
+    entries = fh.read(12 * count)
+    values = {}
+    unit = 2  # inches unless ResolutionUnit says otherwise
+    for i in range(0, len(entries) - 11, 12):
+        tag, kind, _, value = struct.unpack(order + "HHII", entries[i : i + 12])
+        if tag in (282, 283) and kind == 5:  # X/YResolution, RATIONAL
+            values[tag] = value
+        elif tag == 296:  # ResolutionUnit, SHORT stored in the entry
+            unit = struct.unpack(order + "H", entries[i + 8 : i + 10])[0]
+    dpis = []
+    for value in values.values():
+        fh.seek(value)
+        num, den = struct.unpack(order + "II", fh.read(8))
+        if num and den:
+            dpis.append(num / den * (2.54 if unit == 3 else 1))
+    return min(dpis) if dpis and unit in (2, 3) else None
+
+
+def _jpeg_dpi(fh: BinaryIO) -> Optional[float]:
+    """Resolution from a JPEG's JFIF or Exif header."""
+    fh.seek(2)
+    while True:
+        marker = fh.read(4)
+        if len(marker) < 4 or marker[0] != 0xFF or marker[1] in (0xD9, 0xDA):
+            return None
+        (size,) = struct.unpack(">H", marker[2:])
+        start = fh.tell()
+        if marker[1] == 0xE0 and fh.read(5) == b"JFIF\0":
+            _, units, x, y = struct.unpack(">HBHH", fh.read(7))
+            if units in (1, 2) and x and y:
+                return float(min(x, y)) * (2.54 if units == 2 else 1)
+        elif marker[1] == 0xE1 and fh.read(6) == b"Exif\0\0":
+            dpi = _tiff_dpi(io.BytesIO(fh.read(size - 8)))
+            if dpi:
+                return dpi
+        fh.seek(start + size - 2)
+
+
+def _png_dpi(fh: BinaryIO) -> Optional[float]:
+    """Resolution from a PNG's pHYs chunk, which precedes the image data."""
+    fh.seek(8)
+    while True:
+        head = fh.read(8)
+        if len(head) < 8 or head[4:] == b"IDAT":
+            return None
+        (size,) = struct.unpack(">I", head[:4])
+        if head[4:] == b"pHYs":
+            x, y, unit = struct.unpack(">IIB", fh.read(9))
+            return min(x, y) * 0.0254 if unit == 1 and x and y else None
+        fh.seek(size + 4, io.SEEK_CUR)
+
+
+def source_dpi(fh: BinaryIO) -> Optional[float]:
+    """Scan resolution recorded in a JPEG, PNG or TIFF header, if any.
+
+    Only the headers are read, so this is cheap even for large files. Returns
+    the lower of the horizontal and vertical resolutions (fax TIFFs are often
+    204x98 dpi).
+    """
+    magic = fh.read(8)
+    try:
+        if magic[:2] == b"\xff\xd8":
+            return _jpeg_dpi(fh)
+        if magic == b"\x89PNG\r\n\x1a\n":
+            return _png_dpi(fh)
+        if magic[:4] in _TIFF_MAGIC:
+            return _tiff_dpi(fh)
+    except struct.error:
+        pass  # truncated header
+    return None
+
+
+def reduction(source: Optional[float], dpi: Optional[int]) -> int:
+    """Largest of 8, 4 and 2 that keeps ``source`` dpi at or above ``dpi``."""
+    if not source or not dpi:
+        return 1
+    for denom, _ in _REDUCED:
+        if source / denom >= dpi:
+            return denom
+    return 1
+
+
+def _reduced_flag(denom: int) -> int:
+    return dict(_REDUCED).get(denom, cv2.IMREAD_COLOR)
+
+
+def _shrink(img, denom: int):
+    if img is None or denom == 1:
+        return img
+    size = (-(-img.shape[1] // denom), -(-img.shape[0] // denom))
+    return cv2.resize(img, size, interpolation=cv2.INTER_AREA)
+
+
+def _render_pdf_page(path: Path, data: Optional[bytes], page: int, dpi: int):
+    pdf = _pdfium().PdfDocument(str(path) if data is None else data)
+    try:
+        bitmap = pdf[page - 1].render(scale=dpi / 72)
+        # The bitmap is BGR already; copy it out of pdfium's buffer.
+        return np.array(bitmap.to_numpy()[..., :3])
+    finally:
+        pdf.close()
+
+
+def read_page(
+    path: Path,
+    data: Optional[bytes] = None,
+    page: Optional[int] = None,
+    dpi: Optional[int] = None,
+):
+    """Decode one page of ``path`` (or of ``data``) as a BGR array.
+
+    ``page`` counts from 1 and selects a page of a PDF or multi-page TIFF
+    (None: the first). With ``dpi``, images whose header records a finer
+    resolution are decoded at 1/2, 1/4 or 1/8 size, never below ``dpi``; PDFs
+    are rendered at ``dpi`` (PDF_DPI by default). Returns None if the file
+    cannot be decoded.
+    """
+    if is_pdf(path, data):
+        return _render_pdf_page(path, data, page or 1, dpi or PDF_DPI)
+    index = (page or 1) - 1
+    denom = 1
+    if dpi:
+        if data is None:
+            try:
+                with open(path, "rb") as fh:
+                    denom = reduction(source_dpi(fh), dpi)
+            except OSError:
+                return None
+        else:
+            denom = reduction(source_dpi(io.BytesIO(data)), dpi)
+    buf = None if data is None else np.frombuffer(data, dtype=np.uint8)
+    if index and is_tiff(path, data):
+        # Reduced flags are ignored for multi-page reads, so resize instead.
+        if buf is None:
+            ok, mats = cv2.imreadmulti(str(path), index, 1, flags=cv2.IMREAD_COLOR)
+        else:
+            ok, mats = cv2.imdecodemulti(
+                buf, cv2.IMREAD_COLOR, range=(index, index + 1)
+            )
+        return _shrink(mats[0], denom) if ok and mats else None
+    flag = _reduced_flag(denom)
+    if buf is None:
+        return cv2.imread(str(path), flag)
+    return cv2.imdecode(buf, flag)
+
+
+def iter_pages(
+    path: Path, data: Optional[bytes] = None, dpi: Optional[int] = None
+) -> Iterator[Tuple[Optional[int], np.ndarray]]:
+    """Yield ``(page, image)`` for every page, decoding one page at a time.
+
+    ``page`` is None for single-page files, so callers can tell documents
+    from plain images.
+    """
+    for page in pages(path, data):
+        img = read_page(path, data, page, dpi)
+        if img is None:
+            raise ValueError(f"Cannot read page {page or 1} of {path}")
+        yield page, img
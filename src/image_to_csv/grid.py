@@ -0,0 +1,146 @@
+from dataclasses import dataclass
+from typing import Callable, List, Optional, Sequence, Tuple
+
+import cv2
+import numpy as np
+
+from .profiling import instrument
+
+Box = Tuple[int, int, int, int]
+
+# The opening kernels are 1/LINE_SCALE of the page width (or height) long,
+# which strips most text strokes from the line masks.
+LINE_SCALE = 30
+# A connected line must span this fraction of the longest line (the table's
+# width or height) to count as a ruling, which drops the aligned glyph stems
+# of a text column that survive the opening. The longest line must span
+# MIN_TABLE_SPAN of the page.
+MIN_LINE_SPAN = 0.5
+MIN_TABLE_SPAN = 0.2
+# Cells with less ink than this fraction of their area are left blank and
+# never sent to OCR.
+BLANK_INK = 0.002
+
+
+@dataclass
+class Lattice:
+    """Cell boxes of a ruled table, row by row, as ``(x0, y0, x1, y1)``."""
+
+    rows: int
+    cols: int
+    boxes: List[Box]
+    blank: List[bool]
+
+
+def ink_mask(img) -> np.ndarray:
+    gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY) if img.ndim == 3 else img
+    ink: np.ndarray = cv2.threshold(
+        gray, 0, 255, cv2.THRESH_BINARY_INV + cv2.THRESH_OTSU
+    )[1]
+    return ink
+
+
+def line_positions(profile: np.ndarray, length: int) -> Tuple[np.ndarray, int]:
+    """Centres of the runs where ``profile`` is at least MIN_LINE_SPAN of its peak.
+
+    ``profile`` counts ink pixels per row (or column) and ``length`` is the
+    page extent along the lines. Also returns the thickest run, so cell crops
+    can stay clear of the lines. Shared with the template matcher, which
+    projects raw ink instead of detected lines.
+    """
+    peak = profile.max() if profile.size else 0
+    if peak < MIN_TABLE_SPAN * length:
+        return np.empty(0, dtype=int), 0
+    idx = np.flatnonzero(profile >= MIN_LINE_SPAN * peak)
+    breaks = np.flatnonzero(np.diff(idx) > 1)
+    starts = np.concatenate(([idx[0]], idx[breaks + 1]))
+    ends = np.concatenate((idx[breaks], [idx[-1]]))
+    return (starts + ends) // 2, int((ends - starts).max()) + 1
+
+
+def long_lines(mask: np.ndarray, horizontal: bool) -> np.ndarray:
+    """Keep the connected runs of ``mask`` spanning MIN_LINE_SPAN of the longest.
+
+    Spans are measured along x for ``horizontal`` lines and along y otherwise.
+    """
+    count, labels, stats, _ = cv2.connectedComponentsWithStats(mask, connectivity=8)
+    if count < 2:
+        return mask
+    spans = stats[1:, cv2.CC_STAT_WIDTH if horizontal else cv2.CC_STAT_HEIGHT]
+    keep = np.zeros(count, dtype=bool)
+    keep[1:] = spans >= MIN_LINE_SPAN * spans.max()
+    return np.where(keep[labels], mask, 0).astype(np.uint8)
+
+
+@instrument("find_cells")
+def find_cells(img, ink: Optional[np.ndarray] = None) -> Optional[Lattice]:
+    """Find the cell lattice of a ruled table, or None if there is none.
+
+    Horizontal and vertical rulings are isolated with a morphological
+    opening of the ink mask using long, thin kernels. Only connected lines
+    spanning most of the table are kept; they are projected onto the y and
+    x axes and intersected into a grid of cells. Merged cells are not
+    detected; they come back as several cells, only one holding the text.
+    Pass ``ink`` to reuse an ink mask already computed for ``img``.
+    """
+    if ink is None:
+        ink = ink_mask(img)
+    height, width = ink.shape
+    horizontal = cv2.morphologyEx(
+        ink,
+        cv2.MORPH_OPEN,
+        cv2.getStructuringElement(cv2.MORPH_RECT, (max(10, width // LINE_SCALE), 1)),
+    )
+    vertical = cv2.morphologyEx(
+        ink,
+        cv2.MORPH_OPEN,
+        cv2.getStructuringElement(cv2.MORPH_RECT, (1, max(10, height // LINE_SCALE))),
+    )
+    horizontal = long_lines(horizontal, horizontal=True)
+    vertical = long_lines(vertical, horizontal=False)
+    ys, thick_y = line_positions(np.count_nonzero(horizontal, axis=1), width)
+    xs, thick_x = line_positions(np.count_nonzero(vertical, axis=0), height)
+    if len(ys) < 3 or len(xs) < 2:
+        return None
+    inset = max(thick_x, thick_y) + 1
+    if min(np.diff(ys).min(), np.diff(xs).min()) <= 2 * inset:
+        return None
+    boxes: List[Box] = [
+        (int(x0 + inset), int(y0 + inset), int(x1 - inset), int(y1 - inset))
+        for y0, y1 in zip(ys[:-1], ys[1:])
+        for x0, x1 in zip(xs[:-1], xs[1:])
+    ]
+    return Lattice(len(ys) - 1, len(xs) - 1, boxes, blank_cells(ink, boxes))
+
+
+def blank_cells(ink: np.ndarray, boxes: Sequence[Box]) -> List[bool]:
+    """Flag the boxes with less than BLANK_INK of their area inked."""
+    blank = []
+    for x0, y0, x1, y1 in boxes:
+        crop = ink[y0:y1, x0:x1]
+        blank.append(crop.size == 0 or np.count_nonzero(crop) < BLANK_INK * crop.size)
+    return blank
+
+
+def read_table(
+    img,
+    ocr_cells: Callable[[np.ndarray, Sequence[Box]], List[str]],
+    lattice: Optional[Lattice] = None,
+) -> Optional[List[List[str]]]:
+    """Return the text of every cell of a ruled table, header row first.
+
+    ``ocr_cells`` reads a list of boxes from ``img`` in one call (see
+    ``ocr.ocr_cells_tesseract``); blank cells are skipped. Returns None when
+    no ruled table is found so the caller can fall back to another engine.
+    ``lattice`` skips detection when it was already done.
+    """
+    if lattice is None:
+        lattice = find_cells(img)
+    if lattice is None:
+        return None
+    todo = [box for box, blank in zip(lattice.boxes, lattice.blank) if not blank]
+    texts = iter(ocr_cells(img, todo) if todo else [])
+    flat = ["" if blank else next(texts) for blank in lattice.blank]
+    return [
+        flat[r * lattice.cols : (r + 1) * lattice.cols] for r in range(lattice.rows)
+    ]
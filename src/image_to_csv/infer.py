@@ -0,0 +1,140 @@
+from typing import Iterable, Optional
+
+import pandas as pd
+
+# Kinds a column of OCR'd text can have. A column gets a kind other than
+# "string" only if every non-empty value parses as it.
+KINDS = ("empty", "int", "float", "percent", "currency", "date", "string")
+
+_UNSIGNED = r"(?:\d{1,3}(?:,\d{3})+|\d+)(?:\.\d+)?"
+_NUMBER = rf"[-+]?{_UNSIGNED}"
+_CURRENCY = r"(?:[$€£¥]|USD|EUR|GBP|JPY)"
+# "(1,234.50)" is accounting notation for a negative amount.
+_MONEY = (
+    rf"(?P<open>\()?\s*(?P<sign>[-+])?\s*(?P<pre>{_CURRENCY})?\s*(?P<sign2>-)?"
+    rf"\s*(?P<num>{_UNSIGNED})\s*(?P<post>{_CURRENCY})?\s*(?P<close>\))?"
+)
+# Tried in order; the first format every value parses with wins, so
+# ambiguous dates such as 03/04/2024 are read month first.
+DATE_FORMATS = (
+    "%Y-%m-%d",
+    "%m/%d/%Y",
+    "%d/%m/%Y",
+    "%d.%m.%Y",
+    "%Y/%m/%d",
+    "%d %b %Y",
+    "%b %d, %Y",
+    "%d-%b-%Y",
+)
+
+
+def _text(values: pd.Series) -> pd.Series:
+    """Values as stripped strings, with empty cells as NA."""
+    text = values.astype("string").str.strip()
+    return text.mask(text == "")
+
+
+def _number(text: pd.Series) -> pd.Series:
+    return pd.to_numeric(text.str.replace(",", "", regex=False))
+
+
+def _money(text: pd.Series) -> pd.DataFrame:
+    return text.str.extract(f"^{_MONEY}$")
+
+
+def _date_format(text: pd.Series) -> Optional[str]:
+    for fmt in DATE_FORMATS:
+        if pd.to_datetime(text, format=fmt, errors="coerce").notna().all():
+            return fmt
+    return None
+
+
+def column_kind(values: pd.Series) -> str:
+    """Classify a column of OCR'd text as one of :data:`KINDS`.
+
+    The checks are vectorized over the column: plain numbers (with
+    thousands separators) are ``int`` or ``float``, ``12.5%`` is
+    ``percent``, amounts with a currency sign or code (``$1,200``,
+    ``12 USD``) or in accounting parentheses (``(35.00)``, a negative) are
+    ``currency`` and dates in one of
+    DATE_FORMATS are ``date``. Anything else is ``string``.
+    """
+    text = _text(values).dropna()
+    if text.empty:
+        return "empty"
+    if text.str.fullmatch(_NUMBER).all():
+        return "float" if text.str.contains(".", regex=False).any() else "int"
+    if text.str.fullmatch(rf"{_NUMBER}\s*%").all():
+        return "percent"
+    money = _money(text)
+    if (
+        money["num"].notna().all()
+        and money[["pre", "post", "open"]].notna().any(axis=None)
+        and (money["open"].isna() == money["close"].isna()).all()
+    ):
+        return "currency"
+    if _date_format(text) is not None:
+        return "date"
+    return "string"
+
+
+def merge_kinds(kinds: Iterable[str]) -> str:
+    """The kind a column has overall, given its kind in each chunk.
+
+    ``int`` widens to ``float`` and both to ``currency`` (a chunk without a
+    currency sign parses as plain numbers); any other mix is ``string``.
+    """
+    found = set(kinds) - {"empty"}
+    if not found:
+        return "empty"
+    if len(found) == 1:
+        return found.pop()
+    for widest in ("currency", "float"):
+        if widest in found and found <= {"int", "float", "currency"}:
+            return widest
+    return "string"
+
+
+def convert(values: pd.Series, kind: str) -> pd.Series:
+    """Parse ``values`` as ``kind``; use a kind from :func:`column_kind`.
+
+    Integers become nullable ``Int64``, other numbers ``float64`` (percent
+    as a fraction, so ``12.5%`` is 0.125), dates ``datetime64`` and
+    everything else strings, with empty cells as missing values.
+    """
+    text = _text(values)
+    if kind == "int":
+        return _number(text).astype("Int64")
+    if kind == "float":
+        return _number(text).astype("float64")
+    if kind == "percent":
+        return _number(text.str.rstrip("%").str.strip()) / 100
+    if kind == "currency":
+        money = _money(text)
+        amount = _number(money["num"]).astype("float64")
+        negative = (
+            money["open"].notna()
+            | (money["sign"] == "-").fillna(False)
+            | (money["sign2"] == "-").fillna(False)
+        )
+        return amount.where(~negative, -amount)
+    if kind == "date":
+        fmt = _date_format(text.dropna())
+        return pd.to_datetime(text, format=fmt, errors="coerce")
+    return text
+
+
+def infer_types(df: pd.DataFrame) -> pd.DataFrame:
+    """Return ``df`` with each text column converted to its inferred kind.
+
+    Columns starting with ``_`` (``_source``, ``_page``, ...) and columns
+    that are not text are left alone.
+    """
+    out = df.copy()
+    for i, name in enumerate(df.columns):
+        values = df.iloc[:, i]
+        text = values.dtype == object or isinstance(values.dtype, pd.StringDtype)
+        if str(name).startswith("_") or not text:
+            continue
+        out.isetitem(i, convert(values, column_kind(values)))
+    return out
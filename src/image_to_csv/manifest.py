@@ -0,0 +1,86 @@
+import hashlib
+import json
+import time
+from pathlib import Path
+from typing import Dict, Optional
+
+
+def file_sha256(path: Path) -> str:
+    digest = hashlib.sha256()
+    with Path(path).open("rb") as fh:
+        for chunk in iter(lambda: fh.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class Manifest:
+    """JSON-lines checkpoint of per-file batch results.
+
+    Every processed input appends one record with its size, mtime, hash,
+    status, row count, timing, engine and error (if any). When a manifest is
+    reopened the latest record for each file wins, which is what lets a
+    restarted run skip inputs that already succeeded and are unchanged.
+    """
+
+    def __init__(self, path: Path, resume: bool = True):
+        self.path = Path(path)
+        self.records: Dict[str, dict] = {}
+        if resume and self.path.exists():
+            with self.path.open(encoding="utf-8") as fh:
+                for line in fh:
+                    try:
+                        rec = json.loads(line)
+                    except ValueError:
+                        continue  # torn write from an interrupted run
+                    if isinstance(rec, dict) and "path" in rec:
+                        self.records[rec["path"]] = rec
+        self._fh = self.path.open("a" if resume else "w", encoding="utf-8")
+
+    def is_done(self, key: str, path: Path) -> bool:
+        """Return True if ``path`` succeeded before and has not changed since."""
+        rec = self.records.get(key)
+        if not rec or rec.get("status") != "ok":
+            return False
+        try:
+            st = path.stat()
+        except OSError:
+            return False
+        if st.st_size == rec.get("size") and st.st_mtime_ns == rec.get("mtime_ns"):
+            return True
+        return st.st_size == rec.get("size") and file_sha256(path) == rec.get("sha256")
+
+    def record(
+        self,
+        key: str,
+        path: Path,
+        status: str,
+        engine: str,
+        rows: int = 0,
+        seconds: float = 0.0,
+        error: Optional[str] = None,
+        **extra,
+    ) -> None:
+        rec = {"path": key, "status": status, "engine": engine, "rows": rows}
+        rec["seconds"] = round(seconds, 4)
+        rec["error"] = error
+        rec.update({k: v for k, v in extra.items() if v is not None})
+        rec["finished_at"] = time.time()
+        try:
+            st = path.stat()
+            rec.update(
+                size=st.st_size, mtime_ns=st.st_mtime_ns, sha256=file_sha256(path)
+            )
+        except OSError:
+            pass
+        self.records[key] = rec
+        self._fh.write(json.dumps(rec) + "\n")
+        self._fh.flush()
+
+    def close(self) -> None:
+        self._fh.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -1,26 +1,75 @@
 import inspect
+import os
+import threading
+from contextlib import contextmanager
 from importlib import import_module
-from typing import Callable, List, Optional
-import numpy as np
-import cv2
+from itertools import islice
+from typing import (
+    Callable,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Sequence,
+    Tuple,
+    Union,
+)
 
-_paddle_engine = None
+from .profiling import instrument
 
+# Cached engines keyed by ``tables_only``.
+_paddle_engines: Dict[bool, object] = {}
+# None: not checked yet; False: tesserocr unavailable, use pytesseract.
+_tesseract_pool: Union[None, bool, "TesseractPool"] = None
+# Per-thread BGR buffers that gray pages are expanded into for Paddle, one
+# per position in a batch, reused while page sizes repeat.
+_bgr_buffers = threading.local()
+
+
+def _sanitize_img(img_bgr, slot: int = 0):
+    """Return ``img_bgr`` as the contiguous uint8 BGR array Paddle expects.
+
+    BGR input that is already uint8 and contiguous is returned as is. Gray
+    pages from ``preprocess`` are expanded into this thread's buffer for
+    ``slot`` (the image's position in a batch), which is reused while the
+    page size stays the same. The buffer is only valid until the next call
+    with that slot.
+    """
+    import numpy as np
 
-def _sanitize_img(img_bgr):
     if img_bgr is None:
         raise RuntimeError("Image is None (cv2.imread failed?)")
     if not isinstance(img_bgr, np.ndarray):
         raise RuntimeError(f"Expected numpy array, got {type(img_bgr)}")
-    if img_bgr.size == 0 or img_bgr.ndim != 3:
+    if img_bgr.size == 0 or img_bgr.ndim not in (2, 3):
         raise RuntimeError(f"Bad image shape: {img_bgr.shape}")
     if img_bgr.dtype != np.uint8:
-        img_bgr = img_bgr.astype(np.uint8, copy=False)
-    return np.ascontiguousarray(img_bgr)
+        img_bgr = img_bgr.astype(np.uint8)
+    if img_bgr.ndim == 3:
+        return np.ascontiguousarray(img_bgr)
+    import cv2
+
+    buffers = getattr(_bgr_buffers, "slots", None)
+    if buffers is None:
+        buffers = _bgr_buffers.slots = {}
+    buf = buffers.get(slot)
+    if buf is None or buf.shape[:2] != img_bgr.shape:
+        buf = buffers[slot] = np.empty(img_bgr.shape + (3,), dtype=np.uint8)
+    return cv2.cvtColor(img_bgr, cv2.COLOR_GRAY2BGR, dst=buf)
+
+
+def create_paddle_engine(tables_only: bool = False):
+    """Create a fresh PaddleOCR engine, supporting PPStructure v2+.
 
+    Each call loads the models again; :func:`get_paddle_engine` keeps one per
+    process, while ``serve`` builds one per worker with this.
 
-def _create_paddle_engine():
-    """Create a fresh PaddleOCR engine, supporting PPStructure v2+."""
+    With ``tables_only`` the layout model still locates every region, but
+    only table regions are recognized: text OCR of the rest of the page
+    (``ocr``) and the formula/chart/seal models (PPStructureV3) are switched
+    off where the installed version declares those parameters.
+    """
     try:
         paddleocr = import_module("paddleocr")
     except ImportError as e:
@@ -40,13 +89,24 @@ def _create_paddle_engine():
             "Installed PaddleOCR does not expose a table engine (PPStructure/PPStructureV3). Upgrade paddleocr."
         )
 
-    kwargs = {}
+    kwargs: Dict[str, object] = {}
     try:
         sig = inspect.signature(engine_cls)
         if "show_log" in sig.parameters:
             kwargs["show_log"] = False
         if "lang" in sig.parameters:
             kwargs["lang"] = "en"
+        if tables_only:
+            # Only names the constructor declares: PPStructureV3 takes
+            # **kwargs too, but rejects names it does not know.
+            for name in (
+                "ocr",
+                "use_formula_recognition",
+                "use_chart_recognition",
+                "use_seal_recognition",
+            ):
+                if name in sig.parameters:
+                    kwargs[name] = False
     except (TypeError, ValueError):
         kwargs = {}
 
@@ -56,59 +116,235 @@ def _create_paddle_engine():
         raise RuntimeError(f"Failed to create PaddleOCR engine: {e}") from e
 
 
-def get_paddle_engine():
+def get_paddle_engine(tables_only: bool = False):
     """Return the cached PaddleOCR engine, instantiating it on first use."""
-    global _paddle_engine
-    if _paddle_engine is None:
-        _paddle_engine = _create_paddle_engine()
-    return _paddle_engine
+    if tables_only not in _paddle_engines:
+        _paddle_engines[tables_only] = create_paddle_engine(tables_only)
+    return _paddle_engines[tables_only]
 
 
 def reset_paddle_engine():
-    """Reset the cached PaddleOCR engine (used by tests or manual resets)."""
-    global _paddle_engine
-    _paddle_engine = None
+    """Reset the cached PaddleOCR engines (used by tests or manual resets)."""
+    _paddle_engines.clear()
 
 
-def ocr_table_paddle(
-    img_bgr,
-    engine=None,
-    debug_callback: Optional[Callable[[Optional[list]], None]] = None,
-):
-    """Run PaddleOCR table recognition and return extracted HTML if available.
-
-    The Paddle engine is cached per process, so repeated calls avoid expensive
-    re-initialization. Pass an explicit engine for tests or custom workflows.
-    """
-    img_bgr = _sanitize_img(img_bgr)
-    ocr_engine = engine or get_paddle_engine()
+def _run_engine(ocr_engine, img_bgr):
     try:
         if callable(ocr_engine):
-            result = ocr_engine(img_bgr)
+            return ocr_engine(img_bgr)
         elif hasattr(ocr_engine, "predict"):
-            result = ocr_engine.predict(img_bgr)
+            return ocr_engine.predict(img_bgr)
         elif hasattr(ocr_engine, "predict_iter"):
-            result = list(ocr_engine.predict_iter(img_bgr))
+            return list(ocr_engine.predict_iter(img_bgr))
         else:
             raise RuntimeError(
                 "Unsupported PaddleOCR engine type; no callable/predict interface"
             )
     except Exception as e:
         raise RuntimeError(f"PaddleOCR inference failed: {e}") from e
+
+
+def _extract_tables(result) -> List[dict]:
+    """Every table in a Paddle layout result as ``{"html", "bbox"}``.
+
+    ``bbox`` is ``[x0, y0, x1, y1]`` in image pixels, or None when the engine
+    does not report one. Tables are kept in the order Paddle returned them.
+    """
+    tables = []
+    for item in result or []:
+        res = item.get("res", {})
+        if item.get("type") == "table" and isinstance(res, dict) and "html" in res:
+            bbox = item.get("bbox")
+            tables.append(
+                {
+                    "html": res["html"],
+                    "bbox": None if bbox is None else [int(v) for v in bbox],
+                }
+            )
+    return tables
+
+
+def _extract_table_html(result):
+    tables = _extract_tables(result)
+    return tables[0]["html"] if tables else None
+
+
+def _recognize(img_bgr, engine, debug_callback):
+    img_bgr = _sanitize_img(img_bgr)
+    ocr_engine = engine or get_paddle_engine()
+    result = _run_engine(ocr_engine, img_bgr)
     if debug_callback:
         try:
             debug_callback(result)
         except Exception:
             pass
-    for item in result or []:
-        res = item.get("res", {})
-        if item.get("type") == "table" and isinstance(res, dict) and "html" in res:
-            return res["html"]
-    return None
+    return result
 
 
-def ocr_lines_tesseract(img_bgr) -> List[str]:
-    """Fallback OCR line extraction using Tesseract."""
+@instrument("ocr_table_paddle")
+def ocr_table_paddle(
+    img_bgr,
+    engine=None,
+    debug_callback: Optional[Callable[[Optional[list]], None]] = None,
+):
+    """Run PaddleOCR table recognition and return extracted HTML if available.
+
+    The Paddle engine is cached per process, so repeated calls avoid expensive
+    re-initialization. Pass an explicit engine for tests or custom workflows.
+    Only the first table is returned; see :func:`ocr_tables_paddle`.
+    """
+    return _extract_table_html(_recognize(img_bgr, engine, debug_callback))
+
+
+@instrument("ocr_tables_paddle")
+def ocr_tables_paddle(
+    img_bgr,
+    engine=None,
+    debug_callback: Optional[Callable[[Optional[list]], None]] = None,
+) -> List[dict]:
+    """Like :func:`ocr_table_paddle`, but return every detected table.
+
+    Each table is ``{"html": ..., "bbox": [x0, y0, x1, y1] or None}``.
+    """
+    return _extract_tables(_recognize(img_bgr, engine, debug_callback))
+
+
+def iter_batches(items: Iterable, size: int) -> Iterator[list]:
+    """Split an iterable into lists of at most ``size`` items."""
+    it = iter(items)
+    while batch := list(islice(it, max(1, size))):
+        yield batch
+
+
+def _predict_batch(ocr_engine, batch: list) -> list:
+    """Return one raw result per image, batching when the engine supports it.
+
+    ``predict``/``predict_iter`` pipelines (PPStructureV3, PaddleX) accept a
+    list of images and return one result per input. Each result is given the
+    shape a single-image call returns: PaddleOCR 2.x yields a list of layout
+    items per image, 3.x a single result dict, which is wrapped in a list.
+    Legacy callable engines, or engines whose batch output does not line up
+    with the inputs, are run one image at a time.
+    """
+    if not callable(ocr_engine):
+        try:
+            if hasattr(ocr_engine, "predict"):
+                results = list(ocr_engine.predict(batch))
+            else:
+                results = list(ocr_engine.predict_iter(batch))
+        except Exception as e:
+            raise RuntimeError(f"PaddleOCR inference failed: {e}") from e
+        if len(results) == len(batch):
+            return [r if isinstance(r, list) else [r] for r in results]
+    return [_run_engine(ocr_engine, img) for img in batch]
+
+
+def ocr_tables_paddle_batch(
+    images: Iterable,
+    engine=None,
+    batch_size: int = 8,
+    debug_callback: Optional[Callable[[int, Optional[list]], None]] = None,
+    all_tables: bool = False,
+) -> Iterator:
+    """Yield the table HTML (or None) for each image, in input order.
+
+    Images are sent to the engine ``batch_size`` at a time so per-call
+    overhead is amortized. ``debug_callback`` receives the input index and
+    the raw Paddle result for each image. With ``all_tables`` each item is
+    instead the list of every table found, as from :func:`ocr_tables_paddle`.
+    """
+    ocr_engine = engine or get_paddle_engine()
+    index = 0
+    for batch in iter_batches(images, batch_size):
+        results = _predict_batch(
+            ocr_engine, [_sanitize_img(img, slot) for slot, img in enumerate(batch)]
+        )
+        for result in results:
+            if debug_callback:
+                try:
+                    debug_callback(index, result)
+                except Exception:
+                    pass
+            index += 1
+            yield _extract_tables(result) if all_tables else _extract_table_html(result)
+
+
+class TesseractPool:
+    """Long-lived tesserocr engines, each lent to one thread at a time.
+
+    An engine loads its language data once and then reads images straight
+    from memory, so there is no temporary PNG and no ``tesseract`` process
+    per image as with pytesseract. Engines are created on demand up to
+    ``size``; tesserocr releases the GIL while recognizing, so that many OCR
+    threads can work in parallel.
+    """
+
+    def __init__(self, tesserocr, size: Optional[int] = None, lang: str = "eng"):
+        self.tesserocr = tesserocr
+        self.size = max(1, size or os.cpu_count() or 1)
+        self.lang = lang
+        self._idle: list = []
+        self._created = 0
+        self._cond = threading.Condition()
+
+    @contextmanager
+    def acquire(self):
+        with self._cond:
+            while not self._idle and self._created >= self.size:
+                self._cond.wait()
+            api = self._idle.pop() if self._idle else None
+            if api is None:
+                self._created += 1
+        if api is None:
+            try:
+                api = self.tesserocr.PyTessBaseAPI(lang=self.lang)
+            except Exception as e:
+                with self._cond:
+                    self._created -= 1
+                    self._cond.notify()
+                raise RuntimeError(f"Failed to start tesserocr: {e}") from e
+        try:
+            yield api
+        finally:
+            with self._cond:
+                self._idle.append(api)
+                self._cond.notify()
+
+    def close(self) -> None:
+        """End the idle engines; engines still in use are left to their threads."""
+        with self._cond:
+            for api in self._idle:
+                api.End()
+            self._created -= len(self._idle)
+            self._idle.clear()
+
+
+def get_tesseract_pool() -> Optional[TesseractPool]:
+    """Return the shared tesserocr pool, or None to use pytesseract instead.
+
+    tesserocr is optional; without it (or with ``IMAGE_TO_CSV_TESSERACT`` set
+    to ``pytesseract``) every call goes through the pytesseract fallback.
+    """
+    global _tesseract_pool
+    if _tesseract_pool is None:
+        _tesseract_pool = False
+        if os.environ.get("IMAGE_TO_CSV_TESSERACT", "auto") != "pytesseract":
+            try:
+                _tesseract_pool = TesseractPool(import_module("tesserocr"))
+            except ImportError:
+                pass
+    return _tesseract_pool if isinstance(_tesseract_pool, TesseractPool) else None
+
+
+def reset_tesseract_pool():
+    """Shut down the shared tesserocr pool so the next call starts afresh."""
+    global _tesseract_pool
+    if isinstance(_tesseract_pool, TesseractPool):
+        _tesseract_pool.close()
+    _tesseract_pool = None
+
+
+def _import_pytesseract():
     try:
         import pytesseract
         from PIL import Image
@@ -116,6 +352,142 @@ def ocr_lines_tesseract(img_bgr) -> List[str]:
         raise RuntimeError(
             "pytesseract not installed. Install with: poetry install -E tesseract"
         )
-    rgb = cv2.cvtColor(img_bgr, cv2.COLOR_BGR2RGB)
-    text = pytesseract.image_to_string(Image.fromarray(rgb))
+    return pytesseract, Image
+
+
+def _tesseract_pixels(img):
+    """Gray pages as they are (no copy), BGR converted to RGB for Tesseract."""
+    if img.ndim == 2:
+        return img
+    import cv2
+
+    return cv2.cvtColor(img, cv2.COLOR_BGR2RGB)
+
+
+def _set_tesserocr_image(api, img_bgr) -> None:
+    pixels = _tesseract_pixels(img_bgr)
+    height, width = pixels.shape[:2]
+    channels = 1 if pixels.ndim == 2 else 3
+    api.SetImageBytes(pixels.tobytes(), width, height, channels, channels * width)
+
+
+def _tesserocr_words(pool: TesseractPool, img_bgr) -> Dict[str, list]:
+    level = pool.tesserocr.RIL.WORD
+    words: Dict[str, list] = {
+        k: [] for k in ("text", "left", "top", "width", "height", "conf")
+    }
+    with pool.acquire() as api:
+        _set_tesserocr_image(api, img_bgr)
+        api.Recognize()
+        iterator = api.GetIterator()
+        if iterator is None:
+            return words
+        for item in pool.tesserocr.iterate_level(iterator, level):
+            text = (item.GetUTF8Text(level) or "").strip()
+            box = item.BoundingBox(level)
+            if not text or box is None:
+                continue
+            x1, y1, x2, y2 = box
+            words["text"].append(text)
+            words["left"].append(int(x1))
+            words["top"].append(int(y1))
+            words["width"].append(int(x2 - x1))
+            words["height"].append(int(y2 - y1))
+            words["conf"].append(float(item.Confidence(level)))
+    return words
+
+
+@instrument("ocr_words_tesseract")
+def ocr_words_tesseract(img_bgr) -> Dict[str, list]:
+    """Run Tesseract once and return its recognized words with bounding boxes.
+
+    The result maps ``text``, ``left``, ``top``, ``width``, ``height`` and
+    ``conf`` to parallel lists, keeping only non-empty words, so it can be
+    cached as JSON and turned into a grid by ``table_to_csv.words_to_df``.
+    """
+    pool = get_tesseract_pool()
+    if pool is not None:
+        return _tesserocr_words(pool, img_bgr)
+    pytesseract, Image = _import_pytesseract()
+    data = pytesseract.image_to_data(
+        Image.fromarray(_tesseract_pixels(img_bgr)),
+        output_type=pytesseract.Output.DICT,
+    )
+    keep = [
+        i
+        for i, text in enumerate(data["text"])
+        if str(text).strip() and float(data["conf"][i]) >= 0
+    ]
+    words: Dict[str, list] = {"text": [str(data["text"][i]).strip() for i in keep]}
+    for key in ("left", "top", "width", "height"):
+        words[key] = [int(data[key][i]) for i in keep]
+    words["conf"] = [float(data["conf"][i]) for i in keep]
+    return words
+
+
+@instrument("ocr_cells_tesseract")
+def ocr_cells_tesseract(
+    img_bgr, boxes: Sequence[Tuple[int, int, int, int]]
+) -> List[str]:
+    """Read the text inside each ``(x0, y0, x1, y1)`` box of one image.
+
+    With tesserocr the image is handed to a pooled engine once and each box
+    is recognized through ``SetRectangle``. With pytesseract the page is read
+    in a single ``image_to_data`` call and words are assigned to the box
+    containing their centre, so either way there is one engine call per page.
+    """
+    pool = get_tesseract_pool()
+    if pool is not None:
+        texts = []
+        with pool.acquire() as api:
+            _set_tesserocr_image(api, img_bgr)
+            psm = api.GetPageSegMode()
+            api.SetPageSegMode(pool.tesserocr.PSM.SINGLE_BLOCK)
+            try:
+                for x0, y0, x1, y1 in boxes:
+                    api.SetRectangle(x0, y0, x1 - x0, y1 - y0)
+                    texts.append(" ".join((api.GetUTF8Text() or "").split()))
+            finally:
+                api.SetPageSegMode(psm)
+        return texts
+    import numpy as np
+
+    words = ocr_words_tesseract(img_bgr)
+    if not words["text"] or not boxes:
+        return [""] * len(boxes)
+    left, top = np.asarray(words["left"]), np.asarray(words["top"])
+    width, height = np.asarray(words["width"]), np.asarray(words["height"])
+    cx, cy = left + width / 2, top + height / 2
+    # Order words by line, then left to right, before grouping them by box.
+    line = np.round(cy / max(float(np.median(height)), 1.0))
+    order = np.lexsort((left, line))
+    b = np.asarray(boxes, dtype=float)
+    inside = (
+        (cx[order, None] >= b[:, 0])
+        & (cx[order, None] < b[:, 2])
+        & (cy[order, None] >= b[:, 1])
+        & (cy[order, None] < b[:, 3])
+    )
+    text = [words["text"][i] for i in order]
+    return [
+        " ".join(text[i] for i in np.flatnonzero(inside[:, k]))
+        for k in range(len(boxes))
+    ]
+
+
+@instrument("ocr_lines_tesseract")
+def ocr_lines_tesseract(img_bgr) -> List[str]:
+    """Fallback OCR line extraction using Tesseract.
+
+    Uses the persistent tesserocr pool when tesserocr is installed and
+    pytesseract otherwise.
+    """
+    pool = get_tesseract_pool()
+    if pool is not None:
+        with pool.acquire() as api:
+            _set_tesserocr_image(api, img_bgr)
+            text = api.GetUTF8Text()
+    else:
+        pytesseract, Image = _import_pytesseract()
+        text = pytesseract.image_to_string(Image.fromarray(_tesseract_pixels(img_bgr)))
     return [ln.strip() for ln in text.splitlines() if ln.strip()]
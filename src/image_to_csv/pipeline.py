@@ -0,0 +1,631 @@
+import time
+from dataclasses import dataclass, replace
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Dict, Iterable, Iterator, List, Optional
+
+import typer
+
+# Shared by the CLI, the HTTP server and the async API. Like the CLI, this
+# module imports only lightweight modules up front; pandas, OpenCV and Paddle
+# are loaded by the steps that need them.
+from .cache import ResultCache, cache_key
+from .profiling import instrument, record_event, recording
+from .stages import bounded_map
+from .ocr import (
+    get_paddle_engine,
+    get_tesseract_pool,
+    iter_batches,
+    ocr_cells_tesseract,
+    ocr_lines_tesseract,
+    ocr_tables_paddle,
+    ocr_tables_paddle_batch,
+    ocr_words_tesseract,
+)
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+# Same as tiles.TILE_ABOVE, repeated so the pipeline loads without OpenCV.
+DEFAULT_TILE_ABOVE = 40_000_000
+
+
+class ImageReadError(ValueError):
+    """Raised when an input file cannot be decoded as an image."""
+
+
+@instrument("decode")
+def load_image(
+    p: Path,
+    data: Optional[bytes] = None,
+    page: Optional[int] = None,
+    dpi: Optional[int] = None,
+):
+    from .decode import read_page
+
+    img = read_page(p, data, page, dpi)
+    if img is None:
+        raise ImageReadError(f"Cannot read image: {p}")
+    return img
+
+
+def _build_paddle_debug_callback(image_label: str, save_dir: Optional[Path]):
+    """Create a debug callback that logs Paddle detections."""
+    save_dir = Path(save_dir) if save_dir else None
+
+    def _callback(result):
+        tables = []
+        for item in result or []:
+            if item.get("type") == "table":
+                tables.append(item)
+        typer.echo(f"[Paddle][{image_label}] detected {len(tables)} table(s)")
+        if not tables:
+            return
+        if save_dir:
+            save_dir.mkdir(parents=True, exist_ok=True)
+        for idx, tbl in enumerate(tables, 1):
+            html = (tbl.get("res") or {}).get("html", "")
+            preview = " ".join(html.split())
+            if len(preview) > 160:
+                preview = preview[:160] + "..."
+            typer.echo(f'  table {idx}: preview="{preview}"')
+            if save_dir and html:
+                stem = Path(image_label).stem
+                target = save_dir / f"{stem}_table{idx}.html"
+                try:
+                    target.write_text(html, encoding="utf-8")
+                    typer.echo(f"    saved HTML -> {target}")
+                except Exception as exc:
+                    typer.echo(f"    failed to save HTML to {target}: {exc}")
+
+    return _callback
+
+
+@dataclass(frozen=True)
+class Settings:
+    """Per-image conversion settings shared by every pipeline stage."""
+
+    engine: str = "paddle"
+    clean: bool = True
+    preprocess_profile: str = "quality"
+    debug_tables: bool = False
+    debug_tables_dir: Optional[Path] = None
+    cache: Optional[ResultCache] = None
+    tables: str = "first"
+    tables_only: bool = False
+    tile_above: int = DEFAULT_TILE_ABOVE
+    dpi: Optional[int] = None
+    templates: bool = False
+
+
+def _paddle(settings: Settings):
+    """Return the process-wide Paddle engine configured for ``settings``."""
+    if settings.tables_only:
+        return get_paddle_engine(tables_only=True)
+    return get_paddle_engine()
+
+
+def warm_engine(settings: Settings):
+    """Load this process's OCR engine before the first image that needs it.
+
+    Called by :func:`ocr_batch`, so a batch whose pages all come from the
+    cache (or fail earlier) never loads an engine, and loading is not
+    counted in the first images' timings.
+    """
+    if settings.engine == "paddle":
+        _paddle(settings)
+    else:
+        pool = get_tesseract_pool()
+        if pool is not None:
+            with pool.acquire():
+                pass
+
+
+def _paddle_payload(img, label: str, tables: List[dict], debug_tables: bool) -> dict:
+    if tables:
+        return {"html": tables[0]["html"], "tables": tables}
+    if debug_tables:
+        typer.echo(
+            f"[Paddle][{label}] no table HTML detected, falling back to tesseract"
+        )
+    return {"lines": ocr_lines_tesseract(img)}
+
+
+def ocr_image(img, label: str, settings: Settings, paddle_engine=None) -> dict:
+    """Run OCR on a preprocessed image and return a JSON-serializable payload.
+
+    The payload holds the first table's ``html`` from Paddle (plus every
+    table with its bounding box under ``tables``), the text ``lines`` from
+    Tesseract, the Tesseract word boxes as ``words`` (``tesseract-tsv``) or
+    the ruled-table ``cells`` (``grid``); this is what the result cache
+    stores. Pass ``paddle_engine`` to use a specific engine instead of the
+    process-wide one.
+    """
+    if settings.engine == "auto":
+        return _auto_payload(img, label, settings, paddle_engine)
+    if settings.engine == "grid":
+        from .grid import find_cells, read_table
+        from .templates import find_cells as find_known_cells
+
+        lattice = (find_known_cells if settings.templates else find_cells)(img)
+        if lattice is not None:
+            return {"cells": read_table(img, ocr_cells_tesseract, lattice)}
+        return {"words": ocr_words_tesseract(img)}
+    if settings.engine != "paddle":
+        return _tesseract_payload(img, settings)
+    debug_cb = (
+        _build_paddle_debug_callback(label, settings.debug_tables_dir)
+        if settings.debug_tables
+        else None
+    )
+    if paddle_engine is None:
+        paddle_engine = _paddle(settings)
+    tables = ocr_tables_paddle(img, engine=paddle_engine, debug_callback=debug_cb)
+    return _paddle_payload(img, label, tables, settings.debug_tables)
+
+
+def _tesseract_payload(img, settings: Settings) -> dict:
+    """Tesseract ``lines`` (or ``words`` for tesseract-tsv) for one image.
+
+    Pages above ``settings.tile_above`` pixels are read in bands cut between
+    text lines; the lines are concatenated and word boxes shifted back to
+    page coordinates, so the payload looks the same as for a single call.
+    """
+    words = settings.engine == "tesseract-tsv"
+    if not settings.tile_above or img.shape[0] * img.shape[1] <= settings.tile_above:
+        if words:
+            return {"words": ocr_words_tesseract(img)}
+        return {"lines": ocr_lines_tesseract(img)}
+    from .tiles import iter_bands
+
+    if not words:
+        return {
+            "lines": [
+                ln for _, band in iter_bands(img) for ln in ocr_lines_tesseract(band)
+            ]
+        }
+    merged: Dict[str, list] = {}
+    for top, band in iter_bands(img):
+        found = ocr_words_tesseract(band)
+        found["top"] = [y + top for y in found.get("top", [])]
+        for key, values in found.items():
+            merged.setdefault(key, []).extend(values)
+    return {"words": merged}
+
+
+def _auto_payload(img, label: str, settings: Settings, paddle_engine=None) -> dict:
+    """Try engines from cheapest up until one produces a plausible table.
+
+    The page is classified first (``routing.classify_page``). Each result is
+    parsed and checked (``routing.check_table``), and only a failed check or
+    an engine error escalates to the next engine; if every engine falls
+    short, the last result that was produced is kept. The attempts are
+    stored in the payload under ``route`` so they are reported and cached
+    along with the result.
+    """
+    from .grid import read_table
+    from .routing import check_table, classify_page
+
+    plan = classify_page(img, settings.templates)
+    route: List[dict] = []
+    best = None
+    for name in plan.engines:
+        step: dict = {"engine": name}
+        route.append(step)
+        try:
+            if name == "grid":
+                payload = {"cells": read_table(img, ocr_cells_tesseract, plan.lattice)}
+            else:
+                payload = ocr_image(
+                    img, label, replace(settings, engine=name), paddle_engine
+                )
+        except Exception as exc:
+            step["error"] = f"{type(exc).__name__}: {exc}"
+            continue
+        best = payload
+        problem = check_table(payload_to_df(payload))
+        if problem is None:
+            break
+        step["failed"] = problem
+    if best is None:
+        errors = "; ".join(f"{s['engine']}: {s['error']}" for s in route)
+        raise RuntimeError(f"No engine could read {label} ({errors})")
+    return dict(best, route=route, features=plan.features)
+
+
+def payload_to_frames(payload: dict) -> List["pd.DataFrame"]:
+    """Parse every table in ``payload``; non-Paddle payloads hold one table."""
+    from .table_to_csv import html_to_dfs
+
+    if payload.get("tables"):
+        return [df for table in payload["tables"] for df in html_to_dfs(table["html"])]
+    return [payload_to_df(payload)]
+
+
+def payload_to_df(payload: dict) -> "pd.DataFrame":
+    from .table_to_csv import cells_to_df, html_to_df, lines_to_df, words_to_df
+
+    if payload.get("html"):
+        return html_to_df(payload["html"])
+    if payload.get("cells"):
+        return cells_to_df(payload["cells"])
+    if "words" in payload:
+        return words_to_df(payload["words"])
+    return lines_to_df(payload.get("lines") or [])
+
+
+@dataclass
+class Job:
+    """Per-image state carried through the batch pipeline."""
+
+    path: Path
+    data: Optional[bytes] = None
+    page: Optional[int] = None
+    # Tag for the rows' _source column; the file name when not set.
+    source: Optional[str] = None
+    key: Optional[str] = None
+    img: Any = None
+    payload: Optional[dict] = None
+    df: Optional["pd.DataFrame"] = None
+    error: Optional[str] = None
+    seconds: float = 0.0
+    cached: bool = False
+    duplicate: bool = False
+    events: Optional[list] = None
+    triage: Optional[dict] = None
+
+    @property
+    def label(self) -> str:
+        """Source name, plus the page number for pages of a document."""
+        name = self.source or self.path.name
+        if self.page is None:
+            return name
+        return f"{name} page {self.page}"
+
+
+def run_step(job: Job, catch_errors: bool, fn, *args):
+    """Run one pipeline step for ``job``, timing it and capturing its error.
+
+    When the job is being profiled, instrumented calls made by the step are
+    recorded into ``job.events``.
+    """
+    if job.error:
+        return None
+    start = time.perf_counter()
+    try:
+        if job.events is None:
+            return fn(*args)
+        with recording(job.events):
+            return fn(*args)
+    except Exception as exc:
+        if not catch_errors:
+            raise
+        job.error = f"{type(exc).__name__}: {exc}"
+        return None
+    finally:
+        job.seconds += time.perf_counter() - start
+
+
+def decode_job(job: Job, settings: Settings):
+    """Read one image from disk unless the cache already holds its result.
+
+    Bytes already attached to the job (an upload to ``serve``) are decoded
+    instead of reading ``job.path``.
+    """
+    data, job.data = job.data, None
+    if settings.cache is not None:
+        if data is None:
+            try:
+                data = job.path.read_bytes()
+            except OSError as exc:
+                raise ImageReadError(f"Cannot read image: {job.path}") from exc
+        engine = settings.engine + ("+tables-only" if settings.tables_only else "")
+        profile = settings.preprocess_profile
+        if settings.tile_above != DEFAULT_TILE_ABOVE:
+            profile += f"+tile{settings.tile_above}"
+        if settings.dpi:
+            profile += f"+dpi{settings.dpi}"
+        if settings.templates:
+            # Results may come from another page's grid or OCR.
+            profile += "+templates"
+        job.key = cache_key(data, engine, settings.clean, profile, job.page)
+        job.payload = settings.cache.get(job.key)
+        if job.payload is not None:
+            job.cached = True
+            return
+    job.img = load_image(job.path, data, job.page, settings.dpi)
+
+
+def preprocess_job(job: Job, settings: Settings):
+    from .preprocess import adaptive_preprocess, preprocess
+
+    if job.img is None:
+        return
+    if settings.clean and settings.preprocess_profile == "auto":
+        job.img, job.triage = adaptive_preprocess(job.img, settings.tile_above)
+    else:
+        job.img = preprocess(
+            job.img,
+            do_clean=settings.clean,
+            profile=settings.preprocess_profile,
+            tile_above=settings.tile_above,
+        )
+    if settings.templates:
+        from .templates import find_duplicate
+
+        job.payload = find_duplicate(job.img)
+        job.duplicate = job.payload is not None
+
+
+def ocr_batch(jobs: List[Job], settings: Settings, catch_errors: bool = False):
+    """OCR every job in ``jobs`` that still needs it, storing the payloads.
+
+    Images needing Paddle go through a single ``ocr_tables_paddle_batch`` call
+    so per-call engine overhead is amortized.
+    """
+    todo = [
+        job
+        for job in jobs
+        if job.img is not None and job.payload is None and not job.error
+    ]
+    if not todo:
+        return
+    warm_engine(settings)
+    if settings.engine != "paddle":
+        for job in todo:
+            job.payload = run_step(
+                job, catch_errors, ocr_image, job.img, job.label, settings
+            )
+        return
+    debug_cb = None
+    if settings.debug_tables:
+        callbacks = [
+            _build_paddle_debug_callback(job.label, settings.debug_tables_dir)
+            for job in todo
+        ]
+
+        def debug_cb(index, result):
+            callbacks[index](result)
+
+    start, cpu_start = time.perf_counter(), time.thread_time()
+    try:
+        found = list(
+            ocr_tables_paddle_batch(
+                [job.img for job in todo],
+                engine=_paddle(settings),
+                batch_size=len(todo),
+                debug_callback=debug_cb,
+                all_tables=True,
+            )
+        )
+    except Exception as exc:
+        if not catch_errors:
+            raise
+        for job in todo:
+            job.error = f"{type(exc).__name__}: {exc}"
+        return
+    share = (time.perf_counter() - start) / len(todo)
+    cpu_share = (time.thread_time() - cpu_start) / len(todo)
+    for job, tables in zip(todo, found):
+        job.seconds += share
+        if job.events is not None:
+            with recording(job.events):
+                record_event(
+                    "ocr_tables_paddle_batch",
+                    share,
+                    cpu_share,
+                    job.img.shape,
+                    batch=len(todo),
+                )
+        job.payload = run_step(
+            job,
+            catch_errors,
+            _paddle_payload,
+            job.img,
+            job.label,
+            tables,
+            settings.debug_tables,
+        )
+
+
+def finish_job(job: Job, settings: Settings, source: bool = True):
+    """Store a fresh payload in the cache and parse it into the job's frame."""
+    img, job.img = job.img, None
+    if job.payload is None:
+        return
+    if img is not None and settings.cache is not None and job.key is not None:
+        settings.cache.put(job.key, job.payload)
+    if img is not None and settings.templates and not job.duplicate:
+        from .templates import remember
+
+        remember(img, job.payload)
+    found = len(job.payload.get("tables") or [])
+    if settings.tables == "all":
+        import pandas as pd
+
+        frames = payload_to_frames(job.payload)
+        for number, frame in enumerate(frames, 1):
+            frame.insert(0, "_table", number)
+        job.df = pd.concat(frames, ignore_index=True)
+    else:
+        job.df = payload_to_df(job.payload)
+        # Split mode writes every table itself; only "first" drops any.
+        if found > 1 and settings.tables == "first":
+            typer.echo(
+                f"{job.label}: {found} tables detected, keeping the first "
+                "(use --tables all to keep every table)",
+                err=True,
+            )
+    if job.page is not None:
+        job.df.insert(0, "_page", job.page)
+    if source:
+        job.df.insert(0, "_source", job.source or job.path.name)
+
+
+def convert_job(
+    p: Path,
+    settings: Settings,
+    data: Optional[bytes] = None,
+    paddle_engine=None,
+    page: Optional[int] = None,
+) -> Job:
+    """Load, preprocess and OCR one image, consulting the result cache first.
+
+    ``data`` holds the image bytes when they did not come from ``p`` itself,
+    and ``page`` selects a page of a PDF or multi-page TIFF.
+    """
+    job = Job(p, data=data, page=page)
+    decode_job(job, settings)
+    preprocess_job(job, settings)
+    if job.payload is None:
+        job.payload = ocr_image(job.img, job.label, settings, paddle_engine)
+    finish_job(job, settings, source=False)
+    assert job.df is not None
+    return job
+
+
+def convert_document(
+    p: Path,
+    settings: Settings,
+    data: Optional[bytes] = None,
+    paddle_engine=None,
+) -> List[Job]:
+    """Convert every page of ``p`` (or of ``data``) with :func:`convert_job`."""
+    from .decode import pages
+
+    return [
+        convert_job(p, settings, data, paddle_engine, page) for page in pages(p, data)
+    ]
+
+
+def jobs_frame(jobs: List[Job]) -> "pd.DataFrame":
+    """The rows of every page converted, in page order."""
+    if len(jobs) == 1:
+        df = jobs[0].df
+    else:
+        import pandas as pd
+
+        df = pd.concat([job.df for job in jobs], ignore_index=True)
+    assert df is not None
+    return df
+
+
+def convert_path(
+    p: Path,
+    settings: Settings,
+    data: Optional[bytes] = None,
+    paddle_engine=None,
+) -> "pd.DataFrame":
+    """Convert a file like :func:`convert_document`, returning only its rows."""
+    return jobs_frame(convert_document(p, settings, data, paddle_engine))
+
+
+def page_jobs(
+    paths: Iterable[Path],
+    profile: bool = False,
+    catch_errors: bool = False,
+    root: Optional[Path] = None,
+) -> Iterator[Job]:
+    """One job per page: plain images give one, PDFs and TIFFs one per page.
+
+    Pages are counted from the file headers as the jobs are consumed; the
+    pages themselves are decoded later, one at a time, by :func:`decode_job`.
+    With ``catch_errors``, a file whose pages cannot be counted (a corrupt
+    PDF, or any PDF without pypdfium2) gives a single job carrying the error.
+    Rows are tagged with the path relative to ``root`` when it is given.
+    """
+    from .decode import pages
+
+    for p in paths:
+        source = p.relative_to(root).as_posix() if root is not None else None
+        job = Job(p, source=source, events=[] if profile else None)
+        found = run_step(job, catch_errors, pages, p)
+        if found is None:
+            yield job
+            continue
+        for page in found:
+            yield Job(p, page=page, source=source, events=[] if profile else None)
+
+
+def process_batch(
+    jobs: List[Job],
+    settings: Settings,
+    catch_errors: bool = False,
+) -> List[Job]:
+    """Convert a batch of pages in one process, tagging rows with file names.
+
+    Errors are raised unless ``catch_errors`` is set, in which case they are
+    recorded on the job.
+    """
+    for job in jobs:
+        run_step(job, catch_errors, decode_job, job, settings)
+        run_step(job, catch_errors, preprocess_job, job, settings)
+    ocr_batch(jobs, settings, catch_errors)
+    for job in jobs:
+        run_step(job, catch_errors, finish_job, job, settings)
+    return jobs
+
+
+def staged_jobs(
+    jobs: Iterable[Job],
+    settings: Settings,
+    batch_size: int,
+    decode_workers: int,
+    preprocess_workers: int,
+    ocr_workers: int,
+    queue_size: int,
+    catch_errors: bool = False,
+) -> Iterator[Job]:
+    """Run decode, preprocess and OCR as overlapping threaded stages.
+
+    Each stage keeps at most ``queue_size`` images in flight, so a fast
+    decoder blocks instead of buffering the whole folder. OpenCV releases the
+    GIL during decoding and preprocessing, and Tesseract runs out of process,
+    so these threads overlap I/O with inference. Jobs come out in input order
+    and are parsed by the caller.
+    """
+
+    def decode(job):
+        run_step(job, catch_errors, decode_job, job, settings)
+        return job
+
+    def prep(job):
+        run_step(job, catch_errors, preprocess_job, job, settings)
+        return job
+
+    def ocr(batch):
+        ocr_batch(batch, settings, catch_errors)
+        return batch
+
+    decoded = bounded_map(decode, jobs, decode_workers, queue_size)
+    prepped = bounded_map(prep, decoded, preprocess_workers, queue_size)
+    batches = bounded_map(
+        ocr,
+        iter_batches(prepped, batch_size),
+        ocr_workers,
+        max(1, queue_size // batch_size),
+    )
+    for batch in batches:
+        yield from batch
+
+
+def route_label(job: Job, engine: str) -> str:
+    """Describe which path produced the job's result, for profiling reports."""
+    if job.cached:
+        return "cache"
+    if job.duplicate:
+        return "duplicate"
+    if job.payload is None:
+        return "error"
+    if engine == "paddle" and not job.payload.get("html"):
+        return "paddle->tesseract"
+    if engine == "grid" and not job.payload.get("cells"):
+        return "grid->tesseract"
+    if engine == "auto":
+        return "auto:" + "->".join(s["engine"] for s in job.payload.get("route", []))
+    return engine
+
+
+def open_cache(cache_dir: Optional[Path], cache_max_mb: float):
+    if cache_dir is None:
+        return None
+    return ResultCache(cache_dir, max_bytes=int(cache_max_mb * 1024 * 1024))
@@ -1,27 +1,254 @@
+import threading
+from functools import partial
+
 import cv2
 import numpy as np
 
+from .profiling import instrument
+from .tiles import SAMPLE_SIDE, TILE_ABOVE, clean_tiled, is_large
+
+# Preprocessing profiles, from most accurate to fastest. Each names the denoise
+# filter and the deskew() arguments: skew is estimated on a copy downscaled to
+# ``max_side`` pixels, and pages tilted less than ``min_angle`` are not rotated.
+PROFILES = {
+    "quality": {"denoise": "nlmeans", "deskew": {}},
+    "balanced": {
+        "denoise": "bilateral",
+        "deskew": {"max_side": 1600, "min_angle": 0.3},
+    },
+    "fast": {"denoise": "median", "deskew": {"max_side": 1000, "min_angle": 0.5}},
+    # Decides per image which steps to run; see adaptive_preprocess().
+    "auto": {},
+}
+
+# Triage thresholds for adaptive_preprocess().
+NOISE_THRESHOLD = 2.0
+BIMODALITY_THRESHOLD = 0.85
+CONTRAST_THRESHOLD = 0.5
+SKEW_THRESHOLD = 0.2
+
+_LAPLACIAN_NOISE_KERNEL = np.array([[1, -2, 1], [-2, 4, -2], [1, -2, 1]], np.float32)
+
+# Per-thread page-sized gray buffer for intermediates (grayscale conversion,
+# Canny edges, rotation), reused from one image to the next while sizes
+# repeat, as they do for a folder of scans.
+_scratch = threading.local()
+
+
+def _scratch_gray(shape):
+    buf = getattr(_scratch, "gray", None)
+    if buf is None or buf.shape != shape:
+        buf = _scratch.gray = np.empty(shape, dtype=np.uint8)
+    return buf
+
+
+def _keep(result, scratch, spare):
+    """Return ``result``; if it was written into ``scratch``, recycle ``spare``.
+
+    The result leaves with the caller, so the buffer it replaced becomes the
+    thread's scratch buffer for the next image.
+    """
+    if result is scratch:
+        _scratch.gray = spare
+    return result
+
+
+def _denoise(gray, method):
+    if method == "nlmeans":
+        return cv2.fastNlMeansDenoising(gray, h=20)
+    if method == "bilateral":
+        return cv2.bilateralFilter(gray, 5, 50, 50)
+    if method == "median":
+        return cv2.medianBlur(gray, 3)
+    return gray
+
+
+@instrument("preprocess")
+def preprocess(img_bgr, do_clean=True, profile="quality", tile_above=TILE_ABOVE):
+    """Convert to grayscale, denoise, binarize, and deskew.
 
-def preprocess(img_bgr, do_clean=True):
-    """Convert to grayscale, denoise, binarize, and deskew."""
+    ``profile`` selects one of PROFILES; ``quality`` is the original
+    full-resolution non-local-means pipeline. Pages with more than
+    ``tile_above`` pixels are processed in bands (see :func:`_preprocess_tiled`);
+    pass 0 to never tile.
+
+    The result is a single-channel binary image. Apart from the result, the
+    only page-sized buffer is a per-thread scratch buffer that is reused
+    across images of the same size. The gray copy is written into it, the
+    denoiser writes the result buffer, and binarization happens in place.
+    Deskewing computes its edge map in scratch and rotates into it, then
+    the two buffers swap roles.
+    """
     if not do_clean:
         return img_bgr
-    gray = cv2.cvtColor(img_bgr, cv2.COLOR_BGR2GRAY)
-    gray = cv2.fastNlMeansDenoising(gray, h=20)
-    _, th = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
-    th = deskew(th)
-    return cv2.cvtColor(th, cv2.COLOR_GRAY2BGR)
+    if profile not in PROFILES:
+        raise ValueError(f"Unknown preprocess profile {profile!r}")
+    if profile == "auto":
+        return adaptive_preprocess(img_bgr, tile_above)[0]
+    settings = PROFILES[profile]
+    if is_large(img_bgr, tile_above):
+        return _preprocess_tiled(img_bgr, settings)
+    scratch = _scratch_gray(img_bgr.shape[:2])
+    gray = (
+        img_bgr
+        if img_bgr.ndim == 2
+        else cv2.cvtColor(img_bgr, cv2.COLOR_BGR2GRAY, dst=scratch)
+    )
+    th = _denoise(gray, settings["denoise"])
+    if th is gray:
+        th = gray.copy()
+    cv2.threshold(th, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU, dst=th)
+    return _keep(deskew(th, dst=scratch, **settings["deskew"]), scratch, th)
 
 
-def deskew(gray_or_bin):
-    """Estimate skew angle and rotate to fix it."""
-    gray = (
-        gray_or_bin
-        if len(gray_or_bin.shape) == 2
-        else cv2.cvtColor(gray_or_bin, cv2.COLOR_BGR2GRAY)
+def _sample(img_bgr, denoise=None):
+    """Downscaled gray copy of a large page and its Otsu threshold."""
+    small = _downscale(img_bgr, SAMPLE_SIDE)
+    if small.ndim == 3:
+        small = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY)
+    if denoise is not None:
+        small = denoise(small)
+    threshold, binary = cv2.threshold(
+        small, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU
+    )
+    return binary, threshold
+
+
+def _preprocess_tiled(img_bgr, settings):
+    """:func:`preprocess` for large pages, one band of rows at a time.
+
+    The Otsu threshold and the skew angle are estimated on a denoised
+    sample of at most SAMPLE_SIDE pixels instead of the full page.
+    """
+    denoise = partial(_denoise, method=settings["denoise"])
+    binary, threshold = _sample(img_bgr, denoise)
+    angle = estimate_skew(binary)
+    if abs(angle) < settings["deskew"].get("min_angle", 0.2):
+        angle = 0.0
+    return clean_tiled(img_bgr, denoise, threshold, angle)
+
+
+def _downscale(gray, max_side):
+    h, w = gray.shape[:2]
+    if max(h, w) <= max_side:
+        return gray
+    scale = max_side / max(h, w)
+    return cv2.resize(gray, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+
+
+def assess_image(img_bgr):
+    """Compute cheap statistics that predict whether cleaning will help.
+
+    - ``noise``: robust (median-based) Laplacian noise estimate on a central
+      512 px crop at full resolution, in gray levels.
+    - ``bimodality``: Otsu's between-class / total variance ratio (1 = already
+      two flat tones, as in screenshots and clean scans).
+    - ``contrast``: distance between the dark and light Otsu class means.
+    - ``skew``: estimated page skew in degrees.
+    """
+    gray = img_bgr if img_bgr.ndim == 2 else cv2.cvtColor(img_bgr, cv2.COLOR_BGR2GRAY)
+    h, w = gray.shape[:2]
+    crop = gray[
+        max(0, h // 2 - 256) : h // 2 + 256, max(0, w // 2 - 256) : w // 2 + 256
+    ]
+    response = cv2.filter2D(crop.astype(np.float32), -1, _LAPLACIAN_NOISE_KERNEL)
+    noise = 1.4826 * float(np.median(np.abs(response))) / 6
+
+    small = _downscale(gray, 1024)
+    hist = np.bincount(small.ravel(), minlength=256).astype(np.float64)
+    prob = hist / hist.sum()
+    levels = np.arange(256)
+    mean = float((prob * levels).sum())
+    variance = float((prob * (levels - mean) ** 2).sum())
+    t = int(cv2.threshold(small, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)[0])
+    w0 = float(prob[: t + 1].sum())
+    w1 = 1.0 - w0
+    bimodality = contrast = 0.0
+    if variance > 0 and w0 > 0 and w1 > 0:
+        m0 = float((prob[: t + 1] * levels[: t + 1]).sum()) / w0
+        m1 = float((prob[t + 1 :] * levels[t + 1 :]).sum()) / w1
+        bimodality = w0 * w1 * (m0 - m1) ** 2 / variance
+        contrast = (m1 - m0) / 255
+    return {
+        "noise": round(noise, 3),
+        "bimodality": round(bimodality, 3),
+        "contrast": round(contrast, 3),
+        "skew": round(estimate_skew(gray, max_side=1024), 3),
+    }
+
+
+@instrument("adaptive_preprocess")
+def adaptive_preprocess(img_bgr, tile_above=TILE_ABOVE):
+    """Run only the cleaning steps an image is likely to benefit from.
+
+    Returns the processed image and a report with the :func:`assess_image`
+    metrics and the steps taken. Clean screenshots typically skip every step
+    and are returned unchanged, without paying for denoising. Pages above
+    ``tile_above`` pixels are cleaned in bands.
+    """
+    metrics = assess_image(img_bgr)
+    denoise = metrics["noise"] > NOISE_THRESHOLD
+    binarize = (
+        denoise
+        or metrics["bimodality"] < BIMODALITY_THRESHOLD
+        or metrics["contrast"] < CONTRAST_THRESHOLD
     )
-    edges = cv2.Canny(gray, 50, 150, apertureSize=3)
-    lines = cv2.HoughLines(edges, 1, np.pi / 180, 200)
+    rotate = abs(metrics["skew"]) >= SKEW_THRESHOLD
+    steps = [
+        name
+        for name, on in (
+            ("denoise", denoise),
+            ("binarize", binarize),
+            ("deskew", rotate),
+        )
+        if on
+    ]
+    report = {"metrics": metrics, "steps": steps}
+    if not steps:
+        return img_bgr, report
+    if is_large(img_bgr, tile_above):
+        report["tiled"] = True
+        denoiser = partial(_denoise, method="nlmeans") if denoise else None
+        threshold = _sample(img_bgr, denoiser)[1] if binarize else None
+        angle = metrics["skew"] if rotate else 0.0
+        return clean_tiled(img_bgr, denoiser, threshold, angle), report
+    img = img_bgr
+    scratch = _scratch_gray(img_bgr.shape[:2])
+    if denoise or binarize:
+        gray = (
+            img_bgr
+            if img_bgr.ndim == 2
+            else cv2.cvtColor(img_bgr, cv2.COLOR_BGR2GRAY, dst=scratch)
+        )
+        if denoise:
+            img = cv2.fastNlMeansDenoising(gray, h=20)
+            cv2.threshold(img, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU, dst=img)
+        else:
+            _, img = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
+    if rotate:
+        if img.ndim == 2 and img is not img_bgr:
+            img = _keep(_rotate(img, metrics["skew"], dst=scratch), scratch, img)
+        else:
+            img = _rotate(img, metrics["skew"])
+    return img, report
+
+
+def estimate_skew(gray, max_side=None, edges=None):
+    """Estimate the page skew in degrees from near-horizontal Hough lines.
+
+    With ``max_side`` the estimate runs on a downscaled copy, which is much
+    cheaper on large scans; the Hough vote threshold is scaled to match.
+    ``edges`` is an optional buffer of ``gray``'s shape for the edge map.
+    """
+    scale = 1.0
+    h, w = gray.shape[:2]
+    if max_side and max(h, w) > max_side:
+        scale = max_side / max(h, w)
+        gray = cv2.resize(gray, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+    if edges is not None and edges.shape != gray.shape:
+        edges = None
+    edges = cv2.Canny(gray, 50, 150, edges, apertureSize=3)
+    lines = cv2.HoughLines(edges, 1, np.pi / 180, max(50, int(round(200 * scale))))
     angle = 0.0
     if lines is not None:
         angles = []
@@ -32,10 +259,38 @@ def deskew(gray_or_bin):
                 angles.append(deg - 90)
         if angles:
             angle = float(np.median(angles))
-    if abs(angle) < 0.2:
-        return gray
-    h, w = gray.shape[:2]
+    return angle
+
+
+def _rotate(img, angle, dst=None):
+    h, w = img.shape[:2]
     M = cv2.getRotationMatrix2D((w / 2, h / 2), angle, 1.0)
     return cv2.warpAffine(
-        gray, M, (w, h), flags=cv2.INTER_LINEAR, borderMode=cv2.BORDER_REPLICATE
+        img,
+        M,
+        (w, h),
+        dst=dst,
+        flags=cv2.INTER_LINEAR,
+        borderMode=cv2.BORDER_REPLICATE,
     )
+
+
+@instrument("deskew")
+def deskew(gray_or_bin, max_side=None, min_angle=0.2, dst=None):
+    """Estimate skew angle and rotate to fix it.
+
+    ``dst``, a buffer the size of the gray page, holds the edge map and then
+    the rotated page, so deskewing allocates nothing page-sized itself.
+    The input is returned when the page is straight enough.
+    """
+    gray = (
+        gray_or_bin
+        if len(gray_or_bin.shape) == 2
+        else cv2.cvtColor(gray_or_bin, cv2.COLOR_BGR2GRAY)
+    )
+    if dst is not None and dst.shape != gray.shape:
+        dst = None
+    angle = estimate_skew(gray, max_side, edges=dst)
+    if abs(angle) < min_angle:
+        return gray
+    return _rotate(gray, angle, dst=dst)
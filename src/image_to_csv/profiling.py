@@ -0,0 +1,104 @@
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+from typing import Dict, Iterable, List, Optional
+
+_events: ContextVar[Optional[list]] = ContextVar("image_to_csv_events", default=None)
+
+
+@contextmanager
+def recording(events: list):
+    """Collect stage events from instrumented calls made in this context."""
+    token = _events.set(events)
+    try:
+        yield events
+    finally:
+        _events.reset(token)
+
+
+def record_event(stage: str, wall: float, cpu: float, shape=None, **extra) -> None:
+    """Append an event to the active recording, if there is one."""
+    events = _events.get()
+    if events is None:
+        return
+    event = {"stage": stage, "wall": wall, "cpu": cpu}
+    if shape is not None:
+        event["shape"] = list(shape)
+    event.update(extra)
+    events.append(event)
+
+
+def instrument(stage: str):
+    """Decorate a pipeline function so its calls are timed while recording.
+
+    Wall time and per-thread CPU time are recorded, along with the shape of
+    the first argument when it is an image. Outside :func:`recording` the
+    wrapper only costs a context variable lookup.
+    """
+
+    def decorator(fn):
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            if _events.get() is None:
+                return fn(*args, **kwargs)
+            wall, cpu = time.perf_counter(), time.thread_time()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                record_event(
+                    stage,
+                    time.perf_counter() - wall,
+                    time.thread_time() - cpu,
+                    getattr(args[0], "shape", None) if args else None,
+                )
+
+        return wrapper
+
+    return decorator
+
+
+def percentiles(values: List[float]) -> Dict[str, float]:
+    """The p50, p90 and p99 of ``values`` and their maximum."""
+    import numpy as np
+
+    arr = np.asarray(values, dtype=float)
+    p50, p90, p99 = np.percentile(arr, [50, 90, 99])
+    return {"p50": p50, "p90": p90, "p99": p99, "max": float(arr.max())}
+
+
+def summarize(records: Iterable[dict]) -> str:
+    """Format per-stage wall-time percentiles, mean CPU and route counts.
+
+    The CPU column is per-thread CPU time, so work done in child processes
+    (the Tesseract binary) only shows up in wall time.
+    """
+    wall: Dict[str, List[float]] = {}
+    cpu: Dict[str, List[float]] = {}
+    routes: Dict[str, int] = {}
+    totals: List[float] = []
+    for rec in records:
+        totals.append(rec.get("seconds", 0.0))
+        route = rec.get("route") or "unknown"
+        routes[route] = routes.get(route, 0) + 1
+        for ev in rec.get("events") or []:
+            wall.setdefault(ev["stage"], []).append(ev["wall"])
+            cpu.setdefault(ev["stage"], []).append(ev["cpu"])
+    if not totals:
+        return "No images profiled."
+    import numpy as np
+
+    header = f"{'stage':<24}{'calls':>7}{'p50 ms':>10}{'p90 ms':>10}"
+    header += f"{'p99 ms':>10}{'max ms':>10}{'cpu ms':>10}"
+    lines = [header]
+    stages = sorted(wall, key=lambda s: -sum(wall[s]))
+    for stage, values in [("image (total)", totals)] + [(s, wall[s]) for s in stages]:
+        pct = percentiles(values)
+        mean_cpu = f"{np.mean(cpu[stage]) * 1000:.1f}" if stage in cpu else "-"
+        lines.append(
+            f"{stage:<24}{len(values):>7}"
+            + "".join(f"{pct[k] * 1000:>10.1f}" for k in ("p50", "p90", "p99", "max"))
+            + f"{mean_cpu:>10}"
+        )
+    lines.append("routes: " + ", ".join(f"{k}={v}" for k, v in sorted(routes.items())))
+    return "\n".join(lines)
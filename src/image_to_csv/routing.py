@@ -0,0 +1,79 @@
+from dataclasses import dataclass, field
+from typing import List, Optional
+
+import numpy as np
+import pandas as pd
+
+from .grid import Lattice, find_cells, ink_mask
+from .profiling import instrument
+from .templates import find_cells as find_known_cells
+
+# Pages with less ink than this fraction are blank: only the cheapest engine
+# is tried and nothing is escalated.
+BLANK_PAGE_INK = 0.001
+# A table passes the structural checks with at least MIN_COLUMNS columns, at
+# most MAX_EMPTY_CELLS of its cells empty and at most MAX_RAGGED_ROWS of its
+# rows more than half empty.
+MIN_COLUMNS = 2
+MAX_EMPTY_CELLS = 0.5
+MAX_RAGGED_ROWS = 0.3
+
+
+@dataclass
+class PagePlan:
+    """Engines to try for one page, cheapest first, and what decided them."""
+
+    engines: List[str]
+    features: dict = field(default_factory=dict)
+    lattice: Optional[Lattice] = None
+
+
+@instrument("classify_page")
+def classify_page(img, templates: bool = False) -> PagePlan:
+    """Pick the engines likely to read ``img``, from cheapest to most costly.
+
+    Ruled pages start with the ``grid`` engine, other pages with the
+    Tesseract word-box grid; both escalate to Paddle. Blank pages only get
+    the word-box pass. With ``templates`` the lattice of a known layout is
+    reused (see ``templates.find_cells``).
+    """
+    ink = ink_mask(img)
+    density = float(np.count_nonzero(ink)) / max(ink.size, 1)
+    features: dict = {"ink": round(density, 4)}
+    if density < BLANK_PAGE_INK:
+        return PagePlan(["tesseract-tsv"], features)
+    if templates:
+        lattice = find_known_cells(img, ink)
+    else:
+        lattice = find_cells(img, ink)
+    features["ruled"] = lattice is not None
+    if lattice is None:
+        return PagePlan(["tesseract-tsv", "paddle"], features)
+    features["cells"] = [lattice.rows, lattice.cols]
+    return PagePlan(["grid", "tesseract-tsv", "paddle"], features, lattice)
+
+
+def check_table(df: pd.DataFrame) -> Optional[str]:
+    """Return why ``df`` does not look like a parsed table, or None if it does.
+
+    Columns starting with ``_`` are bookkeeping and are ignored.
+    """
+    cols = [c for c in df.columns if not str(c).startswith("_")]
+    if cols == ["text"]:
+        return "no table structure"
+    if len(cols) < MIN_COLUMNS:
+        return f"{len(cols)} column(s)"
+    if df.empty:
+        return "no data rows"
+    values = df[cols]
+    blank = (
+        values.isna().to_numpy()
+        | (values.astype(str).apply(lambda s: s.str.strip()) == "").to_numpy()
+    )
+    empty = float(blank.mean())
+    if empty > MAX_EMPTY_CELLS:
+        return f"{empty:.0%} empty cells"
+    ragged = float((blank.mean(axis=1) > 0.5).mean())
+    if ragged > MAX_RAGGED_ROWS:
+        return f"{ragged:.0%} ragged rows"
+    return None
@@ -0,0 +1,440 @@
+import http.client
+import json
+import os
+import queue
+import socket
+import socketserver
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from dataclasses import replace
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Any, Callable, Deque, Dict, List, Optional, Tuple, Union
+from urllib.parse import parse_qs, urlencode, urlsplit
+
+import typer
+
+from . import pipeline
+
+FORMATS = ("csv", "json")
+# Request bodies larger than this are refused with 413 unless the server is
+# given another limit.
+MAX_BODY_BYTES = 64 * 1024 * 1024
+
+# convert(path, data, engine, options) -> DataFrame. ``data`` is None when the
+# client sent a path instead of image bytes; ``options`` holds per-request
+# overrides such as ``clean`` and ``preprocess``.
+Converter = Callable[[Path, Optional[bytes], Any, Dict[str, str]], Any]
+
+
+class ServerBusy(RuntimeError):
+    """Raised when every engine is busy and the wait queue is full."""
+
+
+def parse_address(text: str) -> Tuple[str, Union[str, Tuple[str, int]]]:
+    """Split ``host:port``, ``http://host:port`` or ``unix:/path`` into parts."""
+    if text.startswith("unix:"):
+        return "unix", text[len("unix:") :]
+    if "://" in text:
+        text = text.split("://", 1)[1]
+    host, _, port = text.rstrip("/").rpartition(":")
+    try:
+        return "tcp", (host or "127.0.0.1", int(port))
+    except ValueError:
+        raise ValueError(f"Expected host:port or unix:/path, got {text!r}")
+
+
+class EnginePool:
+    """A fixed set of warm OCR engines shared by the request threads.
+
+    At most ``size`` conversions run at once, one per engine. Up to
+    ``queue_size`` more requests wait for an engine to come free; beyond that
+    :meth:`acquire` raises :class:`ServerBusy` so clients can back off instead
+    of piling up on the server.
+    """
+
+    def __init__(
+        self,
+        factory: Optional[Callable[[], Any]],
+        size: int = 1,
+        queue_size: int = 16,
+    ):
+        self.size = max(1, size)
+        self._idle: queue.Queue = queue.Queue()
+        for _ in range(self.size):
+            self._idle.put(factory() if factory is not None else None)
+        self._slots = threading.BoundedSemaphore(self.size + max(0, queue_size))
+        self._lock = threading.Lock()
+        self.in_flight = 0
+        self.waiting = 0
+
+    @contextmanager
+    def acquire(self):
+        if not self._slots.acquire(blocking=False):
+            raise ServerBusy("All engines are busy and the request queue is full")
+        try:
+            with self._lock:
+                self.waiting += 1
+            engine = self._idle.get()
+            with self._lock:
+                self.waiting -= 1
+                self.in_flight += 1
+            try:
+                yield engine
+            finally:
+                with self._lock:
+                    self.in_flight -= 1
+                self._idle.put(engine)
+        finally:
+            self._slots.release()
+
+
+class Metrics:
+    """Request counters and recent conversion latencies for ``/metrics``."""
+
+    def __init__(self, window: int = 1024):
+        self._lock = threading.Lock()
+        self._latencies: Deque[float] = deque(maxlen=window)
+        self.counts = {"requests": 0, "succeeded": 0, "failed": 0, "rejected": 0}
+        self.started = time.time()
+
+    def count(self, outcome: str, seconds: Optional[float] = None) -> None:
+        with self._lock:
+            self.counts["requests"] += 1
+            self.counts[outcome] += 1
+            if seconds is not None:
+                self._latencies.append(seconds)
+
+    def snapshot(self, pool: EnginePool) -> dict:
+        from .profiling import percentiles
+
+        with self._lock:
+            latencies = list(self._latencies)
+            snap: Dict[str, Any] = dict(self.counts)
+        snap.update(
+            uptime=time.time() - self.started,
+            engines=pool.size,
+            in_flight=pool.in_flight,
+            queued=pool.waiting,
+        )
+        if latencies:
+            pct = percentiles(latencies)
+            snap["latency_ms"] = {k: round(v * 1000, 1) for k, v in pct.items()}
+        return snap
+
+
+def pipeline_converter(settings: pipeline.Settings) -> Converter:
+    """Build the conversion callback around the server's defaults.
+
+    Requests may override ``preprocess``, ``clean``, ``tables`` (first or
+    all), ``tile_above``, ``dpi`` and ``templates``. The engine is fixed
+    because the pool holds engines of a single kind, so a request naming
+    another ``engine`` is refused. Every page of a document is converted.
+    """
+    from .preprocess import PROFILES
+
+    def convert(path: Path, data: Optional[bytes], ocr_engine, options: dict):
+        changes: Dict[str, Any] = {}
+        if options.get("engine", settings.engine) != settings.engine:
+            raise ValueError(
+                f"This server runs the {settings.engine} engine, "
+                f"not {options['engine']}"
+            )
+        if "preprocess" in options:
+            if options["preprocess"] not in PROFILES:
+                raise ValueError(
+                    f"Unknown preprocess profile {options['preprocess']!r}"
+                )
+            changes["preprocess_profile"] = options["preprocess"]
+        if "tables" in options:
+            if options["tables"] not in ("first", "all"):
+                raise ValueError(f"Unknown tables mode {options['tables']!r}")
+            changes["tables"] = options["tables"]
+        for name in ("clean", "templates"):
+            if name in options:
+                changes[name] = options[name] not in ("0", "false", "no")
+        if "tile_above" in options:
+            changes["tile_above"] = int(options["tile_above"])
+        if "dpi" in options:
+            changes["dpi"] = int(options["dpi"]) or None
+        request_settings = replace(settings, **changes)
+        return pipeline.convert_path(
+            path, request_settings, data, paddle_engine=ocr_engine
+        )
+
+    return convert
+
+
+def engine_factory(engine: str) -> Optional[Callable[[], Any]]:
+    """Engine factory for an :class:`EnginePool`, or None when it needs no engines.
+
+    ``paddle`` and ``auto`` (which escalates to Paddle) get one Paddle engine
+    per worker, so concurrent requests never share one. If Paddle is not
+    installed, ``auto`` runs without it and reports the Paddle step as failed.
+    """
+    from . import ocr
+
+    if engine == "paddle":
+        return ocr.create_paddle_engine
+    if engine != "auto":
+        return None
+    unavailable: List[str] = []
+
+    def create():
+        if unavailable:
+            return None
+        try:
+            return ocr.create_paddle_engine()
+        except RuntimeError as exc:
+            unavailable.append(str(exc))
+            typer.echo(f"Paddle unavailable, routing without it: {exc}", err=True)
+            return None
+
+    return create
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def address_string(self) -> str:
+        # Unix sockets have no (host, port) client address.
+        return str(self.client_address[0]) if self.client_address else "unix"
+
+    def log_message(self, format, *args):
+        if self.server.verbose:  # type: ignore[attr-defined]
+            super().log_message(format, *args)
+
+    def _send(self, status: int, body: bytes, content_type: str, **headers) -> None:
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in headers.items():
+            self.send_header(name.replace("_", "-"), value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _send_json(self, status: int, payload: dict, **headers) -> None:
+        body = json.dumps(payload).encode("utf-8")
+        self._send(status, body, "application/json", **headers)
+
+    def do_GET(self):
+        state = self.server.state  # type: ignore[attr-defined]
+        route = urlsplit(self.path).path
+        if route == "/health":
+            self._send_json(
+                200,
+                {
+                    "status": "ok",
+                    "engine": state["engine"],
+                    "engines": state["pool"].size,
+                    "busy": state["pool"].in_flight,
+                },
+            )
+        elif route == "/metrics":
+            self._send_json(200, state["metrics"].snapshot(state["pool"]))
+        else:
+            self._send_json(404, {"error": f"No such endpoint: {route}"})
+
+    def do_POST(self):
+        state = self.server.state  # type: ignore[attr-defined]
+        url = urlsplit(self.path)
+        try:
+            length = int(self.headers.get("Content-Length") or 0)
+        except ValueError:
+            length = -1
+        if length < 0:
+            self.close_connection = True
+            self._send_json(400, {"error": "Invalid Content-Length"})
+            return
+        if length > state["max_body"]:
+            # The body is left unread, so the connection cannot be reused.
+            self.close_connection = True
+            self._send_json(
+                413, {"error": f"Request body exceeds {state['max_body']} bytes"}
+            )
+            return
+        body = self.rfile.read(length)
+        if url.path != "/convert":
+            self._send_json(404, {"error": f"No such endpoint: {url.path}"})
+            return
+        params = {k: v[-1] for k, v in parse_qs(url.query).items()}
+        fmt = params.pop("format", "csv")
+        if fmt not in FORMATS:
+            self._send_json(400, {"error": f"format must be one of {FORMATS}"})
+            return
+        data: Optional[bytes] = body
+        if self.headers.get_content_type() == "application/json":
+            root: Optional[Path] = state["allow_paths"]
+            if root is None:
+                self._send_json(403, {"error": "This server does not accept paths"})
+                return
+            try:
+                path = Path(json.loads(body)["path"])
+            except (ValueError, KeyError, TypeError):
+                self._send_json(400, {"error": 'Expected a JSON body {"path": ...}'})
+                return
+            path = (root / path).resolve()
+            if not path.is_relative_to(root):
+                self._send_json(403, {"error": f"Path is outside {root}"})
+                return
+            data = None
+        else:
+            path = Path(params.pop("name", "upload"))
+        metrics: Metrics = state["metrics"]
+        start = time.perf_counter()
+        try:
+            with state["pool"].acquire() as engine:
+                df = state["convert"](path, data, engine, params)
+        except ServerBusy as exc:
+            metrics.count("rejected")
+            self._send_json(503, {"error": str(exc)}, Retry_After="1")
+            return
+        except Exception as exc:
+            metrics.count("failed", time.perf_counter() - start)
+            self._send_json(422, {"error": f"{type(exc).__name__}: {exc}"})
+            return
+        seconds = time.perf_counter() - start
+        metrics.count("succeeded", seconds)
+        if fmt == "csv":
+            text = df.to_csv(index=False)
+            self._send(200, text.encode("utf-8"), "text/csv; charset=utf-8")
+            return
+        table = json.loads(df.to_json(orient="split", index=False))
+        self._send_json(200, {"name": path.name, "seconds": seconds, **table})
+
+
+class _ServerState:
+    state: dict
+    verbose: bool = False
+
+
+class _TCPServer(_ServerState, ThreadingHTTPServer):
+    daemon_threads = True
+
+
+class _UnixServer(
+    _ServerState, socketserver.ThreadingMixIn, socketserver.UnixStreamServer
+):
+    daemon_threads = True
+
+
+def make_server(
+    address: str,
+    convert: Converter,
+    pool: EnginePool,
+    engine: str,
+    verbose: bool = False,
+    allow_paths: Optional[Path] = None,
+    max_body: int = MAX_BODY_BYTES,
+):
+    """Bind the OCR HTTP server to ``address`` without starting it.
+
+    Clients may only send a ``{"path": ...}`` body when ``allow_paths`` is
+    set, and only for files under that directory (relative paths are taken
+    from it). Bodies larger than ``max_body`` bytes are refused with 413.
+    Call ``serve_forever()`` on the result, and :func:`close_server` when done.
+    """
+    kind, where = parse_address(address)
+    server: Union[_TCPServer, _UnixServer]
+    if kind == "unix":
+        assert isinstance(where, str)
+        if os.path.exists(where):
+            os.unlink(where)  # stale socket left by a previous run
+        server = _UnixServer(where, _Handler)
+    else:
+        assert isinstance(where, tuple)
+        server = _TCPServer(where, _Handler)
+    server.state = {
+        "convert": convert,
+        "pool": pool,
+        "engine": engine,
+        "metrics": Metrics(),
+        "allow_paths": None if allow_paths is None else Path(allow_paths).resolve(),
+        "max_body": max_body,
+    }
+    server.verbose = verbose
+    return server
+
+
+def server_url(server) -> str:
+    if isinstance(server.server_address, str):
+        return f"unix:{server.server_address}"
+    host, port = server.server_address[:2]
+    return f"{host}:{port}"
+
+
+def close_server(server) -> None:
+    server.server_close()
+    if isinstance(server.server_address, str) and os.path.exists(server.server_address):
+        os.unlink(server.server_address)
+
+
+class _UnixHTTPConnection(http.client.HTTPConnection):
+    def __init__(self, path: str, timeout: Optional[float] = None):
+        super().__init__("localhost", timeout=timeout)
+        self._socket_path = path
+
+    def connect(self):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        if self.timeout is not None:
+            self.sock.settimeout(self.timeout)
+        self.sock.connect(self._socket_path)
+
+
+def request(
+    address: str,
+    method: str,
+    path: str,
+    body: Optional[bytes] = None,
+    headers: Optional[Dict[str, str]] = None,
+    timeout: Optional[float] = 600,
+) -> Tuple[int, bytes]:
+    """Send one request to a running server and return its status and body."""
+    kind, where = parse_address(address)
+    conn: http.client.HTTPConnection
+    if kind == "unix":
+        assert isinstance(where, str)
+        conn = _UnixHTTPConnection(where, timeout=timeout)
+    else:
+        assert isinstance(where, tuple)
+        conn = http.client.HTTPConnection(*where, timeout=timeout)
+    try:
+        conn.request(method, path, body=body, headers=headers or {})
+        resp = conn.getresponse()
+        return resp.status, resp.read()
+    finally:
+        conn.close()
+
+
+def convert_remote(
+    address: str,
+    data: bytes,
+    name: str,
+    fmt: str = "csv",
+    timeout: Optional[float] = 600,
+    **options,
+) -> bytes:
+    """Convert image bytes on a running server and return the response body.
+
+    ``options`` (``clean``, ``preprocess``, ``tables``, ...) override the
+    server's defaults for this request. Raises RuntimeError with the
+    server's message on failure.
+    """
+    query = urlencode({"format": fmt, "name": name, **options})
+    status, body = request(
+        address,
+        "POST",
+        f"/convert?{query}",
+        body=data,
+        headers={"Content-Type": "application/octet-stream"},
+        timeout=timeout,
+    )
+    if status != 200:
+        try:
+            message = json.loads(body)["error"]
+        except (ValueError, KeyError, TypeError):
+            message = body.decode("utf-8", "replace")
+        raise RuntimeError(f"Server returned {status}: {message}")
+    return body
@@ -0,0 +1,45 @@
+from collections import deque
+from concurrent.futures import Executor, ThreadPoolExecutor
+from typing import Callable, Iterable, Iterator, Optional, TypeVar
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+
+def bounded_map(
+    fn: Callable[[T], R],
+    items: Iterable[T],
+    workers: int = 1,
+    max_pending: Optional[int] = None,
+    executor: Optional[Executor] = None,
+) -> Iterator[R]:
+    """Apply ``fn`` to ``items`` on a thread pool, yielding results in input order.
+
+    At most ``max_pending`` items (default ``2 * workers``) are in flight or
+    waiting to be consumed at any time, and the next input is only pulled once
+    a slot frees up. Chaining several calls therefore builds a pipeline whose
+    stages overlap while a slow consumer applies backpressure all the way up,
+    so a fast decoder cannot buffer more than a few images ahead.
+
+    Pass ``executor`` (a process pool, say) to run ``fn`` there instead; it is
+    left open, and ``workers`` then only sizes the window.
+    """
+    workers = max(1, workers)
+    max_pending = max(1, max_pending or 2 * workers)
+    if executor is not None:
+        yield from _submit_bounded(executor, fn, items, max_pending)
+        return
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        yield from _submit_bounded(pool, fn, items, max_pending)
+
+
+def _submit_bounded(
+    pool: Executor, fn: Callable[[T], R], items: Iterable[T], max_pending: int
+) -> Iterator[R]:
+    pending: deque = deque()
+    for item in items:
+        pending.append(pool.submit(fn, item))
+        if len(pending) >= max_pending:
+            yield pending.popleft().result()
+    while pending:
+        yield pending.popleft().result()
@@ -1,21 +1,183 @@
 import io
 import logging
 import re
+from itertools import zip_longest
+import numpy as np
 import pandas as pd
-from typing import Dict, List
+from lxml import etree
+from pandas.errors import EmptyDataError
+from pandas.io.parsers import TextParser
+from typing import Dict, Iterable, List, Optional, Tuple, Union
+
+from .profiling import instrument
 
 logger = logging.getLogger(__name__)
 
 
-def html_to_df(html: str) -> pd.DataFrame:
-    """Convert OCR HTML table output into a DataFrame."""
-    dfs = pd.read_html(io.StringIO(html))
+# Whitespace runs collapsed inside cell text, as pandas.read_html does.
+_CELL_WS_RE = re.compile(r"[\r\n]+|\s{2,}")
+_ANY_TEXT_RE = re.compile(r".+")
+
+
+def _cells(tr) -> list:
+    return [td for td in tr if td.tag == "td" or td.tag == "th"]
+
+
+def _expand_spans(rows) -> List[List[str]]:
+    """Cell text of ``<tr>`` elements with row/colspans copied into every slot.
+
+    Text is stripped and inner whitespace runs collapsed as it is read.
+    """
+    out: List[List[str]] = []
+    # (column, text, rows left) for cells spanning down from earlier rows.
+    carried: List[Tuple[int, str, int]] = []
+    for tr in rows:
+        texts: List[str] = []
+        pending: List[Tuple[int, str, int]] = []
+        for td in tr:
+            if td.tag != "td" and td.tag != "th":
+                continue
+            while carried and carried[0][0] <= len(texts):
+                col, text, left = carried.pop(0)
+                texts.append(text)
+                if left > 1:
+                    pending.append((col, text, left - 1))
+            text = (td.text or "") if len(td) == 0 else td.xpath("string()")
+            text = _CELL_WS_RE.sub(" ", text.strip())
+            rowspan = colspan = 1
+            if td.attrib:
+                rowspan = int(td.get("rowspan") or 1)
+                colspan = int(td.get("colspan") or 1)
+            for _ in range(colspan):
+                if rowspan > 1:
+                    pending.append((len(texts), text, rowspan - 1))
+                texts.append(text)
+        for col, text, left in carried:
+            texts.append(text)
+            if left > 1:
+                pending.append((col, text, left - 1))
+        out.append(texts)
+        carried = pending
+    while carried:
+        out.append([text for _, text, _ in carried])
+        carried = [(col, text, left - 1) for col, text, left in carried if left > 1]
+    return out
+
+
+def _table_rows(table) -> Tuple[List[List[str]], List[List[str]]]:
+    """Split a ``<table>`` into header rows and body rows (footer included)."""
+    head = []
+    for thead in table.xpath(".//thead"):
+        head.extend(thead.xpath("./tr"))
+        if _cells(thead):
+            head.append(thead)  # cells directly under <thead>, missing <tr>
+    body = table.xpath(".//tbody//tr") + table.xpath("./tr")
+    if not head:
+        while body and all(td.tag == "th" for td in _cells(body[0])):
+            head.append(body.pop(0))
+    foot = _expand_spans(table.xpath(".//tfoot//tr"))
+    return _expand_spans(head), _expand_spans(body) + foot
+
+
+def _rows_to_df(head: List[List[str]], body: List[List[str]]) -> Optional[pd.DataFrame]:
+    """Build a table the way read_html does, or None if it has no cells."""
+    rows = head + body
+    header: Union[None, int, List[int]] = None
+    if len(head) == 1:
+        header = 0
+    elif head:
+        header = [i for i, row in enumerate(head) if any(row)]
+    width = max((len(row) for row in rows), default=0)
+    for row in rows:
+        row.extend([""] * (width - len(row)))
+    # TextParser applies read_html's type inference (numbers, NaN, booleans).
+    try:
+        with TextParser(rows, header=header, thousands=",") as parser:
+            df = parser.read()
+    except EmptyDataError:
+        return None
+    return df.rename(columns=lambda c: str(c).strip())
+
+
+def _hidden(elem) -> bool:
+    return "display:none" in (elem.get("style") or "").replace(" ", "")
+
+
+def _drop(elem) -> None:
+    """Remove ``elem`` and its children but keep the text that follows it."""
+    parent, prev = elem.getparent(), elem.getprevious()
+    if elem.tail:
+        if prev is not None:
+            prev.tail = (prev.tail or "") + elem.tail
+        else:
+            parent.text = (parent.text or "") + elem.tail
+    parent.remove(elem)
+
+
+def _parse_html_tables(html: str) -> List[pd.DataFrame]:
+    """Parse every ``<table>`` in ``html`` in one pass over the lxml tree.
+
+    Matches ``pd.read_html`` plus the cell stripping this module used to do
+    with ``applymap``: ``<thead>`` or leading all-``<th>`` rows become the
+    header, spans are expanded, ragged rows are padded and tables without
+    text or cells are skipped. Cell text is stripped while it is extracted,
+    so no per-cell pass over the DataFrame is needed.
+    """
+    root = etree.fromstring(html, etree.HTMLParser()) if html else None
+    if root is None:
+        raise RuntimeError("Could not parse table HTML from OCR.")
+    for br in root.iter("br"):
+        br.tail = "\n" + (br.tail or "")
+    dfs = []
+    tables = [
+        table
+        for table in root.iter("table")
+        if any(_ANY_TEXT_RE.search(text) for text in table.itertext())
+        and not _hidden(table)
+    ]
+    for table in tables:
+        for elem in table.xpath(".//style|.//*[@style]"):
+            if elem.tag == "style" or _hidden(elem):
+                _drop(elem)
+        df = _rows_to_df(*_table_rows(table))
+        if df is not None:
+            dfs.append(df)
     if not dfs:
         raise RuntimeError("Could not parse table HTML from OCR.")
-    df = dfs[0]
-    df = df.rename(columns=lambda c: str(c).strip())
-    df = df.applymap(lambda x: str(x).strip() if isinstance(x, str) else x)
-    return df
+    return dfs
+
+
+def read_html_tables(html: str) -> List[pd.DataFrame]:
+    """The ``pd.read_html`` parser :func:`html_to_dfs` replaced.
+
+    Kept as the reference for parity tests and ``bench``.
+    """
+    dfs = pd.read_html(io.StringIO(html))
+    return [
+        df.rename(columns=lambda c: str(c).strip()).map(
+            lambda x: x.strip() if isinstance(x, str) else x
+        )
+        for df in dfs
+    ]
+
+
+@instrument("html_to_df")
+def html_to_df(html: str) -> pd.DataFrame:
+    """Convert OCR HTML table output into a DataFrame (first table only)."""
+    return _parse_html_tables(html)[0]
+
+
+@instrument("html_to_dfs")
+def html_to_dfs(html: str) -> List[pd.DataFrame]:
+    """Convert every table in OCR HTML output into a DataFrame."""
+    return _parse_html_tables(html)
+
+
+@instrument("cells_to_df")
+def cells_to_df(cells: List[List[str]]) -> pd.DataFrame:
+    """Convert a grid of cell text, header row first, into a DataFrame."""
+    headers = [str(c).strip() or f"Column {i+1}" for i, c in enumerate(cells[0])]
+    return pd.DataFrame(cells[1:], columns=headers)
 
 
 _SPLIT_RE = re.compile(r"\s{2,}|\t")
@@ -34,61 +196,176 @@ def _tokenize(line: str):
         parts = [p.strip() for p in stripped.split(",")]
         if any(parts):
             return parts, True
-    parts = [p.strip() for p in _SPLIT_RE.split(stripped) if p.strip()]
+    # Whitespace runs are consumed whole, so on a stripped line every part
+    # is already non-empty and stripped.
+    parts = _SPLIT_RE.split(stripped)
     if len(parts) > 1:
         return parts, True
     parts = stripped.split()
     return parts, False
 
 
-def lines_to_df(lines: List[str]) -> pd.DataFrame:
-    """Convert raw text lines into a simple table DataFrame."""
-    rows = []
-    indexed_rows = []
-    reliable_rows = []
-    for idx, ln in enumerate(lines):
-        tokens, reliable = _tokenize(ln)
-        rows.append({"tokens": tokens, "reliable": reliable})
-        if len(tokens) >= 2:
-            indexed_rows.append((idx, tokens))
-            if reliable:
-                reliable_rows.append((idx, tokens))
-    if len(indexed_rows) < 2:
-        clean = [ln.strip() for ln in lines if ln.strip()]
+def _scan_lines(lines: Iterable[str]):
+    """Tokenize ``lines`` in one pass, keeping only what the table needs.
+
+    Returns the token lists, their widths and reliability as arrays, and the
+    stripped non-empty lines for the plain-text fallback. The fallback is
+    dropped (None) as soon as two multi-token rows make it unreachable, so a
+    long stream does not keep its raw lines around.
+    """
+    tokens: List[List[str]] = []
+    reliable: List[bool] = []
+    text: Optional[List[str]] = []
+    multi = 0
+    for ln in lines:
+        toks, rel = _tokenize(ln)
+        tokens.append(toks)
+        reliable.append(rel)
+        if text is not None and toks:
+            multi += len(toks) >= 2
+            if multi >= 2:
+                text = None
+            else:
+                text.append(ln.strip())
+    widths = np.fromiter(map(len, tokens), dtype=int, count=len(tokens))
+    return tokens, widths, np.array(reliable, dtype=bool), text
+
+
+@instrument("lines_to_df")
+def lines_to_df(lines: Iterable[str]) -> pd.DataFrame:
+    """Convert raw text lines into a simple table DataFrame.
+
+    ``lines`` may be any iterable, such as an open file or a generator; it is
+    read once, line by line. The most common width among the multi-token
+    rows (delimited rows preferred) is the column count and the first row of
+    that width is the header. Rows below it are padded or truncated to fit.
+    Without two multi-token rows the stripped lines come back in a single
+    ``text`` column.
+    """
+    tokens, widths, reliable, text = _scan_lines(lines)
+    if text is not None:
         return (
-            pd.DataFrame(clean, columns=["text"])
-            if clean
+            pd.DataFrame(text, columns=["text"])
+            if text
             else pd.DataFrame(columns=["text"])
         )
 
-    candidates = reliable_rows or indexed_rows
+    candidates = widths >= 2
+    if (candidates & reliable).any():
+        candidates &= reliable
+    counts = np.bincount(widths[candidates])
+    # Most common width; ties go to the wider one.
+    target_width = len(counts) - 1 - int(np.argmax(counts[::-1]))
 
-    width_counts: Dict[int, int] = {}
-    for _, row in candidates:
-        width_counts[len(row)] = width_counts.get(len(row), 0) + 1
-    target_width = max(width_counts, key=lambda k: (width_counts[k], k))
+    header_idx = int(np.flatnonzero(candidates & (widths == target_width))[0])
+    headers = [
+        str(c).strip() or f"Column {i+1}"
+        for i, c in enumerate(tokens[header_idx][:target_width])
+    ]
 
-    header_idx = next(
-        (idx for idx, row in candidates if len(row) == target_width), candidates[0][0]
-    )
-    headers = rows[header_idx]["tokens"][:target_width]
-    headers = [str(c).strip() or f"Column {i+1}" for i, c in enumerate(headers)]
-
-    data_rows = []
-    for row_info in rows[header_idx + 1 :]:
-        row = row_info["tokens"]
-        if not row:
-            continue
-        cur = row[:target_width]
-        if len(cur) < target_width:
-            cur.extend([""] * (target_width - len(cur)))
-        elif len(row) > target_width:
+    body_idx = header_idx + 1 + np.flatnonzero(widths[header_idx + 1 :])
+    if not len(body_idx):
+        logger.warning("No data rows detected after header; returning empty DataFrame")
+        return pd.DataFrame(columns=headers)
+    if logger.isEnabledFor(logging.DEBUG):
+        for width in widths[body_idx][widths[body_idx] > target_width]:
             logger.debug(
-                "Truncating row with width %s to %s columns", len(row), target_width
+                "Truncating row with width %s to %s columns", width, target_width
             )
-        data_rows.append(cur)
+    body = [tokens[i] for i in body_idx]
+    columns = list(zip_longest(*body, fillvalue=""))[:target_width]
+    blank = ("",) * len(body)
+    columns.extend(blank for _ in range(target_width - len(columns)))
+    df = pd.DataFrame(dict(enumerate(columns)))
+    df.columns = pd.Index(headers)
+    return df
 
-    if not data_rows:
+
+# Words in the same row whose horizontal gap is below this many median word
+# heights belong to the same cell; wider gaps separate columns.
+WORD_GAP = 1.0
+
+
+@instrument("words_to_df")
+def words_to_df(words: Dict[str, list]) -> pd.DataFrame:
+    """Build a table from Tesseract word boxes by clustering their positions.
+
+    ``words`` holds parallel ``text``/``left``/``top``/``width``/``height``
+    lists as returned by ``ocr.ocr_words_tesseract``. Words are grouped into
+    rows by vertical centre and joined into cells where the gap between them
+    is small. Column bands come from the rows with the most common cell count
+    (the table body), merged where they overlap, and every cell is placed in
+    the nearest band. As in :func:`lines_to_df`, the first such row is the
+    header and anything above it is dropped.
+    """
+    text = np.asarray(words.get("text") or [], dtype=object)
+    if not len(text):
+        return pd.DataFrame(columns=["text"])
+    left = np.asarray(words["left"], dtype=float)
+    top = np.asarray(words["top"], dtype=float)
+    height = np.asarray(words["height"], dtype=float)
+    right = left + np.asarray(words["width"], dtype=float)
+    line_h = max(float(np.median(height)), 1.0)
+
+    # Rows: sort by vertical centre and cut wherever it jumps by half a line.
+    centre = top + height / 2
+    order = np.argsort(centre, kind="stable")
+    row = np.empty(len(text), dtype=int)
+    row[order] = np.concatenate(([0], np.cumsum(np.diff(centre[order]) > line_h / 2)))
+
+    # Cells: consecutive words in a row separated by less than WORD_GAP.
+    order = np.lexsort((left, row))
+    gap = left[order][1:] - right[order][:-1]
+    new_cell = (np.diff(row[order]) != 0) | (gap > WORD_GAP * line_h)
+    cells = (
+        pd.DataFrame(
+            {
+                "cell": np.concatenate(([0], np.cumsum(new_cell))),
+                "row": row[order],
+                "left": left[order],
+                "right": right[order],
+                "text": text[order],
+            }
+        )
+        .groupby("cell", sort=True)
+        .agg(
+            row=("row", "first"),
+            left=("left", "min"),
+            right=("right", "max"),
+            text=("text", " ".join),
+        )
+    )
+
+    counts = cells.groupby("row").size()
+    multi = counts[counts >= 2]
+    if len(multi) < 2:
+        lines = cells.groupby("row")["text"].agg(" ".join)
+        return pd.DataFrame({"text": lines.to_list()})
+    freq = multi.value_counts()
+    target_width = max(freq.index, key=lambda k: (freq[k], k))
+    body_rows = multi.index[multi == target_width]
+
+    # Column bands: merge the overlapping x-extents of the body cells.
+    body = cells[cells["row"].isin(body_rows)].sort_values("left")
+    lo, hi = body["left"].to_numpy(), body["right"].to_numpy()
+    reach = np.maximum.accumulate(hi)
+    band = np.concatenate(([0], np.cumsum(lo[1:] > reach[:-1])))
+    band_lo = pd.Series(lo).groupby(band).min().to_numpy()
+    band_hi = pd.Series(hi).groupby(band).max().to_numpy()
+
+    table = cells[cells["row"] >= body_rows.min()]
+    mid = ((table["left"] + table["right"]) / 2).to_numpy()[:, None]
+    dist = np.maximum(np.maximum(band_lo - mid, mid - band_hi), 0)
+    grid = (
+        table.assign(col=dist.argmin(axis=1))
+        .groupby(["row", "col"], sort=True)["text"]
+        .agg(" ".join)
+        .unstack("col")
+        .reindex(columns=range(len(band_lo)))
+        .fillna("")
+    )
+    headers = [str(c).strip() or f"Column {i+1}" for i, c in enumerate(grid.iloc[0])]
+    if len(grid) < 2:
         logger.warning("No data rows detected after header; returning empty DataFrame")
         return pd.DataFrame(columns=headers)
-    return pd.DataFrame(data_rows, columns=headers)
+    return pd.DataFrame(grid.iloc[1:].to_numpy(), columns=headers)
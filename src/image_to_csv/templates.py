@@ -0,0 +1,215 @@
+import threading
+from dataclasses import dataclass
+from typing import List, Optional, Tuple
+
+import cv2
+import numpy as np
+
+from .grid import Lattice, blank_cells, ink_mask, line_positions
+from .grid import find_cells as detect_cells
+from .profiling import instrument
+
+# Layouts and pages remembered per process, most recently used first.
+MAX_TEMPLATES = 32
+MAX_PAGES = 32
+# Once the shift between two pages is taken out, each ruling may sit this
+# many pixels from the template's.
+TOLERANCE = 3
+# Pages whose 64-bit fingerprints differ in at most this many bits are
+# compared pixel by pixel to confirm they are duplicates.
+HASH_BITS = 10
+
+
+def _rulings(ink: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Row and column positions of the ruling lines of an ink mask.
+
+    Uses the raw ink projections (text rows rarely cover half the width a
+    ruling does), which is several times cheaper than the morphological line
+    detection in ``grid.find_cells``.
+    """
+    height, width = ink.shape
+    rows = cv2.reduce(ink, 1, cv2.REDUCE_SUM, dtype=cv2.CV_32S).ravel() // 255
+    cols = cv2.reduce(ink, 0, cv2.REDUCE_SUM, dtype=cv2.CV_32S).ravel() // 255
+    return line_positions(rows, width)[0], line_positions(cols, height)[0]
+
+
+def fingerprint(img) -> int:
+    """64-bit difference hash: brightness gradients of a 9x8 thumbnail."""
+    gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY) if img.ndim == 3 else img
+    # Every 4th pixel is plenty to average down to 9x8, and 10x faster.
+    thumb = cv2.resize(gray[::4, ::4], (9, 8), interpolation=cv2.INTER_AREA)
+    thumb = thumb.astype(np.int16)
+    bits = np.packbits(thumb[:, 1:] > thumb[:, :-1])
+    return int.from_bytes(bits.tobytes(), "big")
+
+
+def _same_ink(a: np.ndarray, b: np.ndarray) -> bool:
+    """True if two ink masks differ only along stroke edges.
+
+    Re-encoding or rescanning a page moves stroke edges by a pixel, which a
+    2x2 erosion of the difference removes; a changed character leaves whole
+    strokes behind.
+    """
+    diff = cv2.erode(cv2.bitwise_xor(a, b), np.ones((2, 2), np.uint8))
+    return cv2.countNonZero(diff) == 0
+
+
+@dataclass
+class _Template:
+    ys: np.ndarray
+    xs: np.ndarray
+    lattice: Lattice
+
+
+@dataclass
+class _Page:
+    fingerprint: int
+    shape: Tuple[int, ...]
+    ink: np.ndarray  # packed bits
+    payload: dict
+
+
+class TemplateStore:
+    """Ruled layouts and OCR results seen so far, for reuse on similar pages.
+
+    A template is the cell lattice of a ruled page together with the
+    positions of its rulings. A later page whose rulings line up with a
+    template (allowing for a shift) reuses its lattice instead of running
+    line detection again. Pages are remembered with their OCR payload and
+    found again by fingerprint, so a rescan or re-encode of a page already
+    converted needs no OCR at all. Both lists are bounded and shared by the
+    threads of one process.
+    """
+
+    def __init__(self, max_templates: int = MAX_TEMPLATES, max_pages: int = MAX_PAGES):
+        self.max_templates = max_templates
+        self.max_pages = max_pages
+        self.templates: List[_Template] = []
+        self.pages: List[_Page] = []
+        self.stats = {"layouts": 0, "template": 0, "duplicate": 0}
+        self._lock = threading.Lock()
+
+    def match(self, ink: np.ndarray) -> Optional[Lattice]:
+        """Lattice of a known layout moved onto this page, or None."""
+        ys, xs = _rulings(ink)
+        with self._lock:
+            templates = list(self.templates)
+        for template in templates:
+            if len(ys) != len(template.ys) or len(xs) != len(template.xs):
+                continue
+            dy = int(np.median(ys - template.ys))
+            dx = int(np.median(xs - template.xs))
+            if (
+                np.abs(ys - template.ys - dy).max() > TOLERANCE
+                or np.abs(xs - template.xs - dx).max() > TOLERANCE
+            ):
+                continue
+            height, width = ink.shape
+            boxes = [
+                (
+                    min(max(x0 + dx, 0), width),
+                    min(max(y0 + dy, 0), height),
+                    min(max(x1 + dx, 0), width),
+                    min(max(y1 + dy, 0), height),
+                )
+                for x0, y0, x1, y1 in template.lattice.boxes
+            ]
+            with self._lock:
+                if template in self.templates:
+                    self.templates.remove(template)
+                    self.templates.insert(0, template)
+                self.stats["template"] += 1
+            return Lattice(
+                template.lattice.rows,
+                template.lattice.cols,
+                boxes,
+                blank_cells(ink, boxes),
+            )
+        return None
+
+    def learn(self, ink: np.ndarray, lattice: Lattice) -> None:
+        ys, xs = _rulings(ink)
+        if len(ys) < 3 or len(xs) < 2:
+            return  # rulings too faint to recognize the layout by
+        with self._lock:
+            self.templates.insert(0, _Template(ys, xs, lattice))
+            del self.templates[self.max_templates :]
+            self.stats["layouts"] += 1
+
+    def lookup(self, img) -> Optional[dict]:
+        """Payload of an earlier page ``img`` duplicates, or None."""
+        key = fingerprint(img)
+        with self._lock:
+            candidates = [
+                page
+                for page in self.pages
+                if page.shape == img.shape[:2]
+                and (page.fingerprint ^ key).bit_count() <= HASH_BITS
+            ]
+        if not candidates:
+            return None
+        ink = ink_mask(img)
+        for page in candidates:
+            known = np.unpackbits(page.ink)[: ink.size].reshape(ink.shape) * 255
+            if _same_ink(known, ink):
+                with self._lock:
+                    self.stats["duplicate"] += 1
+                return dict(page.payload)
+        return None
+
+    def remember(self, img, payload: dict) -> None:
+        """Keep ``payload`` as the result for pages duplicating ``img``."""
+        ink = np.packbits(ink_mask(img) > 0)
+        page = _Page(fingerprint(img), img.shape[:2], ink, payload)
+        with self._lock:
+            self.pages.insert(0, page)
+            del self.pages[self.max_pages :]
+
+
+# The store shared by every conversion in this process.
+_store: Optional[TemplateStore] = None
+_store_lock = threading.Lock()
+
+
+def get_template_store() -> TemplateStore:
+    """Return the process-wide template store, creating it on first use."""
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = TemplateStore()
+        return _store
+
+
+def reset_template_store() -> None:
+    """Forget every template and page (used by tests or between batches)."""
+    global _store
+    with _store_lock:
+        _store = None
+
+
+@instrument("match_template")
+def find_cells(img, ink: Optional[np.ndarray] = None) -> Optional[Lattice]:
+    """``grid.find_cells``, reusing the lattice of a known layout if one fits.
+
+    Pages that match no template go through full line detection, and a
+    lattice found that way becomes a new template.
+    """
+    if ink is None:
+        ink = ink_mask(img)
+    store = get_template_store()
+    lattice = store.match(ink)
+    if lattice is None:
+        lattice = detect_cells(img, ink)
+        if lattice is not None:
+            store.learn(ink, lattice)
+    return lattice
+
+
+@instrument("find_duplicate")
+def find_duplicate(img) -> Optional[dict]:
+    """OCR payload of an earlier page that ``img`` duplicates, or None."""
+    return get_template_store().lookup(img)
+
+
+def remember(img, payload: dict) -> None:
+    get_template_store().remember(img, payload)
@@ -0,0 +1,134 @@
+from typing import Callable, Iterator, List, Optional, Tuple
+
+import cv2
+import numpy as np
+
+from .profiling import instrument
+
+# Pages with more pixels than this are cleaned and OCRed band by band.
+TILE_ABOVE = 40_000_000
+# Pixels per band. Bands span the full page width, so their height is
+# BAND_PIXELS / width rows.
+BAND_PIXELS = 4_000_000
+# Rows each band borrows from its neighbours so filters see the same
+# context as on the whole page (non-local means looks 13 px away).
+OVERLAP = 16
+# Skew and the binarization threshold are estimated on a copy this size.
+SAMPLE_SIDE = 1600
+
+
+def is_large(img, tile_above: Optional[int]) -> bool:
+    """True if ``img`` has more than ``tile_above`` pixels (0/None: never)."""
+    return bool(tile_above) and img.shape[0] * img.shape[1] > tile_above
+
+
+def band_height(width: int, band_pixels: Optional[int] = None) -> int:
+    return max(64, (band_pixels or BAND_PIXELS) // max(1, width))
+
+
+def _source_rows_cols(
+    M: Optional[np.ndarray], y0: int, y1: int, height: int, width: int
+) -> Tuple[int, int, int, int]:
+    """Source region (with OVERLAP margin) that output rows y0..y1 come from."""
+    if M is None:
+        return max(0, y0 - OVERLAP), min(height, y1 + OVERLAP), 0, width
+    inv = cv2.invertAffineTransform(M)
+    corners = np.array([[0, y0, 1], [width, y0, 1], [0, y1, 1], [width, y1, 1]])
+    src = corners @ inv.T
+    pad = OVERLAP + 2
+    x0, y0s = np.floor(src.min(axis=0)).astype(int) - pad
+    x1, y1s = np.ceil(src.max(axis=0)).astype(int) + pad
+    return max(0, y0s), min(height, y1s), max(0, x0), min(width, x1)
+
+
+@instrument("clean_tiled")
+def clean_tiled(
+    img_bgr,
+    denoise: Optional[Callable[[np.ndarray], np.ndarray]] = None,
+    threshold: Optional[float] = None,
+    angle: float = 0.0,
+    band_pixels: Optional[int] = None,
+) -> np.ndarray:
+    """Denoise, binarize and rotate ``img_bgr`` one band of rows at a time.
+
+    ``denoise`` filters a grayscale crop, ``threshold`` binarizes at a fixed
+    level (estimate it on a sample, since Otsu on one band would differ from
+    the page) and ``angle`` rotates about the page centre like ``deskew``.
+    Each band is processed from just the source rows it needs plus OVERLAP,
+    so apart from the result only band-sized buffers are allocated. The
+    result is single-channel when any gray step runs (BGR for a rotation
+    alone), and rotated bands are warped straight into it.
+    Since the overlap covers the filters' reach, the output matches
+    processing the whole page at once (rotated pixels may differ by one
+    gray level from rounding).
+    """
+    height, width = img_bgr.shape[:2]
+    M = cv2.getRotationMatrix2D((width / 2, height / 2), angle, 1.0) if angle else None
+    gray = denoise is not None or threshold is not None
+    out = np.empty(
+        (height, width) if gray or img_bgr.ndim == 2 else img_bgr.shape, np.uint8
+    )
+    step = band_height(width, band_pixels)
+    for y0 in range(0, height, step):
+        y1 = min(height, y0 + step)
+        sy0, sy1, sx0, sx1 = _source_rows_cols(M, y0, y1, height, width)
+        crop = img_bgr[sy0:sy1, sx0:sx1]
+        if gray:
+            if crop.ndim == 3:
+                crop = cv2.cvtColor(crop, cv2.COLOR_BGR2GRAY)
+            if denoise is not None:
+                crop = denoise(crop)
+        if M is None:
+            rows = crop[y0 - sy0 : y1 - sy0]
+            if threshold is not None:
+                # Straight into the result: without a denoise step ``rows``
+                # are still the caller's pixels.
+                cv2.threshold(rows, threshold, 255, cv2.THRESH_BINARY, dst=out[y0:y1])
+            else:
+                out[y0:y1] = rows
+        else:
+            if threshold is not None:
+                own = not np.may_share_memory(crop, img_bgr)
+                _, crop = cv2.threshold(
+                    crop, threshold, 255, cv2.THRESH_BINARY, dst=crop if own else None
+                )
+            # Map crop coordinates to band coordinates.
+            shifted = M.copy()
+            shifted[:, 2] = M[:, :2] @ [sx0, sy0] + M[:, 2] - [0, y0]
+            cv2.warpAffine(
+                crop,
+                shifted,
+                (width, y1 - y0),
+                dst=out[y0:y1],
+                flags=cv2.INTER_LINEAR,
+                borderMode=cv2.BORDER_REPLICATE,
+            )
+    return out
+
+
+def text_bands(img, band_pixels: Optional[int] = None) -> List[Tuple[int, int]]:
+    """Split a page into row ranges of about ``band_pixels`` for banded OCR.
+
+    Each cut is placed on the row with the least ink in the second half of
+    the band, normally a gap between text lines, so no line is split.
+    """
+    height, width = img.shape[:2]
+    step = band_height(width, band_pixels)
+    bands = []
+    y0 = 0
+    while height - y0 > step:
+        lo, hi = y0 + step // 2, y0 + step
+        plane = img[lo:hi, :, 0] if img.ndim == 3 else img[lo:hi]
+        ink = np.count_nonzero(plane < 128, axis=1)
+        # The last emptiest row, so the band is as tall as allowed.
+        cut = hi - int(np.argmin(ink[::-1]))
+        bands.append((y0, cut))
+        y0 = cut
+    bands.append((y0, height))
+    return bands
+
+
+def iter_bands(img, band_pixels: Optional[int] = None) -> Iterator[Tuple[int, object]]:
+    """Yield ``(top, band)`` views of ``img`` cut by :func:`text_bands`."""
+    for y0, y1 in text_bands(img, band_pixels):
+        yield y0, img[y0:y1]
@@ -0,0 +1,531 @@
+import csv
+import json
+import os
+from importlib import import_module
+from pathlib import Path
+from typing import Collection, Dict, Iterator, List
+
+import numpy as np
+import pandas as pd
+
+from .infer import column_kind, convert, infer_types, merge_kinds
+
+LAYOUTS = ("wide", "long")
+FORMATS = ("csv", "jsonl", "parquet", "arrow")
+# Rows buffered before they are written out as one Parquet row group or
+# Arrow record batch.
+ROW_GROUP_ROWS = 65_536
+# Identifier columns added by the pipeline. They lead the combined output in
+# this order, however late one of them first turns up.
+ID_COLUMNS = ("_source", "_page", "_table")
+
+
+def _pyarrow():
+    try:
+        return import_module("pyarrow")
+    except ImportError as exc:
+        raise RuntimeError(
+            "pyarrow not installed. Install with: pip install 'image-to-csv[parquet]'"
+        ) from exc
+
+
+def _unique_names(columns) -> List[str]:
+    """Column names with repeats numbered ``A``, ``A.1``, ``A.2`` like pandas."""
+    seen: Dict[str, int] = {}
+    names = []
+    for col in columns:
+        name = str(col)
+        nth = seen.get(name, 0)
+        seen[name] = nth + 1
+        names.append(f"{name}.{nth}" if nth else name)
+    return names
+
+
+def _ids_first(columns: List[str]) -> List[int]:
+    """Positions of ``columns`` reordered so ID_COLUMNS come first."""
+    ids = [columns.index(name) for name in ID_COLUMNS if name in columns]
+    return ids + [i for i in range(len(columns)) if i not in ids]
+
+
+def _to_long(df: pd.DataFrame) -> pd.DataFrame:
+    """Melt a table into ``_row``/``column``/``value`` records.
+
+    Columns starting with ``_`` (such as ``_source``) are identifiers and are
+    repeated on every record instead of being melted.
+    """
+    id_pos = [i for i, c in enumerate(df.columns) if str(c).startswith("_")]
+    value_pos = [i for i in range(len(df.columns)) if i not in id_pos]
+    n, m = len(df), len(value_pos)
+    out = {df.columns[i]: np.repeat(df.iloc[:, i].to_numpy(), m) for i in id_pos}
+    out["_row"] = np.repeat(np.arange(n), m)
+    out["column"] = np.tile([str(df.columns[i]) for i in value_pos], n)
+    out["value"] = df.iloc[:, value_pos].to_numpy(dtype=object).reshape(-1)
+    return pd.DataFrame(out)
+
+
+class StreamingCSVWriter:
+    """Append each table to a CSV as soon as it is ready.
+
+    In the ``wide`` layout the header is the union of all columns seen so far,
+    in order of first appearance. New columns are only ever appended, so rows
+    written earlier are a prefix of the final header; if the header grew, the
+    file is rewritten row by row at :meth:`close` with the union header and
+    padded rows, moving ID_COLUMNS to the front so ``_page`` follows
+    ``_source`` even when the first file had no pages. The ``long`` layout
+    writes one ``column``/``value`` record per cell, so its header only
+    changes if the identifier columns do.
+
+    Until then the union header is kept in ``<path>.columns``, written
+    before any row that uses a new column, so a crashed run leaves a record
+    of what its rows mean.
+
+    With ``append=True`` an existing file is extended: its header (or the
+    union saved in ``<path>.columns`` by a run that did not finish) seeds the
+    union and new rows are added after the old ones. With ``typed=True`` each
+    table's columns are parsed by :func:`infer.infer_types` before writing.
+    """
+
+    def __init__(
+        self,
+        path: Path,
+        layout: str = "wide",
+        append: bool = False,
+        typed: bool = False,
+    ):
+        if layout not in LAYOUTS:
+            raise ValueError(f"Unknown layout {layout!r}; expected one of {LAYOUTS}")
+        self.path = Path(path)
+        self.layout = layout
+        self.typed = typed
+        self.columns: List[str] = []
+        self.rows = 0
+        self._header_width = 0
+        self._columns_path = self.path.with_name(self.path.name + ".columns")
+        if append and self.path.exists():
+            with self.path.open(newline="", encoding="utf-8") as fh:
+                self.columns = next(csv.reader(fh), [])
+            self._header_width = len(self.columns)
+            saved = self._saved_columns()
+            if saved[: len(self.columns)] == self.columns:
+                self.columns = saved
+        else:
+            self._columns_path.unlink(missing_ok=True)
+        self._saved_width = len(self.columns)
+        mode = "a" if append else "w"
+        self._fh = self.path.open(mode, newline="", encoding="utf-8")
+
+    def _positions(self, columns) -> List[int]:
+        """Map each incoming column onto the union header, adding new ones."""
+        seen: Dict[str, int] = {}
+        positions = []
+        for col in columns:
+            name = str(col)
+            nth = seen.get(name, 0)
+            seen[name] = nth + 1
+            matches = [i for i, c in enumerate(self.columns) if c == name]
+            if nth < len(matches):
+                positions.append(matches[nth])
+            else:
+                self.columns.append(name)
+                positions.append(len(self.columns) - 1)
+        return positions
+
+    def _saved_columns(self) -> List[str]:
+        try:
+            with self._columns_path.open(newline="", encoding="utf-8") as fh:
+                return next(csv.reader(fh), [])
+        except OSError:
+            return []
+
+    def _save_columns(self) -> None:
+        tmp = self._columns_path.with_name(self._columns_path.name + ".tmp")
+        with tmp.open("w", newline="", encoding="utf-8") as fh:
+            csv.writer(fh, lineterminator=os.linesep).writerow(self.columns)
+            fh.flush()
+            os.fsync(fh.fileno())
+        os.replace(tmp, self._columns_path)
+        self._saved_width = len(self.columns)
+
+    def write(self, df: pd.DataFrame) -> None:
+        if self.layout == "long":
+            df = _to_long(df)
+        if self.typed:
+            df = infer_types(df)
+        positions = self._positions(df.columns)
+        if not self._header_width:
+            csv.writer(self._fh, lineterminator=os.linesep).writerow(self.columns)
+            self._header_width = self._saved_width = len(self.columns)
+        elif len(self.columns) > self._saved_width:
+            self._save_columns()
+        frame = pd.DataFrame(
+            {pos: df.iloc[:, i] for i, pos in enumerate(positions)},
+            index=df.index,
+        ).reindex(columns=range(len(self.columns)))
+        frame.to_csv(self._fh, header=False, index=False)
+        self._fh.flush()
+        self.rows += len(df)
+
+    def close(self) -> None:
+        if self._fh.closed:
+            return
+        self._fh.close()
+        order = _ids_first(self.columns)
+        if len(self.columns) > self._header_width or order != sorted(order):
+            self._rewrite_header(order)
+        self._columns_path.unlink(missing_ok=True)
+
+    def _rewrite_header(self, order: List[int]) -> None:
+        width = len(self.columns)
+
+        def pad_and_reorder(row):
+            row = row + [""] * (width - len(row))
+            return [row[i] for i in order]
+
+        self.columns = [self.columns[i] for i in order]
+        _rewrite_rows(self.path, self.columns, pad_and_reorder)
+        self._header_width = width
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def _ends_with_newline(path: Path) -> bool:
+    """True if ``path`` is empty or its last byte is a newline."""
+    with path.open("rb") as fh:
+        if fh.seek(0, os.SEEK_END) == 0:
+            return True
+        fh.seek(-1, os.SEEK_END)
+        return fh.read(1) == b"\n"
+
+
+class StreamingJSONLWriter:
+    """Append each table to a JSON Lines file, one object per row.
+
+    Repeated column names are numbered (``A``, ``A.1``) since JSON objects
+    need unique keys. With ``append=True`` a line left half-written by a
+    crashed run is ended before new rows are added. With ``typed=True`` numbers come out as JSON numbers
+    and dates as ``YYYY-MM-DD`` strings; missing cells are ``null``.
+    """
+
+    def __init__(
+        self,
+        path: Path,
+        layout: str = "wide",
+        append: bool = False,
+        typed: bool = False,
+    ):
+        if layout not in LAYOUTS:
+            raise ValueError(f"Unknown layout {layout!r}; expected one of {LAYOUTS}")
+        self.path = Path(path)
+        self.layout = layout
+        self.typed = typed
+        self.rows = 0
+        self._fh = self.path.open("a" if append else "w", encoding="utf-8")
+        if append and not _ends_with_newline(self.path):
+            self._fh.write("\n")  # a run that crashed mid-line
+
+    def write(self, df: pd.DataFrame) -> None:
+        if self.layout == "long":
+            df = _to_long(df)
+        if self.typed:
+            df = infer_types(df)
+        df = df.set_axis(_unique_names(df.columns), axis=1)
+        for i in range(len(df.columns)):
+            if pd.api.types.is_datetime64_any_dtype(df.iloc[:, i]):
+                df.isetitem(i, df.iloc[:, i].dt.strftime("%Y-%m-%d"))
+        if len(df):
+            df.to_json(
+                self._fh, orient="records", lines=True, force_ascii=False, index=False
+            )
+        self._fh.flush()
+        self.rows += len(df)
+
+    def close(self) -> None:
+        self._fh.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class StreamingColumnarWriter:
+    """Write tables to a Parquet or Arrow IPC file in row groups.
+
+    Tables are buffered until ROW_GROUP_ROWS rows have arrived, then written
+    out as one row group (a record batch for Arrow), so memory stays bounded
+    however large the batch. Cells are stored as text and ``_`` columns keep
+    their types. Row groups go to part files next to ``path`` while the
+    batch runs, and a new part starts whenever a new column turns up; at
+    :meth:`close` the parts are merged, row group by row group, into
+    ``path`` with the union of all columns, ID_COLUMNS first (a single part
+    is simply renamed). Columnar files cannot be appended to, so ``path``
+    only exists once the writer is closed.
+
+    With ``typed=True`` the merge reads the row groups twice: once to infer
+    each column's kind over the whole file with :func:`infer.column_kind`,
+    once to convert and write them, so a column is typed only if every row
+    of it parses.
+    """
+
+    def __init__(
+        self,
+        path: Path,
+        fmt: str = "parquet",
+        layout: str = "wide",
+        typed: bool = False,
+        row_group_rows: int = ROW_GROUP_ROWS,
+    ):
+        if fmt not in ("parquet", "arrow"):
+            raise ValueError(f"Unknown columnar format {fmt!r}")
+        if layout not in LAYOUTS:
+            raise ValueError(f"Unknown layout {layout!r}; expected one of {LAYOUTS}")
+        self.pa = _pyarrow()
+        if fmt == "parquet":
+            self.pq = import_module("pyarrow.parquet")
+        self.path = Path(path)
+        self.fmt = fmt
+        self.layout = layout
+        self.typed = typed
+        self.row_group_rows = row_group_rows
+        self.columns: List[str] = []
+        self.rows = 0
+        self._buffer: List[pd.DataFrame] = []
+        self._buffered = 0
+        self._parts: List[Path] = []
+        self._writer = None
+        self._schema = None
+        self._closed = False
+
+    def write(self, df: pd.DataFrame) -> None:
+        if self.layout == "long":
+            df = _to_long(df)
+        names = _unique_names(df.columns)
+        if any(name not in self.columns for name in names):
+            self.columns.extend(name for name in names if name not in self.columns)
+            self.columns = [self.columns[i] for i in _ids_first(self.columns)]
+        frame = pd.DataFrame(
+            {
+                name: (
+                    df.iloc[:, i]
+                    if name.startswith("_")
+                    else df.iloc[:, i].astype("string")
+                )
+                for i, name in enumerate(names)
+            }
+        ).reset_index(drop=True)
+        self._buffer.append(frame)
+        self._buffered += len(frame)
+        self.rows += len(frame)
+        if self._buffered >= self.row_group_rows:
+            self._flush()
+
+    def _open(self, path: Path, schema):
+        if self.fmt == "parquet":
+            return self.pq.ParquetWriter(str(path), schema, compression="snappy")
+        options = self.pa.ipc.IpcWriteOptions(compression="zstd")
+        return self.pa.ipc.new_file(str(path), schema, options=options)
+
+    def _write_table(self, writer, table) -> None:
+        if self.fmt == "parquet":
+            writer.write_table(table, row_group_size=max(1, len(table)))
+        else:
+            writer.write_table(table, max_chunksize=max(1, len(table)))
+
+    def _flush(self) -> None:
+        if not self._buffer:
+            return
+        frame = pd.concat(self._buffer, ignore_index=True)
+        self._buffer, self._buffered = [], 0
+        frame = frame[[c for c in self.columns if c in frame.columns]]
+        table = self.pa.Table.from_pandas(frame.convert_dtypes(), preserve_index=False)
+        if self._writer is not None and table.schema.names == self._schema.names:
+            try:
+                table = table.cast(self._schema)
+            except (self.pa.ArrowInvalid, self.pa.ArrowNotImplementedError):
+                pass
+        if self._writer is None or not table.schema.equals(self._schema):
+            self._close_part()
+            part = self.path.with_name(f"{self.path.name}.part{len(self._parts)}")
+            self._parts.append(part)
+            self._writer = self._open(part, table.schema)
+            self._schema = table.schema
+        self._write_table(self._writer, table)
+
+    def _close_part(self) -> None:
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+
+    def _read_schema(self, part: Path):
+        if self.fmt == "parquet":
+            return self.pq.read_schema(str(part))
+        with self.pa.memory_map(str(part)) as src:
+            return self.pa.ipc.open_file(src).schema
+
+    def _batches(self) -> Iterator:
+        """Every row group of every part, in order, one at a time."""
+        for part in self._parts:
+            if self.fmt == "parquet":
+                pf = self.pq.ParquetFile(str(part))
+                try:
+                    for i in range(pf.num_row_groups):
+                        yield pf.read_row_group(i)
+                finally:
+                    pf.close()
+            else:
+                with self.pa.memory_map(str(part)) as src:
+                    reader = self.pa.ipc.open_file(src)
+                    for i in range(reader.num_record_batches):
+                        yield self.pa.Table.from_batches([reader.get_batch(i)])
+
+    def _kinds(self) -> Dict[str, str]:
+        seen: Dict[str, List[str]] = {}
+        for table in self._batches():
+            for name in table.column_names:
+                if not name.startswith("_"):
+                    kind = column_kind(table.column(name).to_pandas())
+                    seen.setdefault(name, []).append(kind)
+        return {name: merge_kinds(kinds) for name, kinds in seen.items()}
+
+    def _merge(self) -> None:
+        pa = self.pa
+        types: Dict[str, object] = {}
+        for part in self._parts:
+            for field in self._read_schema(part):
+                if field.name not in types or pa.types.is_null(types[field.name]):
+                    types[field.name] = field.type
+        kinds = self._kinds() if self.typed else {}
+        arrow_types = {
+            "int": pa.int64(),
+            "float": pa.float64(),
+            "percent": pa.float64(),
+            "currency": pa.float64(),
+            "date": pa.date32(),
+        }
+        for name, kind in kinds.items():
+            types[name] = arrow_types.get(kind, pa.string())
+        schema = pa.schema(
+            [
+                (name, pa.string() if pa.types.is_null(types[name]) else types[name])
+                for name in self.columns
+            ]
+        )
+        tmp = self.path.with_name(self.path.name + ".tmp")
+        writer = self._open(tmp, schema)
+        try:
+            for table in self._batches():
+                frame = table.to_pandas().reindex(columns=self.columns)
+                for name in kinds:
+                    frame[name] = convert(frame[name], kinds[name])
+                out = pa.Table.from_pandas(frame, preserve_index=False)
+                self._write_table(writer, out.cast(schema))
+        finally:
+            writer.close()
+        os.replace(tmp, self.path)
+        for part in self._parts:
+            part.unlink()
+
+    def close(self) -> None:
+        if self._closed:
+            return
+        self._closed = True
+        self._flush()
+        self._close_part()
+        if not self._parts:
+            schema = self.pa.schema([(name, self.pa.string()) for name in self.columns])
+            self._open(self.path, schema).close()
+        elif len(self._parts) == 1 and not self.typed:
+            os.replace(self._parts[0], self.path)
+        else:
+            self._merge()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def open_writer(
+    path: Path,
+    fmt: str = "csv",
+    layout: str = "wide",
+    append: bool = False,
+    typed: bool = False,
+):
+    """Streaming writer for ``fmt``, one of :data:`FORMATS`.
+
+    Only CSV and JSONL files can be appended to.
+    """
+    if fmt == "csv":
+        return StreamingCSVWriter(path, layout=layout, append=append, typed=typed)
+    if fmt == "jsonl":
+        return StreamingJSONLWriter(path, layout=layout, append=append, typed=typed)
+    if fmt not in FORMATS:
+        raise ValueError(f"Unknown format {fmt!r}; expected one of {FORMATS}")
+    if append:
+        raise ValueError(f"{fmt} files cannot be appended to")
+    return StreamingColumnarWriter(path, fmt, layout=layout, typed=typed)
+
+
+def _rewrite_rows(path: Path, header: List[str], transform) -> None:
+    """Stream ``path`` through ``transform`` row by row under a new header.
+
+    Rows for which ``transform`` returns None are dropped.
+    """
+    tmp = path.with_name(path.name + ".tmp")
+    with path.open(newline="", encoding="utf-8") as src, tmp.open(
+        "w", newline="", encoding="utf-8"
+    ) as dst:
+        reader = csv.reader(src)
+        writer = csv.writer(dst, lineterminator=os.linesep)
+        next(reader, None)
+        writer.writerow(header)
+        for row in reader:
+            row = transform(row)
+            if row is not None:
+                writer.writerow(row)
+    os.replace(tmp, path)
+
+
+def _drop_jsonl_rows(path: Path, column: str, values: Collection[str]) -> None:
+    tmp = path.with_name(path.name + ".tmp")
+    with path.open(encoding="utf-8") as src, tmp.open("w", encoding="utf-8") as dst:
+        for line in src:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue  # torn write from an interrupted run
+            if record.get(column) not in values:
+                dst.write(line if line.endswith("\n") else line + "\n")
+    os.replace(tmp, path)
+
+
+def drop_rows(
+    path: Path, column: str, values: Collection[str], fmt: str = "csv"
+) -> None:
+    """Remove rows whose ``column`` holds one of ``values`` from a CSV file.
+
+    ``fmt="jsonl"`` does the same for a JSON Lines file.
+    """
+    path = Path(path)
+    if not values or not path.exists():
+        return
+    if fmt == "jsonl":
+        _drop_jsonl_rows(path, column, values)
+        return
+    with path.open(newline="", encoding="utf-8") as fh:
+        header = next(csv.reader(fh), [])
+    if column not in header:
+        return
+    idx = header.index(column)
+    _rewrite_rows(
+        path,
+        header,
+        lambda row: None if idx < len(row) and row[idx] in values else row,
+    )
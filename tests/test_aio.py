@@ -0,0 +1,124 @@
+import asyncio
+import tempfile
+import threading
+import time
+from contextlib import aclosing
+from pathlib import Path
+
+import cv2
+import numpy as np
+import pytest
+
+from image_to_csv import aio, pipeline
+
+
+def _png_bytes() -> bytes:
+    ok, buf = cv2.imencode(".png", np.full((8, 8, 3), 255, dtype=np.uint8))
+    assert ok
+    return buf.tobytes()
+
+
+@pytest.fixture(autouse=True)
+def fake_tesseract(monkeypatch):
+    monkeypatch.setattr(pipeline, "ocr_lines_tesseract", lambda img: ["A  B", "1  2"])
+
+
+def test_convert_image_accepts_paths_and_bytes():
+    with tempfile.TemporaryDirectory() as tmpdir:
+        img = Path(tmpdir) / "page.png"
+        img.write_bytes(_png_bytes())
+        df = asyncio.run(aio.convert_image(img, engine="tesseract"))
+    assert list(df.columns) == ["A", "B"]
+    df = asyncio.run(aio.convert_image(_png_bytes(), engine="tesseract"))
+    assert df.values.tolist() == [["1", "2"]]
+
+
+def test_convert_image_converts_every_page_of_a_document():
+    page = np.full((8, 8, 3), 255, dtype=np.uint8)
+    with tempfile.TemporaryDirectory() as tmpdir:
+        fax = Path(tmpdir) / "fax.tiff"
+        assert cv2.imwritemulti(str(fax), [page, page])
+        df = asyncio.run(aio.convert_image(fax, engine="tesseract"))
+        data = fax.read_bytes()
+    assert df.values.tolist() == [[1, "1", "2"], [2, "1", "2"]]
+    assert list(df.columns) == ["_page", "A", "B"]
+    df = asyncio.run(aio.convert_image(data, name="fax.tiff", engine="tesseract"))
+    assert list(df["_page"]) == [1, 2]
+
+
+def test_convert_many_streams_results_as_they_complete(monkeypatch):
+    def lines(img):
+        # The first image is slow, so it should come out last.
+        if img.shape[0] == 8:
+            time.sleep(0.3)
+        return ["A  B", "1  2"]
+
+    monkeypatch.setattr(pipeline, "ocr_lines_tesseract", lines)
+    _, small = cv2.imencode(".png", np.full((4, 4, 3), 255, dtype=np.uint8))
+    sources = [_png_bytes(), small.tobytes(), b"not an image"]
+
+    async def collect():
+        return [
+            r
+            async for r in aio.convert_many(
+                sources, concurrency=3, engine="tesseract", ocr_workers=2
+            )
+        ]
+
+    results = asyncio.run(collect())
+    assert sorted(r.index for r in results) == [0, 1, 2]
+    assert results[-1].index == 0
+    by_index = {r.index: r for r in results}
+    assert by_index[2].df is None and "Cannot read image" in by_index[2].error
+    assert list(by_index[1].df.columns) == ["A", "B"]
+
+
+def test_convert_many_limits_concurrency(monkeypatch):
+    active, peak = [0], [0]
+    lock = threading.Lock()
+
+    def lines(img):
+        with lock:
+            active[0] += 1
+            peak[0] = max(peak[0], active[0])
+        time.sleep(0.05)
+        with lock:
+            active[0] -= 1
+        return ["A"]
+
+    monkeypatch.setattr(pipeline, "ocr_lines_tesseract", lines)
+
+    async def run():
+        sources = [_png_bytes()] * 8
+        return [
+            r
+            async for r in aio.convert_many(
+                sources, concurrency=2, engine="tesseract", ocr_workers=4
+            )
+        ]
+
+    assert len(asyncio.run(run())) == 8
+    assert peak[0] <= 2
+
+
+def test_timeouts_and_early_close_cancel_pending_work(monkeypatch):
+    release = threading.Event()
+
+    def lines(img):
+        release.wait(5)
+        return ["A"]
+
+    monkeypatch.setattr(pipeline, "ocr_lines_tesseract", lines)
+
+    async def run():
+        async with aio.AsyncConverter(engine="tesseract", ocr_workers=4) as conv:
+            with pytest.raises(TimeoutError):
+                await conv.convert(_png_bytes(), timeout=0.1)
+            results = conv.convert_many([_png_bytes()] * 4, timeout=0.1)
+            async with aclosing(results) as stream:
+                first = await stream.__anext__()
+            release.set()
+            return first
+
+    first = asyncio.run(run())
+    assert first.error.startswith("TimeoutError")
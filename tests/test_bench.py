@@ -0,0 +1,52 @@
+import json
+import tempfile
+from pathlib import Path
+
+import typer.testing
+
+from image_to_csv import bench, cli
+
+
+def test_render_table_shapes_and_cells():
+    img, cells = bench.render_table(320, 240, rows=4, cols=3, skew=2.0, noise=5.0)
+    assert img.shape == (240, 320, 3)
+    assert cells[0] == ["Col1", "Col2", "Col3"]
+    assert len(cells) == 4
+
+
+def test_benchmark_case_times_every_stage():
+    img, cells = bench.render_table(200, 150, rows=3, cols=2)
+    timings = bench.benchmark_case(img, cells, repeat=1)
+    for stage in (
+        "decode",
+        "preprocess",
+        "deskew",
+        "ocr_table_paddle",
+        "html_to_df",
+        "html_to_df[lxml]",
+        "html_to_df[read_html]",
+    ):
+        assert timings[stage] >= 0
+
+
+def test_compare_flags_only_meaningful_slowdowns():
+    baseline = {"cases": {"c": {"preprocess": 100.0, "html_to_df": 0.1}}}
+    current = {"cases": {"c": {"preprocess": 150.0, "html_to_df": 0.3}}}
+    regressions = bench.compare(current, baseline, threshold=0.2)
+    assert [r["stage"] for r in regressions] == ["preprocess"]
+    assert bench.compare(current, baseline, threshold=0.6) == []
+
+
+def test_bench_command_fails_on_regression():
+    runner = typer.testing.CliRunner()
+    with tempfile.TemporaryDirectory() as tmpdir:
+        base = Path(tmpdir) / "base.json"
+        args = ["bench", "--size", "320x240", "--skew", "0", "--noise", "0"]
+        assert runner.invoke(cli.app, args + ["--out", str(base)]).exit_code == 0
+        data = json.loads(base.read_text())
+        for stages in data["cases"].values():
+            stages["preprocess"] = 0.0
+        base.write_text(json.dumps(data))
+        result = runner.invoke(cli.app, args + ["--baseline", str(base)])
+    assert result.exit_code == 1
+    assert "REGRESSION" in result.output
@@ -0,0 +1,131 @@
+import os
+import tempfile
+from pathlib import Path
+
+import numpy as np
+import typer.testing
+
+from image_to_csv import cli, pipeline
+from image_to_csv.cache import ResultCache, cache_key
+
+
+def test_cache_key_depends_on_settings():
+    base = cache_key(b"img", "paddle", True)
+    assert base == cache_key(b"img", "paddle", True)
+    assert base != cache_key(b"img", "tesseract", True)
+    assert base != cache_key(b"img", "paddle", False)
+    assert base != cache_key(b"other", "paddle", True)
+    assert base != cache_key(b"img", "paddle", True, "fast")
+
+
+def test_prune_evicts_least_recently_used():
+    with tempfile.TemporaryDirectory() as tmpdir:
+        cache = ResultCache(Path(tmpdir))
+        for i, key in enumerate(("aa1", "bb2", "cc3")):
+            cache.put(key, {"lines": ["x" * 100]})
+            os.utime(cache._path(key), (1000 + i, 1000 + i))
+        assert cache.get("aa1") == {"lines": ["x" * 100]}
+        size = cache._path("bb2").stat().st_size
+
+        removed, _ = cache.prune(max_bytes=2 * size)
+        assert removed == 1
+        assert cache.get("bb2") is None
+        assert cache.get("aa1") is not None
+        assert cache.stats()["entries"] == 2
+
+
+def test_threads_storing_the_same_key_do_not_collide():
+    from concurrent.futures import ThreadPoolExecutor
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        cache = ResultCache(Path(tmpdir))
+
+        def put(i):
+            for _ in range(50):
+                cache.put("aa1", {"lines": [str(i) * 1000]})
+
+        with ThreadPoolExecutor(8) as pool:
+            list(pool.map(put, range(8)))
+        assert cache.get("aa1")["lines"][0] in {str(i) * 1000 for i in range(8)}
+        assert [p.name for p in cache._path("aa1").parent.iterdir()] == ["aa1.json"]
+
+
+def test_file_command_reuses_cached_result(monkeypatch):
+    import cv2
+
+    runner = typer.testing.CliRunner()
+    calls = []
+
+    def fake_lines(_img):
+        calls.append(1)
+        return ["A  B", "1  2"]
+
+    monkeypatch.setattr(pipeline, "ocr_lines_tesseract", fake_lines)
+    with tempfile.TemporaryDirectory() as tmpdir:
+        img = Path(tmpdir) / "test.jpg"
+        cv2.imwrite(str(img), np.full((4, 4, 3), 255, dtype=np.uint8))
+        args = [
+            "file",
+            str(img),
+            "--out",
+            str(Path(tmpdir) / "out.csv"),
+            "--engine",
+            "tesseract",
+            "--cache-dir",
+            str(Path(tmpdir) / "cache"),
+        ]
+        assert runner.invoke(cli.app, args).exit_code == 0
+        assert runner.invoke(cli.app, args).exit_code == 0
+        # Results found through templates are kept apart from plain ones.
+        assert runner.invoke(cli.app, args + ["--templates"]).exit_code == 0
+        stats = runner.invoke(
+            cli.app, ["cache", "stats", "--cache-dir", str(Path(tmpdir) / "cache")]
+        )
+    assert len(calls) == 2
+    assert "2 entries" in stats.output
+
+
+def test_folder_loads_no_engine_when_every_page_is_cached(monkeypatch):
+    import cv2
+
+    runner = typer.testing.CliRunner()
+    loads = []
+
+    def fake_engine(**kwargs):
+        loads.append(kwargs)
+        return lambda img: [
+            {"type": "table", "res": {"html": "<table><tr><td>A</td></tr></table>"}}
+        ]
+
+    monkeypatch.setattr(pipeline, "get_paddle_engine", fake_engine)
+    with tempfile.TemporaryDirectory() as tmpdir:
+        folder = Path(tmpdir) / "in"
+        folder.mkdir()
+        cv2.imwrite(str(folder / "a.png"), np.full((4, 4, 3), 255, dtype=np.uint8))
+        args = ["folder", str(folder), "--out", str(Path(tmpdir) / "out.csv")]
+        args += ["--cache-dir", str(Path(tmpdir) / "cache")]
+        assert runner.invoke(cli.app, args).exit_code == 0
+        assert loads
+        loaded = len(loads)
+        result = runner.invoke(cli.app, args)
+        assert result.exit_code == 0, result.output
+    assert len(loads) == loaded
+
+
+def test_missing_image_with_a_cache_is_a_bad_parameter():
+    runner = typer.testing.CliRunner()
+    with tempfile.TemporaryDirectory() as tmpdir:
+        missing = Path(tmpdir) / "missing.jpg"
+        result = runner.invoke(
+            cli.app,
+            [
+                "file",
+                str(missing),
+                "--out",
+                str(Path(tmpdir) / "out.csv"),
+                "--cache-dir",
+                str(Path(tmpdir) / "cache"),
+            ],
+        )
+    assert result.exit_code == 2
+    assert "Cannot read image" in result.output
@@ -2,9 +2,11 @@ from pathlib import Path
 import tempfile
 
 import numpy as np
+import pandas as pd
+import pytest
 import typer.testing
 
-from image_to_csv import cli
+from image_to_csv import cli, pipeline
 
 
 def _fake_image(path: Path):
@@ -42,7 +44,7 @@ def test_file_command_runs_with_tesseract_engine(monkeypatch):
         def fake_lines(_img):
             return ["A  B", "1  2"]
 
-        monkeypatch.setattr(cli, "ocr_lines_tesseract", fake_lines)
+        monkeypatch.setattr(pipeline, "ocr_lines_tesseract", fake_lines)
         result = runner.invoke(
             cli.app,
             [
@@ -56,3 +58,54 @@ def test_file_command_runs_with_tesseract_engine(monkeypatch):
         )
         assert result.exit_code == 0
         assert out.exists()
+
+
+def test_folder_workers_keep_input_order(monkeypatch):
+    from concurrent.futures import ThreadPoolExecutor
+    import time
+
+    runner = typer.testing.CliRunner()
+    with tempfile.TemporaryDirectory() as tmpdir:
+        for name in ("a.jpg", "b.jpg", "c.jpg"):
+            _fake_image(Path(tmpdir) / name)
+        out = Path(tmpdir) / "out.csv"
+        delays = iter([0.2, 0.1, 0.0])
+
+        def fake_lines(_img):
+            time.sleep(next(delays))
+            return ["A  B", "1  2"]
+
+        monkeypatch.setattr(pipeline, "ocr_lines_tesseract", fake_lines)
+        monkeypatch.setattr(cli, "ProcessPoolExecutor", ThreadPoolExecutor)
+        result = runner.invoke(
+            cli.app,
+            [
+                "folder",
+                tmpdir,
+                "--out",
+                str(out),
+                "--engine",
+                "tesseract",
+                "--workers",
+                "3",
+            ],
+        )
+        assert result.exit_code == 0, result.output
+        df = pd.read_csv(out)
+    assert list(df["_source"]) == ["a.jpg", "b.jpg", "c.jpg"]
+
+
+def test_unreadable_image_is_a_value_error_in_the_library_and_bad_parameter_here():
+    with pytest.raises(pipeline.ImageReadError, match="Cannot read image"):
+        pipeline.load_image(Path("junk.png"), b"not an image")
+    assert issubclass(pipeline.ImageReadError, ValueError)
+    runner = typer.testing.CliRunner()
+    with tempfile.TemporaryDirectory() as tmpdir:
+        img = Path(tmpdir) / "junk.png"
+        img.write_bytes(b"not an image")
+        args = ["--out", str(Path(tmpdir) / "out.csv"), "--engine", "tesseract"]
+        single = runner.invoke(cli.app, ["file", str(img)] + args)
+        batch = runner.invoke(cli.app, ["folder", tmpdir] + args)
+    for result in (single, batch):
+        assert result.exit_code == 2
+        assert "Cannot read image" in result.output
@@ -0,0 +1,217 @@
+import io
+import json
+import tempfile
+from pathlib import Path
+
+import cv2
+import numpy as np
+import pandas as pd
+import pytest
+import typer.testing
+
+from image_to_csv import cli, decode, pipeline
+
+
+def _write_tiff(path: Path, count: int, dpi: int = 200):
+    pages = [np.full((40, 60, 3), 40 * i, dtype=np.uint8) for i in range(count)]
+    params = [cv2.IMWRITE_TIFF_XDPI, dpi, cv2.IMWRITE_TIFF_YDPI, dpi]
+    assert cv2.imwritemulti(str(path), pages, params)
+    return pages
+
+
+def _jpeg_at(dpi: int) -> bytes:
+    ok, buf = cv2.imencode(".jpg", np.full((800, 1000, 3), 255, dtype=np.uint8))
+    assert ok
+    data = bytearray(buf.tobytes())
+    assert data[6:11] == b"JFIF\0"
+    data[13:18] = bytes([1]) + dpi.to_bytes(2, "big") * 2  # density in dpi
+    return bytes(data)
+
+
+@pytest.fixture
+def fake_lines(monkeypatch):
+    calls = []
+
+    def lines(img):
+        calls.append(img.shape)
+        return ["A  B", f"{len(calls)}  x"]
+
+    monkeypatch.setattr(pipeline, "ocr_lines_tesseract", lines)
+    return calls
+
+
+def test_tiff_pages_are_read_one_at_a_time_from_files_and_bytes():
+    with tempfile.TemporaryDirectory() as tmpdir:
+        path = Path(tmpdir) / "fax.tiff"
+        pages = _write_tiff(path, 3)
+        data = path.read_bytes()
+        assert decode.pages(path) == decode.pages(path, data) == [1, 2, 3]
+        for page, img in decode.iter_pages(path):
+            assert np.array_equal(img, pages[page - 1])
+        assert np.array_equal(decode.read_page(path, data, 3), pages[2])
+        single = Path(tmpdir) / "one.tiff"
+        _write_tiff(single, 1)
+        assert decode.pages(single) == [None]
+    assert decode.pages(Path("scan.jpg")) == [None]
+
+
+def test_reduced_decoding_stays_at_or_above_the_target_dpi():
+    data = _jpeg_at(600)
+    assert decode.source_dpi(io.BytesIO(data)) == 600
+    assert decode.read_page(Path("scan.jpg"), data, dpi=150).shape == (200, 250, 3)
+    assert decode.read_page(Path("scan.jpg"), data, dpi=200).shape == (400, 500, 3)
+    assert decode.read_page(Path("scan.jpg"), data).shape == (800, 1000, 3)
+    # No recorded resolution: decoded in full.
+    ok, png = cv2.imencode(".png", np.zeros((8, 8, 3), dtype=np.uint8))
+    assert decode.source_dpi(io.BytesIO(png.tobytes())) is None
+    assert decode.reduction(None, 150) == 1
+    with tempfile.TemporaryDirectory() as tmpdir:
+        path = Path(tmpdir) / "fax.tiff"
+        _write_tiff(path, 2, dpi=400)
+        with path.open("rb") as fh:
+            assert decode.source_dpi(fh) == 400
+        assert decode.read_page(path, page=2, dpi=100).shape == (10, 15, 3)
+
+
+def test_missing_file_with_a_target_dpi_cannot_be_read():
+    runner = typer.testing.CliRunner()
+    with tempfile.TemporaryDirectory() as tmpdir:
+        missing = Path(tmpdir) / "missing.jpg"
+        assert decode.read_page(missing, dpi=150) is None
+        args = ["file", str(missing), "--out", str(Path(tmpdir) / "out.csv")]
+        result = runner.invoke(cli.app, args + ["--dpi", "150"])
+    assert result.exit_code == 2
+    assert "Cannot read image" in result.output
+
+
+def test_folder_tags_rows_with_pages_and_records_files(fake_lines):
+    runner = typer.testing.CliRunner()
+    with tempfile.TemporaryDirectory() as tmpdir:
+        folder = Path(tmpdir) / "in"
+        folder.mkdir()
+        _write_tiff(folder / "fax.tif", 3)
+        cv2.imwrite(str(folder / "scan.png"), np.full((8, 8, 3), 255, np.uint8))
+        (folder / "notes.txt").write_text("not an image")
+        out = Path(tmpdir) / "out.csv"
+        result = runner.invoke(
+            cli.app,
+            ["folder", str(folder), "--out", str(out), "-e", "tesseract", "--resume"],
+        )
+        assert result.exit_code == 0, result.output
+        assert "Processed fax.tif page 2" in result.output
+        df = pd.read_csv(out)
+        records = [
+            json.loads(line)
+            for line in out.with_name("out.csv.manifest.jsonl").read_text().splitlines()
+        ]
+    assert list(df.columns[:2]) == ["_source", "_page"]
+    assert df["_source"].tolist() == ["fax.tif"] * 3 + ["scan.png"]
+    assert df["_page"].tolist()[:3] == [1, 2, 3]
+    assert pd.isna(df["_page"].iloc[3])
+    assert df["A"].tolist() == [1, 2, 3, 4]
+    assert [(r["path"], r["rows"], r.get("pages")) for r in records] == [
+        ("fax.tif", 3, 3),
+        ("scan.png", 1, None),
+    ]
+
+
+@pytest.mark.parametrize("fmt", ["csv", "parquet"])
+def test_page_column_follows_source_when_a_plain_image_comes_first(fake_lines, fmt):
+    if fmt == "parquet":
+        pytest.importorskip("pyarrow")
+    runner = typer.testing.CliRunner()
+    with tempfile.TemporaryDirectory() as tmpdir:
+        folder = Path(tmpdir) / "in"
+        folder.mkdir()
+        cv2.imwrite(str(folder / "a.png"), np.full((8, 8, 3), 255, np.uint8))
+        _write_tiff(folder / "fax.tif", 2)
+        out = Path(tmpdir) / f"out.{fmt}"
+        args = ["folder", str(folder), "--out", str(out), "-e", "tesseract"]
+        result = runner.invoke(cli.app, args + ["--tables", "all", "--format", fmt])
+        assert result.exit_code == 0, result.output
+        df = pd.read_csv(out) if fmt == "csv" else pd.read_parquet(out)
+    assert df.columns.tolist() == ["_source", "_page", "_table", "A", "B"]
+    assert df["_source"].tolist() == ["a.png", "fax.tif", "fax.tif"]
+    assert df["_page"].tolist()[1:] == [1, 2]
+    assert df["A"].astype(int).tolist() == [1, 2, 3]
+
+
+def test_file_concatenates_the_pages_of_a_document(fake_lines):
+    runner = typer.testing.CliRunner()
+    with tempfile.TemporaryDirectory() as tmpdir:
+        path = Path(tmpdir) / "fax.tiff"
+        _write_tiff(path, 2)
+        out = Path(tmpdir) / "out.csv"
+        result = runner.invoke(
+            cli.app, ["file", str(path), "--out", str(out), "-e", "tesseract"]
+        )
+        assert result.exit_code == 0, result.output
+        df = pd.read_csv(out)
+    assert df.columns.tolist() == ["_page", "A", "B"]
+    assert df.values.tolist() == [[1, 1, "x"], [2, 2, "x"]]
+
+
+def _minimal_pdf(pages: int) -> bytes:
+    """A PDF of ``pages`` US-letter pages, each with a filled black square."""
+    kids = " ".join(f"{3 + 2 * i} 0 R" for i in range(pages))
+    objects = [b"<< /Type /Catalog /Pages 2 0 R >>"]
+    objects.append(f"<< /Type /Pages /Kids [{kids}] /Count {pages} >>".encode())
+    content = b"0 g 72 72 144 144 re f"
+    for i in range(pages):
+        objects.append(
+            f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] "
+            f"/Contents {4 + 2 * i} 0 R >>".encode()
+        )
+        objects.append(
+            b"<< /Length %d >>\nstream\n%s\nendstream" % (len(content), content)
+        )
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, 1):
+        offsets.append(len(out))
+        out += b"%d 0 obj\n%s\nendobj\n" % (number, body)
+    xref = len(out)
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    out += b"".join(b"%010d 00000 n \n" % offset for offset in offsets)
+    out += b"trailer\n<< /Size %d /Root 1 0 R >>\n" % (len(objects) + 1)
+    out += b"startxref\n%d\n%%%%EOF\n" % xref
+    return bytes(out)
+
+
+def test_pdf_pages_are_rendered_at_the_requested_dpi():
+    pytest.importorskip("pypdfium2")
+    data = _minimal_pdf(2)
+    assert decode.pages(Path("scan.pdf"), data) == [1, 2]
+    img = decode.read_page(Path("scan.pdf"), data, 2, dpi=72)
+    assert img.shape == (792, 612, 3)
+    assert img[792 - 144, 144].tolist() == [0, 0, 0]
+    height, width = decode.read_page(Path("scan.pdf"), data).shape[:2]
+    # PDF_DPI by default; pdfium may round the height up by one row.
+    assert width == 2550 and abs(height - 3300) <= 1
+
+
+def test_folder_records_unreadable_pdf_and_carries_on(fake_lines):
+    runner = typer.testing.CliRunner()
+    with tempfile.TemporaryDirectory() as tmpdir:
+        folder = Path(tmpdir) / "in"
+        folder.mkdir()
+        (folder / "broken.pdf").write_bytes(b"%PDF-1.4\nnot really a pdf")
+        cv2.imwrite(str(folder / "scan.png"), np.full((8, 8, 3), 255, np.uint8))
+        out = Path(tmpdir) / "out.csv"
+        result = runner.invoke(
+            cli.app,
+            ["folder", str(folder), "--out", str(out), "-e", "tesseract", "--resume"],
+        )
+        assert result.exit_code == 0, result.output
+        assert "Failed broken.pdf" in result.output
+        df = pd.read_csv(out)
+        records = [
+            json.loads(line)
+            for line in out.with_name("out.csv.manifest.jsonl").read_text().splitlines()
+        ]
+    assert df["_source"].tolist() == ["scan.png"]
+    assert [(r["path"], r["status"]) for r in records] == [
+        ("broken.pdf", "error"),
+        ("scan.png", "ok"),
+    ]
+    assert records[0]["error"]
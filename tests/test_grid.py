@@ -0,0 +1,89 @@
+import tempfile
+from pathlib import Path
+
+import cv2
+import numpy as np
+import typer.testing
+
+from image_to_csv import cli, pipeline
+from image_to_csv.bench import render_table
+from image_to_csv.grid import find_cells, read_table
+from image_to_csv.preprocess import preprocess
+
+
+def test_find_cells_recovers_the_ruled_lattice():
+    img, cells = render_table(800, 600, rows=6, cols=4, skew=1.5, noise=8.0)
+    lattice = find_cells(preprocess(img))
+    assert lattice is not None
+    assert (lattice.rows, lattice.cols) == (6, 4)
+    assert not any(lattice.blank)
+    x0, y0, x1, y1 = lattice.boxes[0]
+    assert 0 < x0 < x1 and 0 < y0 < y1
+
+
+def test_find_cells_returns_none_without_rulings():
+    img = np.full((200, 300, 3), 255, dtype=np.uint8)
+    cv2.putText(img, "no table", (20, 100), cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 0, 0))
+    assert find_cells(img) is None
+
+
+def test_read_table_ocrs_non_blank_cells_in_one_call():
+    img, _ = render_table(640, 480, rows=8, cols=2)
+    # Blank out the last cell so it is skipped.
+    lattice = find_cells(img)
+    x0, y0, x1, y1 = lattice.boxes[-1]
+    img[y0:y1, x0:x1] = 255
+    calls = []
+
+    def fake_ocr(image, boxes):
+        calls.append(len(boxes))
+        return [f"c{i}" for i in range(len(boxes))]
+
+    table = read_table(img, fake_ocr)
+    assert len(table) == 8
+    assert table[0] == ["c0", "c1"]
+    assert table[-1] == ["c14", ""]
+    assert calls == [15]
+
+
+def test_grid_engine_builds_frame_and_falls_back_to_word_boxes(monkeypatch):
+    def fake_cells(image, boxes):
+        return [f"v{i}" for i in range(len(boxes))]
+
+    def fake_words(image):
+        return {"text": ["plain"], "left": [0], "top": [0], "width": [5]}
+
+    monkeypatch.setattr(pipeline, "ocr_cells_tesseract", fake_cells)
+    monkeypatch.setattr(
+        pipeline,
+        "ocr_words_tesseract",
+        lambda image: dict(fake_words(image), height=[10], conf=[90.0]),
+    )
+    runner = typer.testing.CliRunner()
+    with tempfile.TemporaryDirectory() as tmpdir:
+        table, _ = render_table(640, 480, rows=6, cols=2)
+        cv2.imwrite(str(Path(tmpdir) / "a.png"), table)
+        cv2.imwrite(
+            str(Path(tmpdir) / "b.png"), np.full((60, 80, 3), 255, dtype=np.uint8)
+        )
+        out = Path(tmpdir) / "out.csv"
+        result = runner.invoke(
+            cli.app,
+            [
+                "folder",
+                tmpdir,
+                "--out",
+                str(out),
+                "--glob",
+                "*.png",
+                "--engine",
+                "grid",
+                "--profile",
+            ],
+        )
+        assert result.exit_code == 0, result.output
+        lines = out.read_text().splitlines()
+    assert lines[0] == "_source,v0,v1,text"
+    assert lines[1:6] == [f"a.png,v{2 * i},v{2 * i + 1}," for i in range(1, 6)]
+    assert lines[6] == "b.png,,,plain"
+    assert "grid=1" in result.output and "grid->tesseract=1" in result.output
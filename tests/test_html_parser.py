@@ -0,0 +1,64 @@
+import pandas as pd
+import pytest
+
+from image_to_csv.table_to_csv import html_to_df, html_to_dfs, read_html_tables
+
+CASES = {
+    "paddle": (
+        "<html><body><table><thead><tr><td>Item</td><td>Qty</td><td>Price</td>"
+        "</tr></thead><tbody><tr><td> Apple </td><td>3</td><td>1,250.50</td></tr>"
+        "<tr><td>Pear</td><td></td><td>2</td></tr></tbody></table></body></html>"
+    ),
+    "th_header": (
+        "<table><tr><th> Name </th><th>Score</th></tr>"
+        "<tr><td>Alice</td><td>10</td></tr><tr><td>Bob</td><td>NA</td></tr></table>"
+    ),
+    "no_header": "<table><tr><td>a</td><td>1</td></tr><tr><td>b</td><td>2</td></tr></table>",
+    "spans": (
+        "<table><thead><tr><td rowspan='2'>Region</td><td colspan='2'>Sales</td>"
+        "</tr><tr><td>Q1</td><td>Q2</td></tr></thead><tbody>"
+        "<tr><td rowspan='3'>North</td><td>1</td><td>2</td></tr>"
+        "<tr><td colspan='2'>n/a</td></tr><tr><td>5</td></tr></tbody></table>"
+    ),
+    "overhanging_rowspan": (
+        "<table><tr><th>A</th><th>B</th></tr>"
+        "<tr><td rowspan='3'>x</td><td>1</td></tr></table>"
+    ),
+    "ragged_and_whitespace": (
+        "<table><tr><th>A</th><th>B</th><th>C</th></tr>"
+        "<tr><td>one\n two</td><td>a<br>b</td></tr>"
+        "<tr><td>  <b>bold</b>  tail </td><td>x\t\ty</td><td>True</td></tr></table>"
+    ),
+    "footer_and_hidden": (
+        "<table><thead><tr><th>K</th><th>V</th></tr></thead>"
+        "<tbody><tr><td>a</td><td>1<span style='display: none'>9</span></td></tr>"
+        "</tbody><tfoot><tr><td>Total</td><td>1</td></tr></tfoot></table>"
+    ),
+    "duplicate_and_blank_headers": (
+        "<table><tr><th>A</th><th>A</th><th></th></tr>"
+        "<tr><td>1</td><td>2</td><td>3</td></tr></table>"
+    ),
+    "several_tables": (
+        "<table><tr><th>A</th></tr><tr><td>1</td></tr></table><p>text</p>"
+        "<table></table><table><tr><th>B</th></tr><tr><td>x</td></tr></table>"
+    ),
+}
+
+
+@pytest.mark.parametrize("name", sorted(CASES))
+def test_html_parser_matches_read_html(name):
+    html = CASES[name]
+    expected = read_html_tables(html)
+    actual = html_to_dfs(html)
+    assert len(actual) == len(expected)
+    for got, want in zip(actual, expected):
+        pd.testing.assert_frame_equal(got, want)
+
+
+def test_html_to_df_returns_first_table_and_rejects_empty_html():
+    df = html_to_df(CASES["several_tables"])
+    assert df.to_dict("list") == {"A": [1]}
+    with pytest.raises(RuntimeError, match="Could not parse"):
+        html_to_df("<p>no table here</p>")
+    with pytest.raises(RuntimeError, match="Could not parse"):
+        html_to_df("")
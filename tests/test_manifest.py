@@ -0,0 +1,87 @@
+import json
+import tempfile
+from pathlib import Path
+
+import cv2
+import numpy as np
+import pandas as pd
+import typer.testing
+
+from image_to_csv import cli, pipeline
+
+
+def _run_folder(folder: Path, out: Path):
+    runner = typer.testing.CliRunner()
+    return runner.invoke(
+        cli.app,
+        ["folder", str(folder), "--out", str(out), "-e", "tesseract", "--resume"],
+    )
+
+
+def test_resume_skips_done_files_and_records_errors(monkeypatch):
+    calls = []
+
+    def fake_lines(_img):
+        calls.append(1)
+        return ["A  B", f"{len(calls)}  x"]
+
+    monkeypatch.setattr(pipeline, "ocr_lines_tesseract", fake_lines)
+    with tempfile.TemporaryDirectory() as tmpdir:
+        folder = Path(tmpdir) / "in"
+        folder.mkdir()
+        for name in ("a.jpg", "b.jpg"):
+            cv2.imwrite(str(folder / name), np.full((4, 4, 3), 255, dtype=np.uint8))
+        (folder / "broken.jpg").write_bytes(b"not an image")
+        out = Path(tmpdir) / "out.csv"
+
+        first = _run_folder(folder, out)
+        assert first.exit_code == 0, first.output
+        assert len(calls) == 2
+        records = [
+            json.loads(line)
+            for line in out.with_name("out.csv.manifest.jsonl").read_text().splitlines()
+        ]
+        status = {rec["path"]: rec["status"] for rec in records}
+        assert status == {"a.jpg": "ok", "b.jpg": "ok", "broken.jpg": "error"}
+
+        second = _run_folder(folder, out)
+        assert second.exit_code == 0, second.output
+        assert len(calls) == 2
+
+        cv2.imwrite(str(folder / "a.jpg"), np.zeros((6, 6, 3), dtype=np.uint8))
+        third = _run_folder(folder, out)
+        assert third.exit_code == 0, third.output
+        assert len(calls) == 3
+        df = pd.read_csv(out)
+    assert sorted(df["_source"]) == ["a.jpg", "b.jpg"]
+    assert df.set_index("_source").loc["a.jpg", "A"] == 3
+
+
+def test_resume_drops_unrecorded_rows_by_relative_path(monkeypatch):
+    monkeypatch.setattr(
+        pipeline, "ocr_lines_tesseract", lambda img: ["A  B", f"{img.size}  x"]
+    )
+    runner = typer.testing.CliRunner()
+    with tempfile.TemporaryDirectory() as tmpdir:
+        folder = Path(tmpdir) / "in"
+        for sub, side in (("a", 4), ("b", 6)):
+            (folder / sub).mkdir(parents=True)
+            cv2.imwrite(
+                str(folder / sub / "x.png"),
+                np.full((side, side, 3), 255, dtype=np.uint8),
+            )
+        out = Path(tmpdir) / "out.csv"
+        args = ["folder", str(folder), "--out", str(out), "-e", "tesseract"]
+        args += ["--glob", "*/*.png", "--resume"]
+        assert runner.invoke(cli.app, args).exit_code == 0
+        # The process died after b/x.png's rows reached the output but before
+        # its manifest record did.
+        manifest = out.with_name("out.csv.manifest.jsonl")
+        lines = manifest.read_text().splitlines()
+        assert json.loads(lines[-1])["path"] == "b/x.png"
+        manifest.write_text(lines[0] + "\n")
+        result = runner.invoke(cli.app, args)
+        assert result.exit_code == 0, result.output
+        df = pd.read_csv(out)
+    assert df["_source"].tolist() == ["a/x.png", "b/x.png"]
+    assert df["A"].tolist() == [16, 36]
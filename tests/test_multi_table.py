@@ -0,0 +1,122 @@
+import io
+import sys
+import tempfile
+import types
+from pathlib import Path
+
+import cv2
+import numpy as np
+import pandas as pd
+import typer.testing
+
+from image_to_csv import cli, ocr, pipeline
+
+
+def _two_tables(img=None):
+    return [
+        {"type": "text", "res": [{"text": "Invoice"}], "bbox": [0, 0, 90, 10]},
+        {
+            "type": "table",
+            "bbox": np.array([10, 20, 200, 80]),
+            "res": {"html": "<table><tr><th>A</th></tr><tr><td>x</td></tr></table>"},
+        },
+        {
+            "type": "table",
+            "bbox": [10, 100, 200, 160],
+            "res": {"html": "<table><tr><th>B</th></tr><tr><td>y</td></tr></table>"},
+        },
+    ]
+
+
+def test_ocr_tables_paddle_returns_every_table_with_its_box():
+    img = np.zeros((4, 4, 3), dtype=np.uint8)
+    tables = ocr.ocr_tables_paddle(img, engine=_two_tables)
+    assert [t["bbox"] for t in tables] == [[10, 20, 200, 80], [10, 100, 200, 160]]
+    assert "<th>B</th>" in tables[1]["html"]
+    assert ocr.ocr_table_paddle(img, engine=_two_tables) == tables[0]["html"]
+    batched = list(ocr.ocr_tables_paddle_batch([img], _two_tables, all_tables=True))
+    assert batched == [tables]
+
+
+def test_tables_only_engine_skips_text_ocr(monkeypatch):
+    created = []
+
+    def fake_structure(ocr=True, show_log=True):
+        created.append({} if ocr else {"ocr": False})
+        return _two_tables
+
+    monkeypatch.setitem(
+        sys.modules, "paddleocr", types.SimpleNamespace(PPStructure=fake_structure)
+    )
+    ocr.reset_paddle_engine()
+    try:
+        assert ocr.get_paddle_engine(tables_only=True) is ocr.get_paddle_engine(
+            tables_only=True
+        )
+        ocr.get_paddle_engine()
+    finally:
+        ocr.reset_paddle_engine()
+    assert created == [{"ocr": False}, {}]
+
+
+def test_tables_only_passes_only_declared_names_to_v3(monkeypatch):
+    known = {"use_formula_recognition", "use_chart_recognition", "lang"}
+    created = []
+
+    def fake_v3(**kwargs):
+        # Like PPStructureV3: open **kwargs, but unknown names are errors.
+        unknown = set(kwargs) - known
+        if unknown:
+            raise ValueError(f"Unknown arguments: {sorted(unknown)}")
+        created.append(kwargs)
+        return _two_tables
+
+    monkeypatch.setitem(
+        sys.modules, "paddleocr", types.SimpleNamespace(PPStructureV3=fake_v3)
+    )
+    ocr.reset_paddle_engine()
+    try:
+        assert ocr.get_paddle_engine(tables_only=True) is _two_tables
+    finally:
+        ocr.reset_paddle_engine()
+    assert created == [{}]
+
+
+def _run(args, monkeypatch):
+    monkeypatch.setattr(pipeline, "get_paddle_engine", lambda **kwargs: _two_tables)
+    runner = typer.testing.CliRunner()
+    with tempfile.TemporaryDirectory() as tmpdir:
+        img = Path(tmpdir) / "page.png"
+        cv2.imwrite(str(img), np.full((8, 8, 3), 255, dtype=np.uint8))
+        out = Path(tmpdir) / "out.csv"
+        source = img if args[0] == "file" else Path(tmpdir)
+        result = runner.invoke(
+            cli.app, [args[0], str(source), "--out", str(out), *args[1:]]
+        )
+        assert result.exit_code == 0, result.output
+        written = {p.name: p.read_text() for p in Path(tmpdir).glob("out*.csv")}
+    return result, written
+
+
+def test_file_keeps_first_table_by_default_and_warns(monkeypatch):
+    result, written = _run(["file"], monkeypatch)
+    assert written["out.csv"].splitlines() == ["A", "x"]
+    assert "2 tables detected" in result.output
+
+
+def test_file_split_writes_one_csv_per_table(monkeypatch):
+    result, written = _run(["file", "--tables", "split"], monkeypatch)
+    assert written["out_table1.csv"].splitlines() == ["A", "x"]
+    assert written["out_table2.csv"].splitlines() == ["B", "y"]
+    assert "at [10, 100, 200, 160]" in result.output
+    assert "keeping the first" not in result.output
+
+
+def test_folder_all_tags_rows_with_table_number(monkeypatch):
+    _, written = _run(
+        ["folder", "--glob", "*.png", "--tables", "all", "--tables-only"], monkeypatch
+    )
+    df = pd.read_csv(io.StringIO(written["out.csv"]), dtype=str)
+    assert list(df.columns) == ["_source", "_table", "A", "B"]
+    assert df["_table"].tolist() == ["1", "2"]
+    assert df.fillna("")[["A", "B"]].values.tolist() == [["x", ""], ["", "y"]]
@@ -0,0 +1,113 @@
+import numpy as np
+
+from image_to_csv import ocr
+
+
+def _table(value):
+    return [{"type": "table", "res": {"html": f"<table>{value}</table>"}}]
+
+
+def test_batch_uses_predict_with_lists_and_keeps_order():
+    calls = []
+
+    class FakePipeline:
+        def predict(self, imgs):
+            calls.append(len(imgs))
+            return [_table(int(img[0, 0, 0])) for img in imgs]
+
+    imgs = [np.full((2, 2, 3), i, dtype=np.uint8) for i in range(5)]
+    htmls = list(ocr.ocr_tables_paddle_batch(imgs, engine=FakePipeline(), batch_size=2))
+    assert htmls == [f"<table>{i}</table>" for i in range(5)]
+    assert calls == [2, 2, 1]
+
+
+def test_batch_accepts_one_result_dict_per_image():
+    # PaddleOCR 3.x returns one result dict per input, not a list of items.
+    class FakeV3:
+        def predict(self, imgs):
+            if not isinstance(imgs, list):
+                imgs = [imgs]
+            return [{"input_path": None, "parsing_res_list": []} for _ in imgs]
+
+    imgs = [np.zeros((2, 2, 3), dtype=np.uint8) for _ in range(3)]
+    engine = FakeV3()
+    assert list(ocr.ocr_tables_paddle_batch(imgs, engine=engine, batch_size=2)) == [
+        ocr.ocr_table_paddle(img, engine=engine) for img in imgs
+    ]
+    tables = ocr.ocr_tables_paddle_batch(imgs, engine=engine, all_tables=True)
+    assert list(tables) == [[], [], []]
+
+
+def test_batch_falls_back_to_single_calls_for_callable_engines():
+    seen = []
+
+    def engine(img):
+        seen.append(img.shape)
+        return [] if img[0, 0, 0] else _table("x")
+
+    imgs = [np.zeros((2, 2, 3), dtype=np.uint8), np.ones((2, 2, 3), dtype=np.uint8)]
+    captured = []
+    htmls = list(
+        ocr.ocr_tables_paddle_batch(
+            imgs, engine=engine, debug_callback=lambda i, r: captured.append(i)
+        )
+    )
+    assert htmls == ["<table>x</table>", None]
+    assert len(seen) == 2
+    assert captured == [0, 1]
+
+
+def test_folder_sends_paddle_images_in_batches(monkeypatch):
+    import tempfile
+    from pathlib import Path
+
+    import cv2
+    import pandas as pd
+    import typer.testing
+
+    from image_to_csv import cli, pipeline
+
+    calls = []
+
+    class FakePipeline:
+        def predict(self, imgs):
+            calls.append(len(imgs))
+            return [_table("<tr><th>A</th></tr><tr><td>1</td></tr>") for _ in imgs]
+
+    monkeypatch.setattr(pipeline, "get_paddle_engine", lambda: FakePipeline())
+    with tempfile.TemporaryDirectory() as tmpdir:
+        for name in ("a.jpg", "b.jpg", "c.jpg"):
+            cv2.imwrite(str(Path(tmpdir) / name), np.full((4, 4, 3), 255, np.uint8))
+        out = Path(tmpdir) / "out.csv"
+        result = typer.testing.CliRunner().invoke(
+            cli.app,
+            ["folder", tmpdir, "--out", str(out), "--batch-size", "2"],
+        )
+        assert result.exit_code == 0, result.output
+        df = pd.read_csv(out)
+    assert calls == [2, 1]
+    assert list(df["_source"]) == ["a.jpg", "b.jpg", "c.jpg"]
+
+
+def test_gray_pages_are_expanded_into_reused_buffers():
+    seen = []
+
+    class FakePipeline:
+        def predict(self, imgs):
+            seen.append([img.__array_interface__["data"][0] for img in imgs])
+            assert all(img.shape == (4, 6, 3) for img in imgs)
+            return [_table(int(img[0, 0, 2])) for img in imgs]
+
+    imgs = [np.full((4, 6), i, dtype=np.uint8) for i in range(4)]
+    htmls = list(ocr.ocr_tables_paddle_batch(imgs, engine=FakePipeline(), batch_size=2))
+    assert htmls == [f"<table>{i}</table>" for i in range(4)]
+    # Each batch position keeps its buffer, so the second batch allocates none.
+    assert seen[0] == seen[1] and seen[0][0] != seen[0][1]
+
+
+def test_tesseract_gets_gray_pages_without_a_copy():
+    gray = np.zeros((4, 6), dtype=np.uint8)
+    assert ocr._tesseract_pixels(gray) is gray
+    bgr = np.zeros((4, 6, 3), dtype=np.uint8)
+    bgr[..., 0] = 255
+    assert ocr._tesseract_pixels(bgr)[0, 0].tolist() == [0, 0, 255]
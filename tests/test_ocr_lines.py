@@ -8,6 +8,15 @@ import pytest
 from image_to_csv import ocr
 
 
+@pytest.fixture(autouse=True)
+def tesseract_backend(monkeypatch):
+    """Default to the pytesseract path; tests opt into a fake tesserocr."""
+    monkeypatch.setenv("IMAGE_TO_CSV_TESSERACT", "pytesseract")
+    ocr.reset_tesseract_pool()
+    yield
+    ocr.reset_tesseract_pool()
+
+
 def test_ocr_lines_tesseract_converts_text(monkeypatch):
     fake_module = types.SimpleNamespace(image_to_string=lambda img: "foo\nbar\n")
     monkeypatch.setitem(sys.modules, "pytesseract", fake_module)
@@ -33,3 +42,107 @@ def test_ocr_lines_tesseract_missing_dependency(monkeypatch):
     img = np.zeros((2, 2, 3), dtype=np.uint8)
     with pytest.raises(RuntimeError, match="pytesseract not installed"):
         ocr.ocr_lines_tesseract(img)
+
+
+def test_ocr_words_tesseract_returns_word_boxes(monkeypatch):
+    data = {
+        "text": ["", "Name", " ", "Score"],
+        "left": [0, 5, 0, 80],
+        "top": [0, 6, 0, 7],
+        "width": [100, 40, 0, 50],
+        "height": [30, 12, 0, 12],
+        "conf": ["-1", "96.5", "-1", 91],
+    }
+    fake_module = types.SimpleNamespace(
+        image_to_data=lambda img, output_type: data,
+        Output=types.SimpleNamespace(DICT="dict"),
+    )
+    monkeypatch.setitem(sys.modules, "pytesseract", fake_module)
+    monkeypatch.setitem(
+        sys.modules,
+        "PIL",
+        types.SimpleNamespace(Image=types.SimpleNamespace(fromarray=lambda img: img)),
+    )
+    words = ocr.ocr_words_tesseract(np.zeros((3, 3, 3), dtype=np.uint8))
+    assert words["text"] == ["Name", "Score"]
+    assert words["left"] == [5, 80]
+    assert words["conf"] == [96.5, 91.0]
+
+
+class _FakeTessAPI:
+    created = 0
+
+    def __init__(self, lang):
+        type(self).created += 1
+        self.ended = False
+
+    def SetImageBytes(self, data, width, height, bpp, bpl):
+        assert len(data) == height * bpl and bpp == 3
+        self.size = (width, height)
+
+    def GetUTF8Text(self):
+        return "Name  Score\n\nAlice  10\n"
+
+    def Recognize(self):
+        pass
+
+    def GetIterator(self):
+        return [("Name", (5, 6, 45, 18), 96.0), ("  ", (0, 0, 1, 1), 0.0)]
+
+    def End(self):
+        self.ended = True
+
+
+class _FakeWord:
+    def __init__(self, item):
+        self.text, self.box, self.conf = item
+
+    def GetUTF8Text(self, level):
+        return self.text
+
+    def BoundingBox(self, level):
+        return self.box
+
+    def Confidence(self, level):
+        return self.conf
+
+
+def _fake_tesserocr(monkeypatch):
+    _FakeTessAPI.created = 0
+    module = types.SimpleNamespace(
+        PyTessBaseAPI=_FakeTessAPI,
+        RIL=types.SimpleNamespace(WORD=3),
+        iterate_level=lambda iterator, level: map(_FakeWord, iterator),
+    )
+    monkeypatch.setitem(sys.modules, "tesserocr", module)
+    monkeypatch.setenv("IMAGE_TO_CSV_TESSERACT", "auto")
+    ocr.reset_tesseract_pool()
+
+
+def test_tesserocr_pool_reuses_engines_for_in_memory_images(monkeypatch):
+    _fake_tesserocr(monkeypatch)
+    img = np.zeros((4, 6, 3), dtype=np.uint8)
+    for _ in range(3):
+        assert ocr.ocr_lines_tesseract(img) == ["Name  Score", "Alice  10"]
+    assert _FakeTessAPI.created == 1
+    words = ocr.ocr_words_tesseract(img)
+    assert words["text"] == ["Name"]
+    assert (words["left"], words["width"], words["height"]) == ([5], [40], [12])
+    assert _FakeTessAPI.created == 1
+
+
+def test_tesserocr_pool_limits_engines_to_its_size(monkeypatch):
+    import threading
+
+    _fake_tesserocr(monkeypatch)
+    pool = ocr.TesseractPool(sys.modules["tesserocr"], size=2)
+    held = [pool.acquire() for _ in range(2)]
+    apis = [cm.__enter__() for cm in held]
+    got = []
+    waiter = threading.Thread(target=lambda: got.append(pool.acquire().__enter__()))
+    waiter.start()
+    waiter.join(0.1)
+    assert waiter.is_alive() and _FakeTessAPI.created == 2
+    held[0].__exit__(None, None, None)
+    waiter.join(1)
+    assert got == [apis[0]]
@@ -9,17 +9,17 @@ def test_preprocess_returns_same_image_when_disabled():
     assert out is img
 
 
-def test_preprocess_clean_produces_bgr_image(monkeypatch):
+def test_preprocess_clean_produces_single_channel_image(monkeypatch):
     img = np.full((6, 6, 3), 200, dtype=np.uint8)
     called = {}
 
-    def fake_deskew(gray):
+    def fake_deskew(gray, dst=None):
         called["gray"] = gray
         return gray
 
     monkeypatch.setattr(preprocess_module, "deskew", fake_deskew)
     out = preprocess(img, do_clean=True)
-    assert out.shape == img.shape
+    assert out.shape == img.shape[:2]
     assert out.dtype == np.uint8
     assert out is not img
     assert "gray" in called
@@ -30,3 +30,74 @@ def test_deskew_no_lines_returns_input():
     out = deskew(gray)
     assert out.shape == gray.shape
     assert np.array_equal(out, gray)
+
+
+def test_fast_profiles_stay_close_to_quality_output():
+    from image_to_csv.bench import render_table
+
+    img, _ = render_table(640, 480, skew=2.0, noise=8.0)
+    reference = preprocess(img, profile="quality")
+    for profile in ("balanced", "fast"):
+        out = preprocess(img, profile=profile)
+        assert out.shape == reference.shape
+        assert np.mean(out == reference) > 0.95
+
+
+def test_estimate_skew_on_downscaled_copy_matches_full_resolution():
+    from image_to_csv.bench import render_table
+    from image_to_csv.preprocess import estimate_skew
+    import cv2
+
+    img, _ = render_table(2000, 1400, skew=3.0)
+    gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+    full = estimate_skew(gray)
+    small = estimate_skew(gray, max_side=800)
+    assert abs(full) > 1
+    assert abs(full - small) <= 1.0
+
+
+def test_preprocess_rejects_unknown_profile():
+    import pytest
+
+    with pytest.raises(ValueError, match="Unknown preprocess profile"):
+        preprocess(np.zeros((4, 4, 3), dtype=np.uint8), profile="turbo")
+
+
+def test_adaptive_preprocess_skips_clean_screenshots():
+    from image_to_csv.bench import render_table
+    from image_to_csv.preprocess import adaptive_preprocess
+
+    img, _ = render_table(640, 480)
+    out, report = adaptive_preprocess(img)
+    assert out is img
+    assert report["steps"] == []
+    assert set(report["metrics"]) == {"noise", "bimodality", "contrast", "skew"}
+
+
+def test_adaptive_preprocess_denoises_noisy_scans():
+    from image_to_csv.bench import render_table
+    from image_to_csv.preprocess import adaptive_preprocess
+
+    img, _ = render_table(640, 480, noise=12.0)
+    out, report = adaptive_preprocess(img)
+    assert "denoise" in report["steps"]
+    assert "binarize" in report["steps"]
+    assert out.shape == img.shape[:2]
+
+
+def test_preprocess_allocates_one_page_buffer_per_image():
+    import tracemalloc
+
+    from image_to_csv.bench import render_table
+
+    img, _ = render_table(1600, 1200, rows=20, skew=2.0, noise=8.0)
+    first = preprocess(img, profile="balanced", tile_above=0)
+    tracemalloc.start()
+    second = preprocess(img, profile="balanced", tile_above=0)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    # Only the result is allocated; the scratch buffer from the first image
+    # holds the gray copy, the edge map and the rotation.
+    assert second.nbytes <= peak < second.nbytes * 1.25
+    assert np.array_equal(first, second)
+    assert not np.shares_memory(first, second)
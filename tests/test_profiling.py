@@ -0,0 +1,81 @@
+import json
+import tempfile
+from pathlib import Path
+
+import cv2
+import numpy as np
+import typer.testing
+
+from image_to_csv import cli, pipeline
+from image_to_csv.profiling import instrument, recording, summarize
+
+
+def test_instrument_records_only_while_recording():
+    @instrument("double")
+    def double(img):
+        return img * 2
+
+    img = np.ones((3, 4), dtype=np.uint8)
+    double(img)
+    events = []
+    with recording(events):
+        double(img)
+    assert len(events) == 1
+    assert events[0]["stage"] == "double"
+    assert events[0]["shape"] == [3, 4]
+    assert events[0]["wall"] >= 0
+
+
+def test_summarize_reports_stages_and_routes():
+    records = [
+        {
+            "seconds": 0.2,
+            "route": "paddle",
+            "events": [{"stage": "x", "wall": 0.1, "cpu": 0.1}],
+        },
+        {"seconds": 0.4, "route": "cache", "events": []},
+    ]
+    report = summarize(records)
+    assert "image (total)" in report
+    assert "x" in report
+    assert "cache=1" in report and "paddle=1" in report
+
+
+def test_folder_profile_json_lists_stage_events(monkeypatch):
+    monkeypatch.setattr(pipeline, "ocr_lines_tesseract", lambda img: ["A  B", "1  2"])
+    with tempfile.TemporaryDirectory() as tmpdir:
+        cv2.imwrite(str(Path(tmpdir) / "a.jpg"), np.full((8, 8, 3), 255, np.uint8))
+        out = Path(tmpdir) / "out.csv"
+        dump = Path(tmpdir) / "profile.jsonl"
+        result = typer.testing.CliRunner().invoke(
+            cli.app,
+            ["folder", tmpdir, "--out", str(out), "-e", "tesseract"]
+            + ["--profile-json", str(dump)],
+        )
+        assert result.exit_code == 0, result.output
+        rec = json.loads(dump.read_text().splitlines()[0])
+    stages = {ev["stage"] for ev in rec["events"]}
+    assert {"decode", "preprocess", "deskew", "lines_to_df"} <= stages
+    assert rec["route"] == "tesseract"
+    assert "image (total)" in result.output
+
+
+def test_folder_profile_json_is_flushed_when_the_run_fails(monkeypatch):
+    from image_to_csv import writers
+
+    def broken_write(self, df):
+        raise OSError("disk full")
+
+    monkeypatch.setattr(pipeline, "ocr_lines_tesseract", lambda img: ["A  B", "1  2"])
+    monkeypatch.setattr(writers.StreamingCSVWriter, "write", broken_write)
+    with tempfile.TemporaryDirectory() as tmpdir:
+        cv2.imwrite(str(Path(tmpdir) / "a.jpg"), np.full((8, 8, 3), 255, np.uint8))
+        dump = Path(tmpdir) / "profile.jsonl"
+        result = typer.testing.CliRunner().invoke(
+            cli.app,
+            ["folder", tmpdir, "--out", str(Path(tmpdir) / "out.csv")]
+            + ["-e", "tesseract", "--resume", "--profile-json", str(dump)],
+        )
+        assert isinstance(result.exception, OSError)
+        lines = dump.read_text().splitlines()
+    assert json.loads(lines[0])["path"] == "a.jpg"
@@ -0,0 +1,99 @@
+import json
+import tempfile
+from pathlib import Path
+
+import cv2
+import numpy as np
+import pandas as pd
+import typer.testing
+
+from image_to_csv import cli, pipeline
+from image_to_csv.bench import StubTableEngine, render_table
+from image_to_csv.routing import check_table, classify_page
+
+
+def _text_page():
+    img = np.full((300, 400, 3), 255, dtype=np.uint8)
+    for i, line in enumerate(["Name   Score", "Alice  10", "Bob    8"]):
+        cv2.putText(
+            img, line, (20, 60 + 50 * i), cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 0, 0), 2
+        )
+    return img
+
+
+def test_classify_page_routes_by_ruling_and_ink():
+    ruled, _ = render_table(640, 480, rows=6, cols=3)
+    plan = classify_page(ruled)
+    assert plan.engines == ["grid", "tesseract-tsv", "paddle"]
+    assert plan.lattice is not None and plan.features["cells"] == [6, 3]
+
+    assert classify_page(_text_page()).engines == ["tesseract-tsv", "paddle"]
+    blank = np.full((100, 100, 3), 255, dtype=np.uint8)
+    assert classify_page(blank).engines == ["tesseract-tsv"]
+
+
+def test_check_table_flags_implausible_frames():
+    good = pd.DataFrame({"_source": ["a", "a"], "A": ["1", "2"], "B": ["x", ""]})
+    assert check_table(good) is None
+    assert check_table(pd.DataFrame({"text": ["a line"]})) == "no table structure"
+    assert check_table(pd.DataFrame({"A": ["1"]})) == "1 column(s)"
+    assert check_table(pd.DataFrame(columns=["A", "B"])) == "no data rows"
+    sparse = pd.DataFrame({"A": ["1", "", ""], "B": ["", "", "3"], "C": [""] * 3})
+    assert check_table(sparse) == "78% empty cells"
+    ragged = pd.DataFrame({"A": ["1", "2", "3"], "B": ["1", "2", ""], "C": list("12 ")})
+    assert check_table(ragged) == "33% ragged rows"
+
+
+def test_auto_engine_escalates_only_when_checks_fail(monkeypatch):
+    def fake_cells(image, boxes):
+        return [f"v{i}" for i in range(len(boxes))]
+
+    def fake_words(image):
+        # A single column of text: fails the structural checks.
+        return {
+            "text": ["just", "words"],
+            "left": [10, 10],
+            "top": [10, 50],
+            "width": [40, 40],
+            "height": [20, 20],
+            "conf": [90.0, 90.0],
+        }
+
+    monkeypatch.setattr(pipeline, "ocr_cells_tesseract", fake_cells)
+    monkeypatch.setattr(pipeline, "ocr_words_tesseract", fake_words)
+    paddle = StubTableEngine([["Name", "Score"], ["Alice", "10"]])
+    monkeypatch.setattr(pipeline, "get_paddle_engine", lambda: paddle)
+    runner = typer.testing.CliRunner()
+    with tempfile.TemporaryDirectory() as tmpdir:
+        ruled, _ = render_table(640, 480, rows=6, cols=2)
+        cv2.imwrite(str(Path(tmpdir) / "a.png"), ruled)
+        cv2.imwrite(str(Path(tmpdir) / "b.png"), _text_page())
+        out = Path(tmpdir) / "out.csv"
+        manifest = Path(tmpdir) / "m.jsonl"
+        result = runner.invoke(
+            cli.app,
+            [
+                "folder",
+                tmpdir,
+                "--out",
+                str(out),
+                "--glob",
+                "*.png",
+                "--engine",
+                "auto",
+                "--manifest",
+                str(manifest),
+            ],
+        )
+        assert result.exit_code == 0, result.output
+        records = [json.loads(line) for line in manifest.read_text().splitlines()]
+        df = pd.read_csv(out, dtype=str).fillna("")
+    assert "Processed a.png [auto:grid]" in result.output
+    assert "Processed b.png [auto:tesseract-tsv->paddle]" in result.output
+    assert [r["route"] for r in records] == [
+        "auto:grid",
+        "auto:tesseract-tsv->paddle",
+    ]
+    assert df[df["_source"] == "b.png"][["Name", "Score"]].values.tolist() == [
+        ["Alice", "10"]
+    ]
@@ -0,0 +1,231 @@
+import json
+import tempfile
+import threading
+from pathlib import Path
+
+import cv2
+import numpy as np
+import pytest
+import typer.testing
+
+from image_to_csv import cli, pipeline, server
+
+
+def _png_bytes() -> bytes:
+    ok, buf = cv2.imencode(".png", np.full((8, 8, 3), 255, dtype=np.uint8))
+    assert ok
+    return buf.tobytes()
+
+
+@pytest.fixture
+def running(monkeypatch):
+    """Serve a Tesseract-backed converter on an ephemeral port."""
+    monkeypatch.setattr(pipeline, "ocr_lines_tesseract", lambda img: ["A  B", "1  2"])
+    started = []
+
+    def start(convert=None, workers=1, queue_size=4, **options):
+        settings = pipeline.Settings(engine="tesseract")
+        pool = server.EnginePool(None, workers, queue_size)
+        srv = server.make_server(
+            "127.0.0.1:0",
+            convert or server.pipeline_converter(settings),
+            pool,
+            "tesseract",
+            **options,
+        )
+        threading.Thread(target=srv.serve_forever, daemon=True).start()
+        started.append(srv)
+        return server.server_url(srv)
+
+    yield start
+    for srv in started:
+        srv.shutdown()
+        server.close_server(srv)
+
+
+def test_server_converts_uploaded_bytes_to_csv_and_json(running):
+    address = running()
+    body = server.convert_remote(address, _png_bytes(), "page.png")
+    assert body.decode().splitlines() == ["A,B", "1,2"]
+
+    table = json.loads(server.convert_remote(address, _png_bytes(), "p.png", "json"))
+    assert table["columns"] == ["A", "B"]
+    assert table["data"] == [["1", "2"]]
+
+
+def _post_path(address: str, path) -> tuple:
+    return server.request(
+        address,
+        "POST",
+        "/convert",
+        json.dumps({"path": str(path)}).encode(),
+        {"Content-Type": "application/json"},
+    )
+
+
+def test_server_accepts_a_path_and_reports_health_and_metrics(running):
+    with tempfile.TemporaryDirectory() as tmpdir:
+        address = running(allow_paths=Path(tmpdir))
+        img = Path(tmpdir) / "page.png"
+        img.write_bytes(_png_bytes())
+        status, body = _post_path(address, img)
+    assert status == 200
+    assert body.decode().splitlines()[0] == "A,B"
+
+    status, body = server.request(address, "GET", "/health")
+    assert status == 200
+    assert json.loads(body)["status"] == "ok"
+
+    server.convert_remote(address, _png_bytes(), "x.png")
+    with pytest.raises(RuntimeError, match="422"):
+        server.convert_remote(address, b"not an image", "bad.png")
+    metrics = json.loads(server.request(address, "GET", "/metrics")[1])
+    assert metrics["requests"] == 3
+    assert metrics["succeeded"] == 2
+    assert metrics["failed"] == 1
+    assert "p50" in metrics["latency_ms"]
+
+
+def test_server_only_reads_paths_under_the_allowed_directory(running):
+    with tempfile.TemporaryDirectory() as tmpdir:
+        root = Path(tmpdir) / "scans"
+        root.mkdir()
+        (root / "page.png").write_bytes(_png_bytes())
+        (Path(tmpdir) / "secret.png").write_bytes(_png_bytes())
+        closed = running()
+        assert _post_path(closed, root / "page.png")[0] == 403
+        address = running(allow_paths=root)
+        assert _post_path(address, "page.png")[0] == 200
+        assert _post_path(address, Path(tmpdir) / "secret.png")[0] == 403
+        assert _post_path(address, "../secret.png")[0] == 403
+
+
+def test_server_refuses_bodies_over_the_limit(running):
+    address = running(max_body=64)
+    with pytest.raises(RuntimeError, match="413"):
+        server.convert_remote(address, _png_bytes() + b"\0" * 64, "big.png")
+    metrics = json.loads(server.request(address, "GET", "/metrics")[1])
+    assert metrics["requests"] == 0
+
+
+def test_server_rejects_requests_beyond_the_queue(running):
+    entered, release = threading.Event(), threading.Event()
+
+    def slow(path, data, engine, options):
+        entered.set()
+        release.wait(5)
+        return pipeline.convert_path(path, pipeline.Settings(engine="tesseract"), data)
+
+    address = running(convert=slow, workers=1, queue_size=0)
+    first = threading.Thread(
+        target=server.convert_remote, args=(address, _png_bytes(), "a.png")
+    )
+    first.start()
+    assert entered.wait(5)
+    with pytest.raises(RuntimeError, match="503"):
+        server.convert_remote(address, _png_bytes(), "b.png")
+    release.set()
+    first.join(5)
+    metrics = json.loads(server.request(address, "GET", "/metrics")[1])
+    assert metrics["rejected"] == 1
+
+
+def test_file_command_delegates_to_a_running_server(running):
+    address = running()
+    runner = typer.testing.CliRunner()
+    with tempfile.TemporaryDirectory() as tmpdir:
+        img = Path(tmpdir) / "page.png"
+        out = Path(tmpdir) / "out.csv"
+        img.write_bytes(_png_bytes())
+        result = runner.invoke(
+            cli.app, ["file", str(img), "--out", str(out), "--server", address]
+        )
+        assert result.exit_code == 0, result.output
+        assert out.read_text().splitlines() == ["A,B", "1,2"]
+    assert "Wrote 1 rows x 2 cols" in result.output
+
+
+def test_parse_address():
+    assert server.parse_address("unix:/tmp/ocr.sock") == ("unix", "/tmp/ocr.sock")
+    assert server.parse_address("http://localhost:9000/") == (
+        "tcp",
+        ("localhost", 9000),
+    )
+    with pytest.raises(ValueError):
+        server.parse_address("localhost")
+
+
+def test_auto_server_gives_each_worker_its_own_paddle_engine(monkeypatch):
+    from image_to_csv import ocr
+    from image_to_csv.bench import StubTableEngine
+
+    created = []
+
+    def create(tables_only=False):
+        created.append(StubTableEngine([["Name", "Score"], ["Alice", "10"]]))
+        return created[-1]
+
+    def shared(**kwargs):
+        raise AssertionError("the process-wide engine must not be used")
+
+    def one_column(image):
+        return {
+            "text": ["just", "words"],
+            "left": [10, 10],
+            "top": [10, 50],
+            "width": [40, 40],
+            "height": [20, 20],
+            "conf": [90.0, 90.0],
+        }
+
+    monkeypatch.setattr(ocr, "create_paddle_engine", create)
+    monkeypatch.setattr(pipeline, "get_paddle_engine", shared)
+    monkeypatch.setattr(pipeline, "ocr_words_tesseract", one_column)
+    pool = server.EnginePool(server.engine_factory("auto"), size=2)
+    assert len(created) == 2 and created[0] is not created[1]
+    img = np.full((300, 400, 3), 255, dtype=np.uint8)
+    cv2.putText(img, "Name  Score", (20, 60), cv2.FONT_HERSHEY_SIMPLEX, 1, 0, 2)
+    ok, buf = cv2.imencode(".png", img)
+    convert = server.pipeline_converter(pipeline.Settings(engine="auto"))
+    with pool.acquire() as engine:
+        df = convert(Path("page.png"), buf.tobytes(), engine, {})
+    assert df[["Name", "Score"]].values.tolist() == [["Alice", 10]]
+
+
+def test_file_via_server_forwards_options_and_converts_every_page(running):
+    address = running()
+    runner = typer.testing.CliRunner()
+    with tempfile.TemporaryDirectory() as tmpdir:
+        fax = Path(tmpdir) / "fax.tiff"
+        page = np.full((8, 8, 3), 255, dtype=np.uint8)
+        assert cv2.imwritemulti(str(fax), [page, page])
+        out = Path(tmpdir) / "out.csv"
+        args = ["file", str(fax), "--out", str(out), "--server", address]
+        result = runner.invoke(cli.app, args + ["--tables", "all", "--dpi", "150"])
+        assert result.exit_code == 0, result.output
+        rows = out.read_text().splitlines()
+        other = runner.invoke(cli.app, args + ["--engine", "grid"])
+        local_only = runner.invoke(cli.app, args + ["--tables-only"])
+    assert rows == ["_page,_table,A,B", "1,1,1,2", "2,1,1,2"]
+    assert other.exit_code == 1
+    assert "runs the tesseract engine, not grid" in other.output
+    assert local_only.exit_code != 0
+    assert "--tables-only cannot be used with --server" in local_only.output
+
+
+def test_file_via_server_ignores_cache_dir_from_the_environment(running, monkeypatch):
+    address = running()
+    runner = typer.testing.CliRunner()
+    with tempfile.TemporaryDirectory() as tmpdir:
+        img = Path(tmpdir) / "page.png"
+        img.write_bytes(_png_bytes())
+        out = Path(tmpdir) / "out.csv"
+        args = ["file", str(img), "--out", str(out), "--server", address]
+        monkeypatch.setenv("IMAGE_TO_CSV_CACHE_DIR", str(Path(tmpdir) / "cache"))
+        result = runner.invoke(cli.app, args)
+        assert result.exit_code == 0, result.output
+        assert out.read_text().splitlines() == ["A,B", "1,2"]
+        assert not (Path(tmpdir) / "cache").exists()
+        flagged = runner.invoke(cli.app, args + ["--cache-dir", tmpdir])
+    assert flagged.exit_code != 0
+    assert "--cache-dir cannot be used with --server" in flagged.output
@@ -0,0 +1,61 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from image_to_csv.stages import bounded_map
+
+
+def test_bounded_map_keeps_input_order():
+    def slow_first(x):
+        time.sleep(0.05 if x == 0 else 0)
+        return x * 10
+
+    assert list(bounded_map(slow_first, range(6), workers=3)) == [0, 10, 20, 30, 40, 50]
+
+
+def test_bounded_map_limits_items_pulled_ahead():
+    pulled = []
+    lock = threading.Lock()
+
+    def source():
+        for i in range(20):
+            with lock:
+                pulled.append(i)
+            yield i
+
+    results = bounded_map(lambda x: x, source(), workers=2, max_pending=3)
+    first = next(results)
+    assert first == 0
+    assert len(pulled) == 3
+    assert list(results) == list(range(1, 20))
+
+
+def test_bounded_map_on_a_given_executor_keeps_the_window():
+    pulled = []
+
+    def source():
+        for i in range(20):
+            pulled.append(i)
+            yield i
+
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        results = bounded_map(lambda x: x * 2, source(), workers=2, executor=pool)
+        assert next(results) == 0
+        assert len(pulled) == 4
+        assert list(results) == [i * 2 for i in range(1, 20)]
+        # The caller's executor is left open.
+        assert pool.submit(int, "7").result() == 7
+
+
+def test_stages_chain_and_propagate_errors():
+    def boom(x):
+        if x == 2:
+            raise ValueError("bad item")
+        return x
+
+    chained = bounded_map(boom, bounded_map(lambda x: x, range(4)), workers=2)
+    assert next(chained) == 0
+    with pytest.raises(ValueError, match="bad item"):
+        list(chained)
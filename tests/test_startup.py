@@ -0,0 +1,67 @@
+import json
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+import image_to_csv
+
+HEAVY = ("pandas", "cv2", "numpy", "paddleocr", "paddle", "pytesseract", "pyarrow")
+# Eager pandas + OpenCV imports alone take several times longer than this.
+# Wall-clock limits are flaky on shared CI machines, so the timing check only
+# runs when IMAGE_TO_CSV_TIMING_TESTS is set; the tests above already check
+# that nothing heavy is imported.
+IMPORT_BUDGET_S = 0.25
+
+
+def _run(code: str) -> str:
+    env = dict(os.environ)
+    src = str(Path(image_to_csv.__file__).resolve().parents[1])
+    env["PYTHONPATH"] = os.pathsep.join(filter(None, [src, env.get("PYTHONPATH")]))
+    result = subprocess.run(
+        [sys.executable, "-c", code],
+        capture_output=True,
+        text=True,
+        env=env,
+        check=True,
+    )
+    return result.stdout
+
+
+def test_cli_import_does_not_load_heavy_dependencies():
+    code = (
+        "import json, sys\n"
+        "import image_to_csv.cli\n"
+        f"print(json.dumps([m for m in {HEAVY!r} if m in sys.modules]))\n"
+    )
+    assert json.loads(_run(code)) == []
+
+
+def test_cli_help_does_not_load_heavy_dependencies():
+    code = (
+        "import json, sys\n"
+        "from typer.testing import CliRunner\n"
+        "from image_to_csv.cli import app\n"
+        "res = CliRunner().invoke(app, ['folder', '--help'])\n"
+        "assert res.exit_code == 0, res.output\n"
+        f"print(json.dumps([m for m in {HEAVY!r} if m in sys.modules]))\n"
+    )
+    assert json.loads(_run(code)) == []
+
+
+@pytest.mark.skipif(
+    not os.environ.get("IMAGE_TO_CSV_TIMING_TESTS"),
+    reason="timing check; set IMAGE_TO_CSV_TIMING_TESTS=1 to run it",
+)
+def test_cli_import_time_budget():
+    code = (
+        "import time\n"
+        "start = time.perf_counter()\n"
+        "import image_to_csv.cli\n"
+        "print(time.perf_counter() - start)\n"
+    )
+    # Best of three runs so a single slow start does not fail the build.
+    best = min(float(_run(code)) for _ in range(3))
+    assert best < IMPORT_BUDGET_S, f"importing the CLI took {best:.3f}s"
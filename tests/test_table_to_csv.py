@@ -36,3 +36,125 @@ def test_lines_to_df_returns_text_column_when_no_table():
     df = lines_to_df(lines)
     assert list(df.columns) == ["text"]
     assert df.iloc[0, 0] == "Notes"
+
+
+def _words(boxes, height=20):
+    return {
+        "text": [b[0] for b in boxes],
+        "left": [b[1] for b in boxes],
+        "top": [b[2] for b in boxes],
+        "width": [10 * len(b[0]) for b in boxes],
+        "height": [height] * len(boxes),
+        "conf": [90.0] * len(boxes),
+    }
+
+
+def test_words_to_df_clusters_word_boxes_into_a_grid():
+    from image_to_csv.table_to_csv import words_to_df
+
+    words = _words(
+        [
+            ("Weekly", 200, 10),
+            ("Report", 270, 10),
+            ("Date", 10, 50),
+            ("Mood", 200, 52),
+            ("Hours", 400, 49),
+            ("slept", 455, 50),
+            ("2024-01-01", 10, 90),
+            ("Very", 200, 91),
+            ("happy", 245, 90),
+            ("7", 400, 90),
+            ("2024-01-02", 10, 130),
+            ("8", 410, 131),
+        ]
+    )
+    df = words_to_df(words)
+    assert list(df.columns) == ["Date", "Mood", "Hours slept"]
+    assert df.values.tolist() == [
+        ["2024-01-01", "Very happy", "7"],
+        ["2024-01-02", "", "8"],
+    ]
+
+
+def test_words_to_df_returns_text_column_without_a_table():
+    from image_to_csv.table_to_csv import words_to_df
+
+    df = words_to_df(_words([("Just", 10, 10), ("notes", 60, 10), ("here", 10, 50)]))
+    assert df["text"].tolist() == ["Just notes", "here"]
+    assert list(words_to_df({"text": []}).columns) == ["text"]
+
+
+def _reference_lines_to_df(lines):
+    """The row-by-row lines_to_df the columnar version must match."""
+    import re
+
+    def _tokenize(line):
+        stripped = line.strip()
+        if not stripped:
+            return [], False
+        if "|" in stripped:
+            parts = [p.strip() for p in stripped.split("|")]
+            parts = [p for p in parts if p]
+            if parts:
+                return parts, True
+        if "," in stripped:
+            parts = [p.strip() for p in stripped.split(",")]
+            if any(parts):
+                return parts, True
+        parts = [p.strip() for p in re.split(r"\s{2,}|\t", stripped) if p.strip()]
+        if len(parts) > 1:
+            return parts, True
+        return stripped.split(), False
+
+    rows, indexed, reliable_rows = [], [], []
+    for idx, ln in enumerate(lines):
+        tokens, reliable = _tokenize(ln)
+        rows.append(tokens)
+        if len(tokens) >= 2:
+            indexed.append((idx, tokens))
+            if reliable:
+                reliable_rows.append((idx, tokens))
+    if len(indexed) < 2:
+        clean = [ln.strip() for ln in lines if ln.strip()]
+        return pd.DataFrame(clean, columns=["text"]) if clean else None
+    candidates = reliable_rows or indexed
+    counts = {}
+    for _, row in candidates:
+        counts[len(row)] = counts.get(len(row), 0) + 1
+    width = max(counts, key=lambda k: (counts[k], k))
+    header_idx = next(idx for idx, row in candidates if len(row) == width)
+    headers = [c or f"Column {i+1}" for i, c in enumerate(rows[header_idx][:width])]
+    data = [(r + [""] * width)[:width] for r in rows[header_idx + 1 :] if r]
+    return pd.DataFrame(data or None, columns=headers)
+
+
+def test_lines_to_df_matches_row_by_row_reference():
+    import random
+
+    rng = random.Random(7)
+    pieces = ["Date", "12.50", "", "a b", "x,y", "|", "  ", "Total", "\t", "\xa0", "\n"]
+    for _ in range(2000):
+        lines = [
+            rng.choice(["  ", " | ", ",", "\t", " ", " \t", "\xa0 "]).join(
+                rng.choice(pieces) for _ in range(rng.randint(0, 6))
+            )
+            for _ in range(rng.randint(0, 12))
+        ]
+        expected = _reference_lines_to_df(lines)
+        actual = lines_to_df(iter(lines))
+        if expected is None:
+            assert list(actual.columns) == ["text"] and actual.empty
+        else:
+            pd.testing.assert_frame_equal(actual, expected)
+
+
+def test_lines_to_df_streams_from_a_file_object(tmp_path):
+    ledger = tmp_path / "ledger.txt"
+    ledger.write_text(
+        "Ledger\nDate  Amount\n"
+        + "".join(f"2024-01-{d:02d}  {d}.00\n" for d in range(1, 29))
+    )
+    with ledger.open() as handle:
+        df = lines_to_df(handle)
+    assert list(df.columns) == ["Date", "Amount"]
+    assert len(df) == 28 and df.iloc[-1].tolist() == ["2024-01-28", "28.00"]
@@ -0,0 +1,115 @@
+import tempfile
+from pathlib import Path
+
+import cv2
+import numpy as np
+import pandas as pd
+import pytest
+import typer.testing
+
+from image_to_csv import cli, pipeline, templates
+from image_to_csv.bench import render_table
+from image_to_csv.grid import find_cells, ink_mask
+from image_to_csv.preprocess import preprocess
+
+
+@pytest.fixture(autouse=True)
+def fresh_store():
+    templates.reset_template_store()
+    yield
+    templates.reset_template_store()
+
+
+def _form(seed=0, rows=10, skew=0.0, shift=0, value=None):
+    img, _ = render_table(1200, 900, rows=rows, cols=4, skew=skew, noise=6.0, seed=seed)
+    if value is not None:
+        cv2.rectangle(img, (230, 200), (440, 250), (255, 255, 255), -1)
+        cv2.putText(img, value, (240, 240), cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 0, 0), 2)
+    if shift:
+        img = np.pad(img, ((shift, 0), (shift, 0), (0, 0)), constant_values=255)
+        img = img[: -shift or None, : -shift or None]
+    return preprocess(img, profile="balanced")
+
+
+def test_pages_with_a_known_layout_reuse_its_lattice(monkeypatch):
+    detected = []
+    monkeypatch.setattr(
+        templates,
+        "detect_cells",
+        lambda img, ink: detected.append(1) or find_cells(img, ink),
+    )
+    first = _form()
+    assert templates.find_cells(first) is not None
+    shifted = _form(seed=1, skew=1.0, shift=9, value="4321")
+    lattice = templates.find_cells(shifted)
+    reference = find_cells(shifted)
+    assert len(detected) == 1
+    assert (lattice.rows, lattice.cols) == (reference.rows, reference.cols)
+    assert np.abs(np.subtract(lattice.boxes, reference.boxes)).max() <= 2
+    assert lattice.blank == reference.blank
+    # A different layout is detected in full and learned as a second template.
+    other = templates.find_cells(_form(rows=8))
+    assert (other.rows, len(detected)) == (8, 2)
+    assert templates.get_template_store().stats == {
+        "layouts": 2,
+        "template": 1,
+        "duplicate": 0,
+    }
+
+
+def test_duplicates_are_found_but_changed_pages_are_not():
+    page = _form()
+    assert templates.find_duplicate(page) is None
+    templates.remember(page, {"cells": [["A"]]})
+    # Thicken the strokes of a few glyphs by a pixel, as a rescan would.
+    rescanned = page.copy()
+    rescanned[200:250, 230:440] = cv2.erode(
+        rescanned[200:250, 230:440], np.ones((2, 2), np.uint8)
+    )
+    assert not np.array_equal(ink_mask(rescanned), ink_mask(page))
+    assert templates.find_duplicate(rescanned) == {"cells": [["A"]]}
+    assert templates.find_duplicate(_form(value="1.80")) is None
+    assert templates.get_template_store().stats["duplicate"] == 1
+
+
+def test_file_with_templates_skips_structure_and_ocr_for_repeated_pages(monkeypatch):
+    calls = []
+
+    def fake_cells(img, boxes):
+        calls.append(len(boxes))
+        return ["h0", "h1", "h2"] + [f"v{len(calls)}"] * (len(boxes) - 3)
+
+    monkeypatch.setattr(pipeline, "ocr_cells_tesseract", fake_cells)
+    pages = [
+        render_table(1200, 900, rows=6, cols=3, noise=6.0)[0],
+        None,
+        render_table(1200, 900, rows=6, cols=3, noise=6.0, seed=2)[0],
+    ]
+    pages[1] = pages[0]
+    cv2.putText(pages[2], "77", (300, 300), cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 0, 0), 2)
+    runner = typer.testing.CliRunner()
+    with tempfile.TemporaryDirectory() as tmpdir:
+        path = Path(tmpdir) / "forms.tiff"
+        assert cv2.imwritemulti(str(path), pages)
+        out = Path(tmpdir) / "out.csv"
+        result = runner.invoke(
+            cli.app,
+            [
+                "file",
+                str(path),
+                "-o",
+                str(out),
+                "-e",
+                "grid",
+                "-p",
+                "fast",
+                "--templates",
+            ],
+        )
+        assert result.exit_code == 0, result.output
+        df = pd.read_csv(out)
+    assert len(calls) == 2
+    assert df.groupby("_page").size().tolist() == [5, 5, 5]
+    assert df["h0"].tolist() == ["v1"] * 10 + ["v2"] * 5
+    stats = templates.get_template_store().stats
+    assert (stats["layouts"], stats["template"], stats["duplicate"]) == (1, 1, 1)
@@ -0,0 +1,103 @@
+import tracemalloc
+from functools import partial
+
+import cv2
+import numpy as np
+
+from image_to_csv import pipeline, tiles
+from image_to_csv.bench import render_table
+from image_to_csv.preprocess import _denoise, preprocess
+
+
+def test_clean_tiled_matches_whole_page_processing():
+    img, _ = render_table(900, 700, rows=16, noise=8.0)
+    gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+    for method in ("median", "nlmeans"):
+        denoised = _denoise(gray, method)
+        t, binary = cv2.threshold(denoised, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
+        denoise = partial(_denoise, method=method)
+        out = tiles.clean_tiled(img, denoise, t, band_pixels=40_000)
+        assert out.shape == binary.shape
+        assert np.array_equal(out, binary)
+
+        M = cv2.getRotationMatrix2D((450, 350), 2.0, 1.0)
+        rotated = cv2.warpAffine(
+            binary,
+            M,
+            (900, 700),
+            flags=cv2.INTER_LINEAR,
+            borderMode=cv2.BORDER_REPLICATE,
+        )
+        out = tiles.clean_tiled(img, denoise, t, 2.0, band_pixels=40_000)
+        diff = np.abs(out.astype(int) - rotated)
+        assert diff.max() <= 1 and np.mean(diff == 0) > 0.999
+
+
+def test_tiled_cleaning_of_gray_pages_leaves_the_input_alone():
+    img, _ = render_table(600, 400, rows=10)
+    gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+    before = gray.copy()
+    for angle in (0.0, 2.0):
+        tiles.clean_tiled(gray, None, 128, angle, band_pixels=40_000)
+        assert np.array_equal(gray, before)
+    for profile in ("fast", "auto"):
+        out = preprocess(gray, profile=profile, tile_above=1)
+        assert out.shape == gray.shape
+        assert np.array_equal(gray, before)
+
+
+def test_tiled_preprocess_bounds_intermediate_memory(monkeypatch):
+    import image_to_csv.preprocess as preprocess_module
+
+    img, _ = render_table(2000, 1500, rows=24, skew=2.0, noise=8.0)
+    monkeypatch.setattr(tiles, "BAND_PIXELS", 100_000)
+    monkeypatch.setattr(preprocess_module, "SAMPLE_SIDE", 400)
+    tracemalloc.start()
+    out = preprocess(img, profile="fast", tile_above=1_000_000)
+    extra = tracemalloc.get_traced_memory()[1] - out.nbytes
+    tracemalloc.stop()
+    # Besides the result, memory scales with the band and the sample, not
+    # the page. (A sample this small misjudges the skew, so the pixels are
+    # only checked with the default sample size.)
+    assert extra < out.nbytes / 4
+    assert out.shape == img.shape[:2]
+
+
+def test_text_bands_cut_between_lines():
+    # A long receipt: one line of text every 30 px.
+    img = np.full((1200, 600, 3), 255, dtype=np.uint8)
+    for y in range(25, 1200, 30):
+        cv2.putText(img, f"Item {y}  9.99", (10, y), 0, 0.7, (0, 0, 0), 2)
+    bands = tiles.text_bands(img, band_pixels=600 * 150)
+    assert bands[0][0] == 0 and bands[-1][1] == 1200
+    assert all(a[1] == b[0] for a, b in zip(bands, bands[1:]))
+    assert all(0 < y1 - y0 <= 150 for y0, y1 in bands)
+    ink = np.count_nonzero(img[..., 0] < 128, axis=1)
+    assert all(ink[y0] == 0 for y0, _ in bands[1:])
+
+
+def test_tesseract_payload_stitches_bands(monkeypatch):
+    img = np.full((400, 300, 3), 255, dtype=np.uint8)
+    monkeypatch.setattr(tiles, "BAND_PIXELS", 300 * 100)
+    monkeypatch.setattr(
+        pipeline, "ocr_lines_tesseract", lambda band: [f"{len(band)} rows"]
+    )
+    monkeypatch.setattr(
+        pipeline,
+        "ocr_words_tesseract",
+        lambda band: {"text": ["w"], "left": [3], "top": [5], "conf": [90.0]},
+    )
+    settings = pipeline.Settings(engine="tesseract", tile_above=100_000)
+    assert pipeline._tesseract_payload(img, settings)["lines"] == ["100 rows"] * 4
+
+    settings = pipeline.Settings(engine="tesseract-tsv", tile_above=100_000)
+    words = pipeline._tesseract_payload(img, settings)["words"]
+    assert words["top"] == [5, 105, 205, 305]
+    assert words["left"] == [3] * 4
+
+    settings = pipeline.Settings(engine="tesseract", tile_above=0)
+    assert pipeline._tesseract_payload(img, settings)["lines"] == ["400 rows"]
+
+
+def test_cli_default_matches_tiles_module():
+    assert pipeline.DEFAULT_TILE_ABOVE == tiles.TILE_ABOVE
@@ -0,0 +1,216 @@
+import json
+import tempfile
+from pathlib import Path
+
+import cv2
+import numpy as np
+import pandas as pd
+import pytest
+import typer.testing
+
+from image_to_csv import cli, pipeline
+from image_to_csv.infer import infer_types, merge_kinds
+from image_to_csv.writers import (
+    StreamingColumnarWriter,
+    StreamingCSVWriter,
+    drop_rows,
+    open_writer,
+)
+
+
+def test_wide_layout_matches_concat_with_union_header():
+    frames = [
+        pd.DataFrame({"_source": ["a.jpg"], "Name": ["Alice"]}),
+        pd.DataFrame({"_source": ["b.jpg"], "Name": ["Bob"], "Score": ["8"]}),
+        pd.DataFrame({"_source": ["c.jpg"], "Note": ["late"]}),
+    ]
+    with tempfile.TemporaryDirectory() as tmpdir:
+        out = Path(tmpdir) / "out.csv"
+        with StreamingCSVWriter(out) as writer:
+            for df in frames:
+                writer.write(df)
+        streamed = pd.read_csv(out, dtype=str, keep_default_na=False)
+    expected = pd.concat(frames, ignore_index=True).fillna("")
+    pd.testing.assert_frame_equal(streamed, expected)
+    assert writer.rows == 3
+
+
+def test_rows_reach_disk_before_close():
+    with tempfile.TemporaryDirectory() as tmpdir:
+        out = Path(tmpdir) / "out.csv"
+        writer = StreamingCSVWriter(out)
+        writer.write(pd.DataFrame({"A": ["1", "2"]}))
+        assert out.read_text().splitlines() == ["A", "1", "2"]
+        writer.close()
+
+
+def test_resume_after_crash_keeps_columns_that_were_never_in_the_header():
+    with tempfile.TemporaryDirectory() as tmpdir:
+        out = Path(tmpdir) / "out.csv"
+        writer = StreamingCSVWriter(out)
+        writer.write(pd.DataFrame({"_source": ["a.png"], "A": ["1"]}))
+        writer.write(pd.DataFrame({"_source": ["b.png"], "A": ["2"], "B": ["x"]}))
+        writer._fh.close()  # the process dies before close() widens the header
+        assert out.read_text().splitlines()[0] == "_source,A"
+        with StreamingCSVWriter(out, append=True) as writer:
+            writer.write(pd.DataFrame({"_source": ["c.png"], "C": ["y"]}))
+        df = pd.read_csv(out, dtype=str, keep_default_na=False)
+        leftovers = sorted(p.name for p in Path(tmpdir).iterdir())
+    assert df.columns.tolist() == ["_source", "A", "B", "C"]
+    assert df.values.tolist() == [
+        ["a.png", "1", "", ""],
+        ["b.png", "2", "x", ""],
+        ["c.png", "", "", "y"],
+    ]
+    assert leftovers == ["out.csv"]
+
+
+def test_jsonl_resume_after_crash_skips_a_torn_last_line(monkeypatch):
+    monkeypatch.setattr(pipeline, "ocr_lines_tesseract", lambda img: ["A  B", "1  x"])
+    runner = typer.testing.CliRunner()
+    with tempfile.TemporaryDirectory() as tmpdir:
+        folder = Path(tmpdir) / "in"
+        folder.mkdir()
+        for name in ("a.png", "b.png"):
+            cv2.imwrite(str(folder / name), np.full((8, 8, 3), 255, np.uint8))
+        out = Path(tmpdir) / "out.jsonl"
+        args = ["folder", str(folder), "--out", str(out), "-e", "tesseract"]
+        args += ["--format", "jsonl", "--resume"]
+        assert runner.invoke(cli.app, args).exit_code == 0
+        # The process dies halfway through b.png's row, before its record.
+        text = out.read_text()
+        out.write_text(text[: text.index('"b.png"') + 5])
+        manifest = out.with_name("out.jsonl.manifest.jsonl")
+        manifest.write_text(manifest.read_text().splitlines(keepends=True)[0])
+        result = runner.invoke(cli.app, args)
+        assert result.exit_code == 0, result.output
+        records = [json.loads(line) for line in out.read_text().splitlines()]
+    assert records == [
+        {"_source": "a.png", "A": "1", "B": "x"},
+        {"_source": "b.png", "A": "1", "B": "x"},
+    ]
+
+
+def test_long_layout_keeps_identifier_columns():
+    df = pd.DataFrame({"_source": ["a.jpg", "a.jpg"], "A": ["1", "2"], "B": ["x", "y"]})
+    with tempfile.TemporaryDirectory() as tmpdir:
+        out = Path(tmpdir) / "out.csv"
+        with StreamingCSVWriter(out, layout="long") as writer:
+            writer.write(df)
+        long = pd.read_csv(out, dtype=str)
+    assert list(long.columns) == ["_source", "_row", "column", "value"]
+    assert list(long["column"]) == ["A", "B", "A", "B"]
+    assert list(long["value"]) == ["1", "x", "2", "y"]
+
+
+def test_infer_types_parses_numbers_amounts_percentages_and_dates():
+    df = pd.DataFrame(
+        {
+            "_page": [1, 2, 3],
+            "Qty": ["1", "2,300", ""],
+            "Price": ["$1,200.50", "(35.00)", "12 USD"],
+            "Share": ["12.5%", "3 %", "100%"],
+            "Due": ["03/04/2024", "12/31/2024", " "],
+            "Note": ["1", "two", "3"],
+        }
+    )
+    typed = infer_types(df)
+    assert typed["Qty"].tolist()[:2] == [1, 2300] and pd.isna(typed["Qty"].iloc[2])
+    assert typed["Price"].tolist() == [1200.5, -35.0, 12.0]
+    assert typed["Share"].tolist() == [0.125, 0.03, 1.0]
+    assert typed["Due"].dt.strftime("%Y-%m-%d").tolist()[:2] == [
+        "2024-03-04",
+        "2024-12-31",
+    ]
+    assert typed["Note"].tolist() == ["1", "two", "3"]
+    assert typed["_page"].tolist() == [1, 2, 3]
+    assert merge_kinds(["int", "empty", "float"]) == "float"
+    assert merge_kinds(["int", "currency"]) == "currency"
+    assert merge_kinds(["int", "date"]) == "string"
+
+
+def test_jsonl_rows_are_typed_and_can_be_dropped():
+    with tempfile.TemporaryDirectory() as tmpdir:
+        out = Path(tmpdir) / "out.jsonl"
+        with open_writer(out, "jsonl", typed=True) as writer:
+            writer.write(pd.DataFrame({"_source": ["a.jpg"], "A": ["7"], "B": ["x"]}))
+            writer.write(pd.DataFrame({"_source": ["b.jpg"], "Due": ["2024-01-31"]}))
+        drop_rows(out, "_source", {"a.jpg"}, "jsonl")
+        with open_writer(out, "jsonl", append=True) as writer:
+            writer.write(
+                pd.DataFrame([["c.jpg", "1", "2"]], columns=["_source", "A", "A"])
+            )
+        records = [json.loads(line) for line in out.read_text().splitlines()]
+    assert records == [
+        {"_source": "b.jpg", "Due": "2024-01-31"},
+        {"_source": "c.jpg", "A": "1", "A.1": "2"},
+    ]
+
+
+@pytest.mark.parametrize("fmt", ["parquet", "arrow"])
+def test_columnar_output_has_union_columns_and_row_groups(fmt):
+    pa = pytest.importorskip("pyarrow")
+    frames = [
+        pd.DataFrame({"_source": ["a.jpg"], "Amount": ["$1,200"], "N": ["3"]}),
+        pd.DataFrame({"_source": ["b.jpg", "b.jpg"], "Amount": ["950", "(4.50)"]}),
+        pd.DataFrame({"_source": ["c.jpg"], "N": ["x"], "Due": ["2024-01-31"]}),
+    ]
+
+    def read(path):
+        if fmt == "parquet":
+            return pytest.importorskip("pyarrow.parquet").ParquetFile(path)
+        return pa.ipc.open_file(path)
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        out = Path(tmpdir) / f"out.{fmt}"
+        for typed in (False, True):
+            writer = StreamingColumnarWriter(out, fmt, typed=typed, row_group_rows=2)
+            with writer:
+                for df in frames:
+                    writer.write(df)
+            assert writer.rows == 4
+            reader = read(out)
+            groups = (
+                reader.num_row_groups if fmt == "parquet" else reader.num_record_batches
+            )
+            table = reader.read() if fmt == "parquet" else reader.read_all()
+            assert groups == 2
+            assert table.column_names == ["_source", "Amount", "N", "Due"]
+            assert [p.name for p in Path(tmpdir).iterdir()] == [out.name]
+            if not typed:
+                assert table.column("Amount").to_pylist() == [
+                    "$1,200",
+                    "950",
+                    "(4.50)",
+                    None,
+                ]
+        assert [str(t) for t in table.schema.types] == [
+            "string",
+            "double",
+            "string",
+            "date32[day]",
+        ]
+        assert table.column("Amount").to_pylist() == [1200.0, 950.0, -4.5, None]
+
+
+def test_folder_writes_typed_jsonl(monkeypatch):
+    monkeypatch.setattr(
+        pipeline, "ocr_lines_tesseract", lambda img: ["Qty  Price", "3  $4.50"]
+    )
+    runner = typer.testing.CliRunner()
+    with tempfile.TemporaryDirectory() as tmpdir:
+        folder = Path(tmpdir) / "in"
+        folder.mkdir()
+        for name in ("a.png", "b.png"):
+            cv2.imwrite(str(folder / name), np.full((8, 8, 3), 255, np.uint8))
+        out = Path(tmpdir) / "out.jsonl"
+        args = ["folder", str(folder), "--out", str(out), "-e", "tesseract"]
+        result = runner.invoke(cli.app, args + ["--format", "jsonl", "--infer-types"])
+        assert result.exit_code == 0, result.output
+        records = [json.loads(line) for line in out.read_text().splitlines()]
+        result = runner.invoke(cli.app, args + ["--format", "parquet", "--resume"])
+        assert result.exit_code != 0
+    assert records == [
+        {"_source": "a.png", "Qty": 3, "Price": 4.5},
+        {"_source": "b.png", "Qty": 3, "Price": 4.5},
+    ]